@@ -2,6 +2,10 @@
 set -e
 
 LOGDIR="backfill_logs"
+
+# Snapshot jobs (inventory, active variant SKUs) re-pull the same current snapshot for
+# every missing date; one run id lets them all reuse the cached API responses
+export CONNECTOR_SNAPSHOT_RUN_ID=${CONNECTOR_SNAPSHOT_RUN_ID:-backfill-$(date -u +%Y%m%dT%H%M%SZ)}
 mkdir -p $LOGDIR
 
 MISSING_DATES=(
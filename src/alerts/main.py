@@ -59,16 +59,9 @@ def main():
     katana_raw_material_status_df = run_athena_query(query, database, region,
                                                      s3_bucket)
 
-    # Update data types
-    katana_raw_material_status_df['planned_qty_as_of'] = pd.to_datetime(
-        katana_raw_material_status_df['planned_qty_as_of']).dt.strftime(
-            '%Y-%m-%d')
-    katana_raw_material_status_df[
-        'needs_replenished'] = katana_raw_material_status_df[
-            'needs_replenished'].map({
-                'true': True,
-                'false': False
-            })
+    # Format dates for the alert message
+    katana_raw_material_status_df['planned_qty_as_of'] = katana_raw_material_status_df[
+        'planned_qty_as_of'].dt.strftime('%Y-%m-%d')
 
     logger.info(katana_raw_material_status_df.columns)
     logger.info(katana_raw_material_status_df.head())
@@ -95,7 +88,7 @@ def main():
     for _, row in raw_materials_needing_replinished.iterrows():
         alert_message += f"• {row['name']}:\n"
         alert_message += f"  - Current stock: {row['in_stock']} {row['units_of_measure']}\n"
-        alert_message += f"  - Minimum Quantity Required to Meet Upcoming MO's as of {pd.to_datetime(row['in_stock_as_of']).strftime('%Y-%m-%d')}: {-int(round(float(row['inventory_remaining']),0))} {row['units_of_measure']}\n\n"
+        alert_message += f"  - Minimum Quantity Required to Meet Upcoming MO's as of {row['in_stock_as_of'].strftime('%Y-%m-%d')}: {-int(round(float(row['inventory_remaining']),0))} {row['units_of_measure']}\n\n"
 
     logger.info(alert_message)
 
@@ -131,21 +124,10 @@ def main():
     shipbob_inventory_run_rate_df = run_athena_query(query, database, region,
                                                      s3_bucket)
 
-    # Update data types
-    shipbob_inventory_run_rate_df['partition_date'] = pd.to_datetime(
-        shipbob_inventory_run_rate_df['partition_date']).dt.strftime(
-            '%Y-%m-%d')
-    shipbob_inventory_run_rate_df['run_rate'] = shipbob_inventory_run_rate_df[
-        'run_rate'].astype(float)
-    shipbob_inventory_run_rate_df[
-        'est_stock_days_on_hand'] = shipbob_inventory_run_rate_df[
-            'est_stock_days_on_hand'].astype(float)
-    shipbob_inventory_run_rate_df[
-        'total_fulfillable_quantity'] = shipbob_inventory_run_rate_df[
-            'total_fulfillable_quantity'].astype(int)
-    shipbob_inventory_run_rate_df[
-        'restock_point'] = shipbob_inventory_run_rate_df[
-            'restock_point'].astype(int)
+    # Format dates for the alert message
+    for date_col in ['partition_date', 'estimated_stockout_date']:
+        shipbob_inventory_run_rate_df[date_col] = shipbob_inventory_run_rate_df[
+            date_col].dt.strftime('%Y-%m-%d')
 
     logger.info(shipbob_inventory_run_rate_df.columns)
     logger.info(shipbob_inventory_run_rate_df.head())
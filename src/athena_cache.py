@@ -0,0 +1,373 @@
+"""
+Local cache of Athena query results.
+
+Most of the queries the dashboard & jobs run (ie. "the latest partition of
+shipbob_inventory_run_rate") read tables that only change once a day, yet every page
+load / job run paid for a full Athena query.  QueryResultCache stores each result as a
+Parquet file keyed by the normalized SQL (and database), along with a freshness
+signature of every table the query reads: a digest of the keys & ETags of every object
+under the table's S3 location (one listing per table, whatever its partition count).
+An entry is served only while those signatures are unchanged, so a new partition or a
+rewrite of any existing one - the latest, or a backfilled / re-merged older one -
+invalidates it.  Partitions registered outside the table's location aren't seen, so
+entries also expire after ATHENA_CACHE_TTL seconds (an hour by default).
+
+The cache is bounded in size - the least recently used results are evicted first.  It
+is only active for callers that pass a cache_dir (or when ATHENA_CACHE_DIR is set);
+default_cache_dir() is the per-user cache directory.  On a cold miss Athena's own
+result reuse (ATHENA_RESULT_REUSE_MAX_AGE minutes)
+can be used as a second tier; it is never used when a local entry was just invalidated,
+since Athena would hand back the same stale result.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from aws_clients import get_aws_client
+
+ATHENA_CACHE_DIR_ENV = 'ATHENA_CACHE_DIR'
+ATHENA_CACHE_TTL = float(os.getenv('ATHENA_CACHE_TTL', 60 * 60)) or None  # seconds (0 = no TTL)
+ATHENA_CACHE_MAX_BYTES = int(os.getenv('ATHENA_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+ATHENA_RESULT_REUSE_MAX_AGE = int(os.getenv('ATHENA_RESULT_REUSE_MAX_AGE', 0))  # minutes (0 = off)
+
+# String literals / quoted identifiers, comments & whitespace (normalization tokens)
+_SQL_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(--[^\n]*|/\*.*?\*/)|(\s+)""",
+                         re.DOTALL)
+_IDENTIFIER = r'(?:"(?:[^"]|"")+"|\w+)'
+_TABLE_REFERENCE = re.compile(
+    rf'\b(?:FROM|JOIN)\s+({_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER}){{0,2}})', re.IGNORECASE)
+_CTE_NAME = re.compile(rf'(?:\bWITH|,)\s*({_IDENTIFIER})\s+AS\s*\(', re.IGNORECASE)
+
+# Results of queries using these functions change from one run to the next
+_NONDETERMINISTIC = re.compile(
+    r'\b(?:now|current_timestamp|current_time|localtime|localtimestamp|rand|random|uuid)\b',
+    re.IGNORECASE)
+_CURRENT_DATE = re.compile(r'\bcurrent_date\b', re.IGNORECASE)
+
+
+def normalize_sql(query: str) -> str:
+    """Strip comments & collapse whitespace outside of string literals / quoted identifiers"""
+
+    def token(match):
+        if match.group(1):
+            return match.group(1)
+        return ' '
+
+    return _SQL_TOKENS.sub(token, query).strip().rstrip(';').strip()
+
+
+def _unquote(identifier: str) -> str:
+    identifier = identifier.strip()
+    if identifier.startswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.lower()
+
+
+def referenced_tables(query: str, database: str) -> List[str]:
+    """'database.table' of every table a query reads (CTE names excluded)
+
+    The match is deliberately loose (ie. EXTRACT(year FROM col) yields 'col') - names that
+    turn out not to be tables in the catalog are ignored by QueryResultCache.signatures.
+    """
+
+    # Drop literals so the words in them are never mistaken for table references
+    sql = _SQL_TOKENS.sub(
+        lambda m: "''" if m.group(1) and m.group(1).startswith("'") else
+        (m.group(1) or ' '), query)
+
+    cte_names = {_unquote(name) for name in _CTE_NAME.findall(sql)}
+
+    tables = set()
+    for reference in _TABLE_REFERENCE.findall(sql):
+        # catalog.database.table -> database.table
+        parts = [_unquote(part) for part in reference.split('.')][-2:]
+        if len(parts) == 1:
+            if parts[0] in cte_names:
+                continue
+            parts = [database] + parts
+        tables.add('.'.join(parts))
+    return sorted(tables)
+
+
+class CacheLookup(NamedTuple):
+    """Result of QueryResultCache.lookup"""
+    key: Optional[str]  # None when the query can't be cached
+    df: Optional[pd.DataFrame]  # cached result (None on a miss)
+    signatures: Optional[Dict[str, dict]]  # freshness signature of every referenced table
+    invalidated: bool  # a stored entry was found but is stale
+
+
+class QueryResultCache:
+    """Parquet cache of Athena query results, invalidated by source partition freshness
+
+    Args:
+        cache_dir (str): Directory the cache is kept in
+        ttl (float): Maximum age in seconds of an entry (None = no limit)
+        max_bytes (int): Upper bound on the size of the cached results (LRU eviction)
+        region (str): AWS region of the Glue catalog
+    """
+
+    def __init__(self, cache_dir: str, ttl: Optional[float] = ATHENA_CACHE_TTL,
+                 max_bytes: int = ATHENA_CACHE_MAX_BYTES, region: str = 'us-east-1'):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.region = region
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.results_dir = os.path.join(cache_dir, 'results')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # ---- keys & freshness ----
+
+    @staticmethod
+    def query_key(query: str, database: str) -> Optional[str]:
+        """Cache key for a query (None when its results depend on when it runs)"""
+
+        sql = normalize_sql(query)
+        if _NONDETERMINISTIC.search(sql):
+            return None
+
+        identity = [database, sql]
+        # current_date only changes once a day
+        if _CURRENT_DATE.search(sql):
+            identity.append(datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+
+        return hashlib.sha256(json.dumps(identity).encode('utf-8')).hexdigest()
+
+    def _objects_digest(self, location: str) -> dict:
+        """Number of & digest of the keys / ETags of the objects under an s3:// location"""
+
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+
+        s3_client = get_aws_client('s3', self.region)
+        paginator = s3_client.get_paginator('list_objects_v2')
+
+        digest = hashlib.sha256()
+        count = 0
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                digest.update(f"{obj['Key']}\0{obj['ETag']}\n".encode('utf-8'))
+                count += 1
+        return {'objects': count, 'digest': digest.hexdigest()}
+
+    def table_signature(self, table: str) -> Optional[dict]:
+        """Freshness signature of a table ('database.table')
+
+        Every object under the table's location is listed (rather than only the latest
+        partition), so rewriting any partition changes the signature.
+
+        Returns:
+            (dict): {'objects': object count, 'digest': digest of their keys & ETags},
+                {} if the name isn't a table in the catalog, or None if it can't be
+                tracked (views)
+        """
+
+        database, _, name = table.partition('.')
+        glue_client = get_aws_client('glue', self.region)
+
+        try:
+            glue_table = glue_client.get_table(DatabaseName=database, Name=name)['Table']
+        except glue_client.exceptions.EntityNotFoundException:
+            # Not a table (a query reading a missing table fails before anything is stored)
+            return {}
+
+        # Views have no data of their own to check
+        if glue_table.get('TableType') == 'VIRTUAL_VIEW':
+            return None
+
+        return self._objects_digest(glue_table['StorageDescriptor']['Location'])
+
+    def signatures(self, query: str, database: str) -> Optional[Dict[str, dict]]:
+        """Signatures of every table a query reads (None if any of them can't be tracked)"""
+
+        signatures = {}
+        for table in referenced_tables(query, database):
+            signature = self.table_signature(table)
+            if signature is None:
+                logger.info(f'Query reads {table}, which the cache can not track')
+                return None
+            if signature:
+                signatures[table] = signature
+        return signatures
+
+    # ---- entries ----
+
+    def _entry_path(self, key: str):
+        return os.path.join(self.entries_dir, f'{key}.json')
+
+    def _result_path(self, key: str):
+        return os.path.join(self.results_dir, f'{key}.parquet')
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _load_entry(self, key: str):
+        path = self._entry_path(key)
+        if not os.path.exists(path) or not os.path.exists(self._result_path(key)):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_entry(self, key: str, entry: dict):
+        self._write(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+
+    def _remove(self, key: str):
+        for path in (self._entry_path(key), self._result_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def lookup(self, query: str, database: str) -> CacheLookup:
+        """Look a query up, checking the freshness of every table it reads
+
+        Returns:
+            (CacheLookup): The cached result (df is None on a miss) & what's needed to store one
+        """
+
+        key = self.query_key(query, database)
+        if key is None:
+            return CacheLookup(None, None, None, False)
+
+        # Signatures are taken before the query runs, so data that lands while it runs
+        # invalidates the stored result on the next lookup
+        signatures = self.signatures(query, database)
+        if signatures is None:
+            return CacheLookup(None, None, None, False)
+
+        entry = self._load_entry(key)
+        if entry is None:
+            return CacheLookup(key, None, signatures, False)
+
+        if self.ttl is not None and time.time() - entry['stored_at'] >= self.ttl:
+            logger.info(f'Athena cache expired: {key}')
+            return CacheLookup(key, None, signatures, True)
+
+        if entry['signatures'] != signatures:
+            logger.info(f'Athena cache invalidated (source data changed): {key}')
+            return CacheLookup(key, None, signatures, True)
+
+        try:
+            df = pq.read_table(self._result_path(key)).to_pandas()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f'Error reading cached result {key}: {str(e)}')
+            return CacheLookup(key, None, signatures, False)
+
+        entry['last_access'] = time.time()
+        self._save_entry(key, entry)
+        logger.info(f'Athena cache hit: {key} ({len(df)} rows)')
+        return CacheLookup(key, df, signatures, False)
+
+    def store(self, lookup: CacheLookup, query: str, database: str, df: pd.DataFrame):
+        """Store a query result under the key & signatures of its (missed) lookup"""
+
+        if lookup.key is None:
+            return
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            logger.warning(f'Result of {lookup.key} can not be cached: {str(e)}')
+            return
+
+        path = self._result_path(lookup.key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        pq.write_table(table, tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        self._save_entry(
+            lookup.key, {
+                'sql': normalize_sql(query),
+                'database': database,
+                'signatures': lookup.signatures,
+                'stored_at': now,
+                'last_access': now,
+                'bytes': os.path.getsize(path)
+            })
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used results until the cache fits in max_bytes"""
+
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.entries_dir):
+                if not name.endswith('.json'):
+                    continue
+                key = name[:-len('.json')]
+                try:
+                    entry = self._load_entry(key)
+                except (OSError, ValueError):
+                    entry = None
+                if entry is None:
+                    self._remove(key)
+                    continue
+                entries.append((entry['last_access'], entry['bytes'], key))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                logger.info(f'Evicting cached result {key} ({size} bytes)')
+                self._remove(key)
+                total -= size
+
+
+_query_caches: Dict[Tuple[str, str], QueryResultCache] = {}
+_query_caches_lock = threading.Lock()
+
+
+def default_cache_dir() -> str:
+    """Per-user directory for cached query results ($XDG_CACHE_HOME/prymal/athena)"""
+    return os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                        'prymal', 'athena')
+
+
+def get_query_cache(region: str = 'us-east-1',
+                    cache_dir: str = None) -> Optional[QueryResultCache]:
+    """Return the query result cache kept in `cache_dir` (else $ATHENA_CACHE_DIR), or None
+    when caching is not enabled"""
+
+    cache_dir = cache_dir or os.getenv(ATHENA_CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    with _query_caches_lock:
+        if (cache_dir, region) not in _query_caches:
+            _query_caches[(cache_dir, region)] = QueryResultCache(cache_dir, region=region)
+        return _query_caches[(cache_dir, region)]
+
+
+def result_reuse_configuration(lookup: Optional[CacheLookup],
+                               max_age_minutes: int = ATHENA_RESULT_REUSE_MAX_AGE):
+    """start_query_execution ResultReuseConfiguration for a query that missed the cache
+
+    Athena's result reuse is only requested on a cold miss - after an invalidation it
+    would return the very result that was just found to be stale.
+    """
+
+    if not max_age_minutes or (lookup is not None and lookup.invalidated):
+        return None
+    return {
+        'ResultReuseByAgeConfiguration': {
+            'Enabled': True,
+            'MaxAgeInMinutes': max_age_minutes
+        }
+    }
@@ -0,0 +1,513 @@
+"""
+Athena query execution helpers.
+
+wait_for_query_execution polls get_query_execution with exponential backoff & jitter
+(instead of calling it back to back), so a query that runs for minutes makes tens of API
+calls rather than thousands and doesn't eat into the account's Athena API quota.  A
+query that doesn't finish within the timeout (or whose wait is interrupted) is stopped
+with stop_query_execution rather than left running.
+
+read_query_results reads a finished query's results straight from the CSV Athena
+writes to the query's OutputLocation (one streamed GET, optionally in chunks) instead of
+paging through get_query_results 1000 rows per call.  Only tiny results (& results whose
+object can't be read) still go through get_query_results.
+
+Results are decoded with the column types Athena reports (ResultSetMetadata ColumnInfo),
+so integer / floating point / boolean / date / timestamp columns come back as numpy /
+pandas dtypes rather than strings for every caller to re-cast.  Integers & booleans use
+pandas' nullable Int64 / boolean dtypes, so a column's dtype doesn't depend on whether
+the rows read (or the chunk) happen to contain a NULL.
+
+Queries can also be submitted without waiting on them: an AthenaQuery is a handle on a
+running query, and gather() waits on many of them together (one
+batch_get_query_execution call per poll for up to 50 queries, results read in
+parallel), so independent queries overlap instead of running back to back.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Union
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+from loguru import logger
+
+# Polling backoff: first check after ATHENA_POLL_INITIAL_DELAY seconds, doubling up to ATHENA_POLL_MAX_DELAY
+ATHENA_POLL_INITIAL_DELAY = float(os.getenv('ATHENA_POLL_INITIAL_DELAY', 0.25))
+ATHENA_POLL_MAX_DELAY = float(os.getenv('ATHENA_POLL_MAX_DELAY', 5))
+ATHENA_QUERY_TIMEOUT = float(os.getenv('ATHENA_QUERY_TIMEOUT', 30 * 60))  # seconds
+
+ATHENA_RUNNING_STATES = ('QUEUED', 'RUNNING')
+ATHENA_THROTTLING_ERRORS = ('ThrottlingException', 'TooManyRequestsException')
+
+# Results at most this size are read with get_query_results (a single call) instead of from S3
+ATHENA_RESULTS_API_MAX_BYTES = int(os.getenv('ATHENA_RESULTS_API_MAX_BYTES', 64 * 1024))
+ATHENA_RESULTS_PAGE_SIZE = 1000  # max rows per get_query_results call
+ATHENA_BATCH_GET_SIZE = 50  # max query ids per batch_get_query_execution call
+ATHENA_RESULT_READ_WORKERS = int(os.getenv('ATHENA_RESULT_READ_WORKERS', 8))  # concurrent result reads
+
+# Athena ColumnInfo types decoded to numpy / pandas dtypes (anything else stays a string)
+ATHENA_INTEGER_TYPES = ('tinyint', 'smallint', 'integer', 'bigint')
+ATHENA_FLOAT_TYPES = ('float', 'real', 'double', 'decimal')
+ATHENA_DATETIME_TYPES = ('date', 'timestamp')
+
+
+def poll_delay(attempt: int,
+               initial_delay: float = ATHENA_POLL_INITIAL_DELAY,
+               max_delay: float = ATHENA_POLL_MAX_DELAY):
+    """Seconds to wait before poll number `attempt` (0-based) - exponential w/ jitter"""
+
+    delay = min(max_delay, initial_delay * 2**attempt)
+    # Jitter keeps concurrent pollers from hitting the API in lockstep
+    return random.uniform(delay / 2, delay)
+
+
+def stop_query_execution(athena_client, query_execution_id: str):
+    """Cancel a query (errors are logged, not raised - the query may already be done)"""
+
+    try:
+        athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+        logger.warning(f'Stopped query {query_execution_id}')
+    except Exception as e:
+        logger.error(f'Error stopping query {query_execution_id}: {str(e)}')
+
+
+def log_query_statistics(query_execution: dict):
+    """Log the run time / queue time / data scanned of a finished query"""
+
+    statistics = query_execution.get('Statistics', {})
+    logger.info(
+        f"Query {query_execution['QueryExecutionId']} statistics: "
+        f"engine {statistics.get('EngineExecutionTimeInMillis', 0)} ms, "
+        f"queued {statistics.get('QueryQueueTimeInMillis', 0)} ms, "
+        f"total {statistics.get('TotalExecutionTimeInMillis', 0)} ms, "
+        f"scanned {statistics.get('DataScannedInBytes', 0)} bytes"
+        f"{' (reused a previous result)' if statistics.get('ResultReuseInformation', {}).get('ReusedPreviousResult') else ''}")
+
+
+def check_query_state(query_execution: dict) -> bool:
+    """Whether a query has SUCCEEDED (False while it is queued / running)
+
+    Raises:
+        ValueError: If the query FAILED or was CANCELLED (with Athena's reason)
+    """
+
+    status = query_execution['Status']
+    state = status['State']
+
+    if state == 'SUCCEEDED':
+        logger.info('Query Succeeded!')
+        log_query_statistics(query_execution)
+        return True
+
+    if state not in ATHENA_RUNNING_STATES:
+        reason = status.get('StateChangeReason', 'no reason given')
+        logger.error(f'Query {state}! {reason}')
+        log_query_statistics(query_execution)
+        raise ValueError(f"Query {query_execution['QueryExecutionId']} {state}! {reason}")
+
+    return False
+
+
+def wait_for_query_execution(athena_client,
+                             query_execution_id: str,
+                             timeout: float = ATHENA_QUERY_TIMEOUT):
+    """Wait for an Athena query to finish
+
+    Args:
+        athena_client (boto3.client): Athena client
+        query_execution_id (str): Id of the query execution
+        timeout (float): Seconds to wait before the query is stopped (None waits forever)
+
+    Returns:
+        (dict): The SUCCEEDED QueryExecution (incl. its 'Statistics')
+
+    Raises:
+        ValueError: If the query FAILED or was CANCELLED (with Athena's reason)
+        TimeoutError: If the query didn't finish within `timeout` (it is stopped)
+    """
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    attempt = 0
+
+    try:
+        while True:
+            time.sleep(poll_delay(attempt) if deadline is None else max(
+                0, min(poll_delay(attempt), deadline - time.monotonic())))
+            attempt += 1
+
+            try:
+                response = athena_client.get_query_execution(
+                    QueryExecutionId=query_execution_id)
+            except ClientError as e:
+                # Throttled polls just back off further
+                if e.response['Error']['Code'] not in ATHENA_THROTTLING_ERRORS:
+                    raise
+                logger.warning(f'Throttled polling query {query_execution_id}')
+                response = None
+
+            if response is not None and check_query_state(response['QueryExecution']):
+                return response['QueryExecution']
+
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.error(f'Query {query_execution_id} did not finish within {timeout} seconds')
+                stop_query_execution(athena_client, query_execution_id)
+                raise TimeoutError(
+                    f'Query {query_execution_id} did not finish within {timeout} seconds!')
+
+    except (KeyboardInterrupt, SystemExit):
+        # Don't leave the query running (and scanning) after the caller is gone
+        stop_query_execution(athena_client, query_execution_id)
+        raise
+
+
+def _paginate_query_results(athena_client, query_execution_id: str):
+    """Read query results through get_query_results (1000 rows per call)
+
+    Returns:
+        (Tuple[pd.DataFrame, List[dict]]): The results (as strings) & their ColumnInfo
+    """
+
+    paginator = athena_client.get_paginator('get_query_results')
+
+    column_info = None
+    query_results_data = []
+    for page in paginator.paginate(
+            QueryExecutionId=query_execution_id,
+            PaginationConfig={'PageSize': ATHENA_RESULTS_PAGE_SIZE}):
+        rows = page['ResultSet']['Rows']
+
+        # Only the first page starts with the header row
+        if column_info is None:
+            column_info = page['ResultSet']['ResultSetMetadata']['ColumnInfo']
+            rows = rows[1:]
+
+        query_results_data.extend([[
+            r['VarCharValue'] if 'VarCharValue' in r else np.nan
+            for r in row['Data']
+        ] for row in rows])
+
+    results_df = pd.DataFrame(query_results_data,
+                              columns=[col['Name'] for col in column_info])
+    return results_df, column_info
+
+
+def get_column_info(athena_client, query_execution_id: str) -> List[dict]:
+    """ResultSetMetadata ColumnInfo of a query's results (a single 1-row call)"""
+
+    response = athena_client.get_query_results(QueryExecutionId=query_execution_id,
+                                               MaxResults=1)
+    return response['ResultSet']['ResultSetMetadata']['ColumnInfo']
+
+
+def decode_column(values: pd.Series, athena_type: str) -> pd.Series:
+    """Convert a results column (strings, or Int64 / float64 from the csv reader) to the
+    dtype of its Athena type
+
+    Integers become nullable Int64 & booleans nullable boolean (NULLs are <NA>) whether
+    or not the column has NULLs, so every chunk of a chunked read gets the same dtypes.
+    Dates / timestamps become datetime64; values outside its range (ie. sentinel dates
+    like 0001-01-01 / 9999-12-31) become NaT & are logged.
+    """
+
+    athena_type = athena_type.lower()
+
+    if athena_type in ATHENA_INTEGER_TYPES:
+        # Straight from the strings - bigints don't round-trip through float64
+        return pd.to_numeric(values, dtype_backend='numpy_nullable').astype('Int64')
+    if athena_type in ATHENA_FLOAT_TYPES:
+        return pd.to_numeric(values).astype('float64')
+    if athena_type == 'boolean':
+        return values.map({'true': True, 'false': False}).astype('boolean')
+    if athena_type in ATHENA_DATETIME_TYPES:
+        decoded = pd.to_datetime(values, format='ISO8601', errors='coerce')
+        failed = decoded.isna() & values.notna()
+        if failed.any():
+            logger.warning(
+                f'Could not decode {failed.sum()} {athena_type} values of column {values.name} (ie. {values[failed].iloc[0]}), they are NaT'
+            )
+        return decoded
+    return values
+
+
+def decode_results(df: pd.DataFrame, column_info: List[dict]) -> pd.DataFrame:
+    """Convert every column of a results frame to the dtype of its Athena type"""
+
+    for col in column_info:
+        if col['Name'] in df.columns:
+            df[col['Name']] = decode_column(df[col['Name']], col['Type'])
+    return df
+
+
+def _read_results_csv(body, column_info: List[dict] = None, chunksize: int = None):
+    """Parse Athena's results csv (every value quoted, NULL = empty unquoted field)"""
+
+    # Let the csv parser produce numeric columns directly (no intermediate strings)
+    dtype = str
+    if column_info is not None:
+        dtype = {
+            col['Name']: 'Int64' if col['Type'].lower() in ATHENA_INTEGER_TYPES else
+            'float64' if col['Type'].lower() in ATHENA_FLOAT_TYPES else str
+            for col in column_info
+        }
+
+    return pd.read_csv(body,
+                       dtype=dtype,
+                       keep_default_na=False,
+                       na_values=[''],
+                       chunksize=chunksize)
+
+
+def read_query_results(
+        athena_client,
+        s3_client,
+        query_execution: dict,
+        chunksize: int = None,
+        typed: bool = True
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """Read the results of a SUCCEEDED query
+
+    Args:
+        athena_client (boto3.client): Athena client
+        s3_client (boto3.client): S3 client (to read the results csv)
+        query_execution (dict): The query's QueryExecution (see wait_for_query_execution)
+        chunksize (int): Return an iterator of dataframes of this many rows instead of
+            a single dataframe
+        typed (bool): Decode columns with their Athena types (False keeps every value
+            a string)
+
+    Returns:
+        (pd.DataFrame | Iterator[pd.DataFrame]): The query results
+    """
+
+    query_execution_id = query_execution['QueryExecutionId']
+    output_location = query_execution['ResultConfiguration']['OutputLocation']
+    url = urlsplit(output_location)
+    bucket, key = url.netloc, url.path.lstrip('/')
+
+    # Only SELECT-like queries write a results csv (DDL writes .txt, if anything)
+    size = None
+    if key.endswith('.csv'):
+        try:
+            size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+        except ClientError as e:
+            logger.warning(f'Error reading {output_location}, falling back to get_query_results: {str(e)}')
+
+    if size is None or size <= ATHENA_RESULTS_API_MAX_BYTES:
+        results_df, column_info = _paginate_query_results(athena_client,
+                                                          query_execution_id)
+        if typed:
+            results_df = decode_results(results_df, column_info)
+        return results_df if chunksize is None else iter([results_df])
+
+    column_info = get_column_info(athena_client, query_execution_id) if typed else None
+
+    logger.info(f'Reading query results from {output_location} ({size} bytes)')
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    results = _read_results_csv(response['Body'],
+                                column_info=column_info,
+                                chunksize=chunksize)
+
+    if not typed:
+        return results
+    if chunksize is None:
+        return decode_results(results, column_info)
+    return (decode_results(chunk, column_info) for chunk in results)
+
+
+class AthenaQuery:
+    """Handle on a submitted Athena query (wait on many of them at once with gather)
+
+    Args:
+        athena_client (boto3.client): Athena client the query was started with
+        s3_client (boto3.client): S3 client (to read the results csv)
+        query_execution_id (str): Id of the query execution
+        timeout (float): Seconds (from now) to wait before the query is stopped
+        chunksize (int): Read the results as an iterator of dataframes of this many rows
+        typed (bool): Decode columns with their Athena types
+        on_result (Callable[[pd.DataFrame], None]): Called with the results once read
+    """
+
+    def __init__(self,
+                 athena_client,
+                 s3_client,
+                 query_execution_id: str,
+                 timeout: float = ATHENA_QUERY_TIMEOUT,
+                 chunksize: int = None,
+                 typed: bool = True,
+                 on_result: Callable[[pd.DataFrame], None] = None):
+        self.athena_client = athena_client
+        self.s3_client = s3_client
+        self.query_execution_id = query_execution_id
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.chunksize = chunksize
+        self.typed = typed
+        self.on_result = on_result
+
+        self.query_execution = None  # the SUCCEEDED QueryExecution
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    @classmethod
+    def completed(cls, result):
+        """A handle that already holds its result (ie. served from a cache)"""
+        query = cls(None, None, None, timeout=None)
+        query._set_result(result)
+        return query
+
+    def _set_result(self, result):
+        self._result = result
+        self._done = True
+
+    def _set_exception(self, exception: BaseException):
+        self._exception = exception
+        self._done = True
+
+    def _read_results(self, query_execution: dict):
+        """Read the results of the SUCCEEDED execution (run on gather's thread pool)"""
+
+        try:
+            self.query_execution = query_execution
+            results = read_query_results(self.athena_client,
+                                         self.s3_client,
+                                         query_execution,
+                                         chunksize=self.chunksize,
+                                         typed=self.typed)
+            if self.on_result is not None:
+                self.on_result(results)
+            self._set_result(results)
+        except Exception as e:
+            logger.error(f'Error reading results of query {self.query_execution_id}: {str(e)}')
+            self._set_exception(e)
+
+    def done(self):
+        return self._done
+
+    def cancel(self):
+        """Stop the query (if it is still running)"""
+        if not self._done:
+            stop_query_execution(self.athena_client, self.query_execution_id)
+            self._set_exception(ValueError(f'Query {self.query_execution_id} CANCELLED!'))
+
+    def result(self):
+        """Wait for the query & return its results
+
+        Raises:
+            ValueError: If the query FAILED or was CANCELLED
+            TimeoutError: If the query didn't finish within its timeout (it is stopped)
+        """
+
+        if not self._done:
+            gather(self, return_exceptions=True)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+def _poll_queries(pending: dict):
+    """Poll every pending query once (one batch call per client & 50 ids)
+
+    Returns:
+        (List[Tuple[AthenaQuery, dict]]): The queries that SUCCEEDED & their QueryExecution
+    """
+
+    by_client = {}
+    for query in pending.values():
+        by_client.setdefault(id(query.athena_client), []).append(query)
+
+    succeeded = []
+    for queries in by_client.values():
+        athena_client = queries[0].athena_client
+        for i in range(0, len(queries), ATHENA_BATCH_GET_SIZE):
+            ids = [query.query_execution_id for query in queries[i:i + ATHENA_BATCH_GET_SIZE]]
+            try:
+                response = athena_client.batch_get_query_execution(QueryExecutionIds=ids)
+            except ClientError as e:
+                # Throttled polls just back off further
+                if e.response['Error']['Code'] not in ATHENA_THROTTLING_ERRORS:
+                    raise
+                logger.warning(f'Throttled polling {len(ids)} queries')
+                continue
+
+            for query_execution in response['QueryExecutions']:
+                query = pending[query_execution['QueryExecutionId']]
+                try:
+                    if not check_query_state(query_execution):
+                        continue
+                except ValueError as e:
+                    query._set_exception(e)
+                else:
+                    succeeded.append((query, query_execution))
+                del pending[query.query_execution_id]
+
+    return succeeded
+
+
+def gather(*queries: AthenaQuery, return_exceptions: bool = False) -> list:
+    """Wait for many submitted queries at once & return their results (in order)
+
+    Every poll checks all the pending queries together, and the results of each query
+    are read on a thread pool as soon as it succeeds, so the total time is about that of
+    the slowest query rather than the sum of all of them.
+
+    Args:
+        *queries (AthenaQuery): Submitted queries
+        return_exceptions (bool): Return a failed query's exception in place of its
+            results instead of raising it
+
+    Returns:
+        (list): Each query's results (pd.DataFrame, or iterator when chunked)
+
+    Raises:
+        ValueError / TimeoutError: The first failure (once every query is done), unless
+            return_exceptions is set
+    """
+
+    pending = {query.query_execution_id: query for query in queries if not query.done()}
+    attempt = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=ATHENA_RESULT_READ_WORKERS) as executor:
+            while pending:
+                deadlines = [query.deadline for query in pending.values()
+                             if query.deadline is not None]
+                delay = poll_delay(attempt)
+                if deadlines:
+                    delay = max(0, min(delay, min(deadlines) - time.monotonic()))
+                time.sleep(delay)
+                attempt += 1
+
+                for query, query_execution in _poll_queries(pending):
+                    executor.submit(query._read_results, query_execution)
+
+                # Stop the queries that ran out of time
+                now = time.monotonic()
+                for query in list(pending.values()):
+                    if query.deadline is not None and now >= query.deadline:
+                        logger.error(f'Query {query.query_execution_id} did not finish within {query.timeout} seconds')
+                        stop_query_execution(query.athena_client, query.query_execution_id)
+                        query._set_exception(TimeoutError(
+                            f'Query {query.query_execution_id} did not finish within {query.timeout} seconds!'))
+                        del pending[query.query_execution_id]
+
+    except BaseException:
+        # Don't leave queries running (and scanning) after the caller is gone
+        for query in pending.values():
+            stop_query_execution(query.athena_client, query.query_execution_id)
+        raise
+
+    results = []
+    for query in queries:
+        if query._exception is not None:
+            if not return_exceptions:
+                raise query._exception
+            results.append(query._exception)
+        else:
+            results.append(query._result)
+    return results
@@ -0,0 +1,61 @@
+"""
+Process-wide boto3 clients (S3, Athena, Glue, SNS).
+
+Building a boto3 client costs tens of milliseconds plus credential resolution, and the
+jobs used to build one for every S3 write / Athena query / alert.  get_aws_client
+returns one cached client per (service, region), created from a single shared
+boto3 Session.  boto3 clients are thread-safe, so the cached clients are shared by the
+thread pools that write partitions, delete prefixes & read objects concurrently.
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import boto3
+from botocore.config import Config
+
+AWS_REGION = 'us-east-1'
+
+# Connection pool size per client (should be >= the number of threads sharing a client)
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 32))
+
+_session = None
+_clients: Dict[Tuple[str, str], object] = {}
+_lock = threading.Lock()
+
+
+def get_aws_session() -> boto3.session.Session:
+    """Shared boto3 Session (credentials from AWS_ACCESS_KEY / AWS_ACCESS_SECRET when set,
+    otherwise boto3's default credential chain)"""
+
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session(
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
+                aws_secret_access_key=os.getenv('AWS_ACCESS_SECRET'))
+        return _session
+
+
+def get_aws_client(service: str, region: str = AWS_REGION):
+    """Cached boto3 client for a service & region
+
+    Args:
+        service (str): boto3 service name (ie. 's3', 'athena', 'glue', 'sns')
+        region (str): AWS region
+
+    Returns:
+        (botocore.client.BaseClient): The shared client
+    """
+
+    session = get_aws_session()
+
+    key = (service, region)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = session.client(
+                service,
+                region_name=region,
+                config=Config(max_pool_connections=AWS_MAX_POOL_CONNECTIONS))
+        return _clients[key]
@@ -12,6 +12,10 @@
 set -euo pipefail
 
 LOOKBACK=${1:-30}
+
+# Snapshot jobs (inventory, active variant SKUs) re-pull the same current snapshot for
+# every missing date; one run id lets them all reuse the cached API responses
+export CONNECTOR_SNAPSHOT_RUN_ID=${CONNECTOR_SNAPSHOT_RUN_ID:-backfill-$(date -u +%Y%m%dT%H%M%SZ)}
 echo "========================================================"
 echo " Prymal full backfill — lookback: ${LOOKBACK} days"
 echo " $(date -u +%Y-%m-%dT%H:%M:%SZ)"
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark the connector functions offline against recorded API fixtures.
+
+Record mode runs each connector once against the live APIs (credentials from the
+usual job environment variables) and saves the scrubbed responses to
+{fixtures_dir}/{case}.jsonl.gz (see replay.py).  Replay mode runs each connector
+against its fixture with the recorded latency scaled by --latency_scale, and reports
+wall time, rows/sec, requests served and peak traced memory per connector.
+
+Usage:
+  python3 src/benchmarks/replay_connectors.py --record --start_date 2024-10-01 --end_date 2024-10-02
+  python3 src/benchmarks/replay_connectors.py --start_date 2024-10-01 --end_date 2024-10-02
+  python3 src/benchmarks/replay_connectors.py --cases shipbob_orders --latency_scale 0 --repeat 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# utils reads AWS credentials at import time; no AWS calls are made here
+os.environ.setdefault('AWS_ACCESS_KEY', 'benchmark')
+os.environ.setdefault('AWS_ACCESS_SECRET', 'benchmark')
+
+# Benchmarks must always hit the fixtures, never the on-disk response cache
+os.environ.pop('CONNECTOR_CACHE_DIR', None)
+os.environ.pop('CONNECTOR_SNAPSHOT_RUN_ID', None)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+from connectors import KLAVIYO_REVISION
+from klayvio.utils import list_all_campaigns
+from replay import record_fixtures, replay_fixtures
+from utils import (get_shipbob_inventory, get_shipbob_orders_by_date,
+                   get_shopify_orders_by_date, list_active_shopify_variant_skus,
+                   list_all_shipbob_products)
+
+DEFAULT_FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def credentials(record: bool):
+    """Live credentials when recording, placeholders when replaying"""
+    if not record:
+        return {
+            'shipbob_api_secret': 'replay',
+            'shopify_api_key': 'replay',
+            'shopify_api_pw': 'replay',
+            'klaviyo_api_key': 'replay'
+        }
+    return {
+        'shipbob_api_secret': os.getenv('SHIPBOB_API_SECRET'),
+        'shopify_api_key': os.getenv('SHOPIFY_API_KEY'),
+        'shopify_api_pw': os.getenv('SHOPIFY_API_PW'),
+        'klaviyo_api_key': os.getenv('KLAYVIO_API_KEY')
+    }
+
+
+def build_cases(creds: dict, start_date: str, end_date: str):
+    """Connector calls to benchmark, keyed by case (fixture) name"""
+    klaviyo_headers = {
+        'Content-Type': 'application/json',
+        'accept': 'application/vnd.api+json',
+        'Authorization': f"Klaviyo-API-Key {creds['klaviyo_api_key']}",
+        'revision': KLAVIYO_REVISION
+    }
+    return {
+        'shipbob_inventory':
+        lambda: get_shipbob_inventory(creds['shipbob_api_secret']),
+        'shipbob_products':
+        lambda: list_all_shipbob_products(creds['shipbob_api_secret']),
+        'shipbob_orders':
+        lambda: get_shipbob_orders_by_date(creds['shipbob_api_secret'],
+                                           start_date, end_date),
+        'shopify_orders':
+        lambda: get_shopify_orders_by_date(creds['shopify_api_key'],
+                                           creds['shopify_api_pw'],
+                                           start_date, end_date),
+        'shopify_active_skus':
+        lambda: list_active_shopify_variant_skus(creds['shopify_api_key'],
+                                                 creds['shopify_api_pw'], None),
+        'klaviyo_campaigns':
+        lambda: list_all_campaigns(klaviyo_headers)
+    }
+
+
+def count_rows(result):
+    """Number of records returned by a connector (summed over tuples of frames)"""
+    if isinstance(result, tuple):
+        return sum(count_rows(r) for r in result)
+    if result is None:
+        return 0
+    return len(result)
+
+
+def run_case(fn, fixture_path: str, latency_scale: float, repeat: int):
+    """Replay one connector `repeat` times, returning its measurements"""
+    timings = []
+    peaks = []
+    rows = 0
+    requests_served = 0
+
+    for _ in range(repeat):
+        with replay_fixtures(fixture_path, latency_scale) as adapter:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        rows = count_rows(result)
+        requests_served = adapter.requests_served
+
+    median = statistics.median(timings)
+    return {
+        'rows': rows,
+        'requests': requests_served,
+        'median_s': round(median, 4),
+        'rows_per_s': round(rows / median) if median else None,
+        'peak_mb': round(max(peaks) / 1e6, 2)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases',
+                        nargs='+',
+                        default=None,
+                        help='Cases to run (default: all)')
+    parser.add_argument('--fixtures_dir', default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument('--record',
+                        action='store_true',
+                        help='Record fixtures from the live APIs')
+    parser.add_argument('--start_date', default='2024-10-01')
+    parser.add_argument('--end_date', default='2024-10-02')
+    parser.add_argument('--latency_scale',
+                        type=float,
+                        default=1.0,
+                        help='Multiplier on recorded latency (0 = no delay)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    creds = credentials(args.record)
+    cases = build_cases(creds, args.start_date, args.end_date)
+    selected = args.cases or list(cases)
+
+    results = []
+    for name in selected:
+        fixture_path = os.path.join(args.fixtures_dir, f'{name}.jsonl.gz')
+
+        if args.record:
+            with record_fixtures(fixture_path, secrets=creds.values()):
+                cases[name]()
+            continue
+
+        if not os.path.exists(fixture_path):
+            print(f'{name}: no fixture at {fixture_path} (run with --record)')
+            continue
+
+        print(f'Replaying {name} ...')
+        results.append({
+            'case': name,
+            **run_case(cases[name], fixture_path, args.latency_scale,
+                       args.repeat)
+        })
+
+    if results:
+        print()
+        print(pd.DataFrame(results).to_string(index=False))
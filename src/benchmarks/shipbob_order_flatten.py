@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for flattening ShipBob order pages into the order details dataframe.
+
+Generates synthetic /order pages and times the column buffer flattener used by
+utils.get_shipbob_orders_by_date at increasing inventory-item row counts (up to 1M).
+Time per row should stay flat as the row count grows (linear scaling).  The legacy
+one-row-DataFrame + pd.concat approach is timed at small sizes for comparison.
+
+Usage:
+  python3 src/benchmarks/shipbob_order_flatten.py
+  python3 src/benchmarks/shipbob_order_flatten.py --sizes 10000 100000 1000000 --legacy_sizes 1000 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+# utils reads AWS credentials at import time; none are needed to benchmark parsing
+os.environ.setdefault('AWS_ACCESS_KEY', 'benchmark')
+os.environ.setdefault('AWS_ACCESS_SECRET', 'benchmark')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+from utils import (SHIPBOB_ORDER_DETAIL_COLUMNS, _flatten_shipbob_orders,
+                   _to_datetime_column)
+
+PAGE_SIZE = 250  # orders per page
+ITEMS_PER_ORDER = 4  # 2 products x 2 inventory items
+
+
+def make_order(order_id: int):
+    """Build a synthetic ShipBob order record with ITEMS_PER_ORDER inventory items"""
+    return {
+        'id': order_id,
+        'created_date': '2024-10-27T14:33:12.123+00:00',
+        'purchase_date': '2024-10-27T14:30:00+00:00',
+        'order_number': f'#{order_id}',
+        'status': 'Fulfilled',
+        'type': 'DTC',
+        'shipping_method': 'Standard',
+        'channel': {'id': 1, 'name': 'Shopify'},
+        'recipient': {
+            'name': 'Jane Doe',
+            'email': 'jane@example.com',
+            'address': {'city': 'Austin', 'state': 'TX', 'country': 'US'}
+        },
+        'shipments': [{
+            'products': [{
+                'id': 100 + p,
+                'sku': f'SKU-{p}',
+                'name': f'Product {p}',
+                'inventory_items': [{
+                    'id': 1000 + p * 10 + i,
+                    'quantity': 1,
+                    'name': f'Inventory {p}-{i}'
+                } for i in range(2)]
+            } for p in range(2)]
+        }]
+    }
+
+
+def make_pages(n_rows: int):
+    """Build enough pages of synthetic orders to produce n_rows inventory-item rows"""
+    n_orders = n_rows // ITEMS_PER_ORDER
+    orders = [make_order(i) for i in range(n_orders)]
+    return [orders[i:i + PAGE_SIZE] for i in range(0, n_orders, PAGE_SIZE)]
+
+
+def flatten_buffered(pages: list):
+    """Current implementation: column buffers, single frame build"""
+    buffers = {col: [] for col in SHIPBOB_ORDER_DETAIL_COLUMNS}
+    for page in pages:
+        _flatten_shipbob_orders(page, buffers)
+    df = pd.DataFrame(buffers, columns=SHIPBOB_ORDER_DETAIL_COLUMNS)
+    df['created_date'] = _to_datetime_column(buffers['created_date'])
+    df['purchase_date'] = _to_datetime_column(buffers['purchase_date'])
+    return df
+
+
+def flatten_legacy(pages: list):
+    """Previous implementation: one-row DataFrame + pd.concat per inventory item"""
+    df = pd.DataFrame(columns=SHIPBOB_ORDER_DETAIL_COLUMNS)
+    for page in pages:
+        buffers = {col: [] for col in SHIPBOB_ORDER_DETAIL_COLUMNS}
+        _flatten_shipbob_orders(page, buffers)
+        for i in range(len(buffers['shipbob_order_id'])):
+            df_rec = pd.DataFrame(
+                {col: [buffers[col][i]]
+                 for col in SHIPBOB_ORDER_DETAIL_COLUMNS})
+            df = pd.concat([df, df_rec])
+    return df
+
+
+def time_it(fn, pages: list):
+    start = time.perf_counter()
+    df = fn(pages)
+    return time.perf_counter() - start, len(df)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark ShipBob order flattening')
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        default=[10_000, 100_000, 250_000, 500_000, 1_000_000],
+                        help='Inventory-item row counts for the buffered flattener')
+    parser.add_argument('--legacy_sizes',
+                        type=int,
+                        nargs='*',
+                        default=[1_000, 2_000, 4_000],
+                        help='Row counts for the legacy concat flattener (quadratic)')
+    args = parser.parse_args()
+
+    print(f"{'impl':<10}{'rows':>12}{'seconds':>12}{'us/row':>10}")
+
+    for n in args.legacy_sizes:
+        elapsed, rows = time_it(flatten_legacy, make_pages(n))
+        print(f"{'legacy':<10}{rows:>12,}{elapsed:>12.3f}{elapsed / rows * 1e6:>10.2f}")
+
+    for n in args.sizes:
+        elapsed, rows = time_it(flatten_buffered, make_pages(n))
+        print(f"{'buffered':<10}{rows:>12,}{elapsed:>12.3f}{elapsed / rows * 1e6:>10.2f}")
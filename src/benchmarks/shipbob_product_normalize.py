@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for normalizing ShipBob /product records into the product-to-inventory
+dataframe returned by utils.list_all_shipbob_products.
+
+Compares the previous per-record pd.json_normalize + pd.concat approach with the
+single-pass normalize_shipbob_products on a synthetic catalog (50k products by default)
+and checks that both produce the same rows.
+
+Usage:
+  python3 src/benchmarks/shipbob_product_normalize.py
+  python3 src/benchmarks/shipbob_product_normalize.py --products 50000 --legacy_products 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+# utils reads AWS credentials at import time; none are needed to benchmark parsing
+os.environ.setdefault('AWS_ACCESS_KEY', 'benchmark')
+os.environ.setdefault('AWS_ACCESS_SECRET', 'benchmark')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+from utils import SHIPBOB_PRODUCT_INVENTORY_COLUMNS, normalize_shipbob_products
+
+
+def make_products(n_products: int):
+    """Build synthetic ShipBob product records (1-3 inventory items each)"""
+    return [{
+        'id': i,
+        'sku': f'SKU-{i}',
+        'name': f'Product {i}',
+        'channel': {'id': i % 3, 'name': f'Channel {i % 3}'},
+        'fulfillable_inventory_items': [{
+            'id': i * 10 + j,
+            'name': f'Inventory {i}-{j}',
+            'quantity': j
+        } for j in range(1 + i % 3)]
+    } for i in range(n_products)]
+
+
+def normalize_legacy(products: list):
+    """Previous implementation: json_normalize + concat once per product record"""
+    product_to_inventory_df = pd.DataFrame(
+        columns=SHIPBOB_PRODUCT_INVENTORY_COLUMNS)
+    for rec in products:
+        inventory_items = pd.json_normalize(rec['fulfillable_inventory_items'])
+        inventory_items.columns = ['inventory_id', 'inventory_name', 'inventory_qty']
+        inventory_items['product_id'] = rec['id']
+        inventory_items['sku'] = rec['sku']
+        inventory_items['sku_name'] = rec['name']
+        inventory_items['channel_id'] = rec['channel']['id']
+        inventory_items['channel_name'] = rec['channel']['name']
+        product_to_inventory_df = pd.concat(
+            [product_to_inventory_df, inventory_items])
+    return product_to_inventory_df.reset_index(drop=True)
+
+
+def time_it(fn, products: list):
+    start = time.perf_counter()
+    df = fn(products)
+    return time.perf_counter() - start, df
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark ShipBob product normalization')
+    parser.add_argument('--products',
+                        type=int,
+                        default=50_000,
+                        help='Number of synthetic products for the single-pass normalizer')
+    parser.add_argument('--legacy_products',
+                        type=int,
+                        default=50_000,
+                        help='Number of synthetic products for the legacy normalizer (quadratic - lower this for a quick run)')
+    args = parser.parse_args()
+
+    legacy_elapsed, legacy_df = time_it(normalize_legacy,
+                                        make_products(args.legacy_products))
+    print(f'legacy     {args.legacy_products:>8,} products  {len(legacy_df):>8,} rows  {legacy_elapsed:8.3f}s')
+
+    elapsed, df = time_it(normalize_shipbob_products,
+                          make_products(args.products))
+    print(f'vectorized {args.products:>8,} products  {len(df):>8,} rows  {elapsed:8.3f}s')
+
+    # Same rows either way (compared on the legacy sized catalog)
+    check_df = normalize_shipbob_products(make_products(args.legacy_products))
+    pd.testing.assert_frame_equal(check_df.astype(str),
+                                  legacy_df[SHIPBOB_PRODUCT_INVENTORY_COLUMNS].astype(str))
+    print('outputs match')
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Small-file compaction for the Hive-partitioned tables in S3.
+
+Every daily job adds one small object per partition, so after a few years a table is
+thousands of tiny files that Athena has to list & open on every query.  The compactor
+rolls a month of daily partitions up into size-targeted Parquet files in one partition
+of a monthly rollup table, then points the rollup table's Glue partition at the new
+files in a single update_partition call, so readers see either the previous version or
+the new one (never a half-written month).  The previous version is deleted afterwards.
+
+Files are written under s3://<bucket>/compacted/<rollup_table>/_runs/<run_id>/..., so
+MSCK REPAIR TABLE never picks up a half-written run - the compactor is the only thing
+that manages the rollup tables' partitions.
+
+Cut-over: a daily partition can't be pointed at a month of files (every day would read
+the whole month), so the rollup is read through the <table>_all view (created on every
+run): the daily table's months that are not in the rollup UNION ALL the rollup, with the
+daily table's columns & types.  The view skips daily months that are already in the
+rollup, so a month is never counted twice.  Consumers still read the daily tables - they
+move to the views once compaction runs on a schedule.  Source partitions are kept by
+default: gap_detector (& the backfills driven by it) checks the daily tables, so a
+retired day would look missing & be re-pulled.  With --retire_source, a month's daily
+Glue partitions & source objects are dropped once it is swapped in - only once the
+consumers & gap detection read the views.  A daily job that rewrites a day of an already
+compacted month lands in the daily table again; the next compaction of that month
+merges it into the rollup (replacing the day).
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain
+from io import BytesIO
+from typing import Dict, Iterable, List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytz
+import yaml
+from loguru import logger
+from pydantic import BaseModel
+
+# Add the src/ directory to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(script_dir))
+
+from aws_clients import get_aws_client
+from s3_multipart import S3MultipartWriter
+from utils import (ATHENA_TYPES, GLUE_STORAGE_FORMATS, arrow_schema_to_parquet_ddl,
+                   ddl_arrow_schema, delete_s3_data, run_athena_query_no_results)
+
+COMPACTED_ROOT = 'compacted'
+COMPACTION_READ_WORKERS = int(os.getenv('COMPACTION_READ_WORKERS', 16))  # concurrent object reads
+COMPACTION_ROW_GROUP_ROWS = 100000
+GLUE_BATCH_DELETE_PARTITIONS = 25  # batch_delete_partition limit
+S3_DELETE_OBJECTS_KEYS = 1000  # delete_objects limit
+
+# Glue column types that are spelled differently in Athena (Trino) CASTs
+VIEW_CAST_TYPES = {'string': 'varchar', 'int': 'integer', 'float': 'real'}
+
+
+class TableCompactionConfig(BaseModel):
+    name: str
+    location: str
+    partition_columns: List[str]
+    ddl: str  # the daily table's DDL, relative to src/
+    rollup_table: str
+    rollup_partition_columns: List[str]
+    view: str = None  # defaults to <name>_all
+
+    @property
+    def view_name(self):
+        return self.view or f'{self.name}_all'
+
+
+class CompactionConfig(BaseModel):
+    target_file_mb: int = 128
+    tables: List[TableCompactionConfig]
+
+
+def load_compaction_config(config_path: str) -> CompactionConfig:
+    """Load & validate the compaction config (YAML)"""
+
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"Config file not found: {config_path}")
+
+    with open(config_path, 'r') as f:
+        config_data = yaml.safe_load(f)
+
+    try:
+        return CompactionConfig(**config_data)
+    except Exception as e:
+        raise ValueError("Configuration validation error: " + str(e))
+
+
+def _coerce_column(values: pd.Series, arrow_type: pa.DataType):
+    """Convert a column read from csv (strings) or Parquet to the given arrow type"""
+
+    if pa.types.is_integer(arrow_type):
+        return pd.to_numeric(values).astype('Int64')
+    if pa.types.is_floating(arrow_type):
+        return pd.to_numeric(values).astype('float64')
+    if pa.types.is_boolean(arrow_type):
+        return values.map(lambda v: v if isinstance(v, bool) or pd.isna(v)
+                          else str(v).lower() == 'true').astype('boolean')
+    if pa.types.is_timestamp(arrow_type):
+        return pd.to_datetime(values, utc=True,
+                              format='mixed').dt.tz_localize(None)
+    if pa.types.is_date(arrow_type):
+        return pd.to_datetime(values).dt.date
+    return values.where(values.isna(), values.astype(str))
+
+
+class TableCompactor:
+    """Rolls a table's daily partitions up into monthly Parquet partitions"""
+
+    def __init__(self, table: TableCompactionConfig, target_file_mb: int = 128,
+                 run_id: str = None, retire_source: bool = False):
+        self.table = table
+        self.retire_source = retire_source
+        self.target_file_bytes = target_file_mb * 1024 * 1024
+        self.run_id = run_id or datetime.now(pytz.utc).strftime('%Y%m%dT%H%M%S')
+
+        self.s3_bucket = os.getenv("S3_BUCKET_NAME")
+        self.database = os.getenv("GLUE_DATABASE_NAME")
+        self.region = 'us-east-1'
+
+        self.s3_client = get_aws_client('s3', self.region)
+        self.glue_client = get_aws_client('glue', self.region)
+
+        self.schema = self._rollup_schema()
+
+    # ---- schema ----
+
+    def _rollup_schema(self) -> pa.Schema:
+        """DDL columns (the daily table's types) + the source partition columns that become data columns"""
+
+        schema = ddl_arrow_schema(os.path.join(os.path.dirname(script_dir), self.table.ddl))
+
+        for column in self.table.partition_columns:
+            if column in self.table.rollup_partition_columns or column in schema.names:
+                continue
+            # A single partition column is the partition date, anything else (ie. day) is kept as-is
+            if len(self.table.partition_columns) == 1:
+                schema = schema.append(pa.field(column, pa.date32()))
+            else:
+                schema = schema.append(pa.field(column, pa.string()))
+
+        return schema
+
+    def _glue_columns(self):
+        return [{
+            'Name': field.name,
+            'Type': ATHENA_TYPES[field.type].lower()
+        } for field in self.schema]
+
+    def rollup_location(self):
+        return f's3://{self.s3_bucket}/{COMPACTED_ROOT}/{self.table.rollup_table}/'
+
+    def create_rollup_table(self):
+        """Create (if not exists) the rollup table"""
+
+        query = arrow_schema_to_parquet_ddl(
+            self.schema, self.table.rollup_table, self.rollup_location(),
+            {column: 'STRING' for column in self.table.rollup_partition_columns})
+
+        run_athena_query_no_results(bucket=self.s3_bucket,
+                                    query=query,
+                                    database=self.database,
+                                    region=self.region)
+
+    def _month_expression(self):
+        """SQL expression for the month (YYYY-MM) of a row - valid on the daily & rollup table"""
+
+        columns = self.table.partition_columns
+        if columns[:2] == ['year', 'month']:
+            return "concat(\"year\", '-', \"month\")"
+        return f'substr(CAST("{columns[0]}" AS varchar), 1, 7)'
+
+    def create_view(self):
+        """Create (or replace) the view over the daily table's open months & the rollup
+
+        The view has the daily table's columns & types (the rollup's columns are cast to
+        them), so readers of history can switch from the daily table to the view as-is.
+        """
+
+        response = self.glue_client.get_table(DatabaseName=self.database,
+                                              Name=self.table.name)
+        table = response['Table']
+        columns = table['StorageDescriptor']['Columns'] + table.get('PartitionKeys', [])
+
+        rollup_columns = []
+        for column in columns:
+            column_type = VIEW_CAST_TYPES.get(column['Type'].lower(), column['Type'])
+            source = f'"{column["Name"]}"' if column['Name'] in self.schema.names else 'NULL'
+            rollup_columns.append(f'CAST({source} AS {column_type}) AS "{column["Name"]}"')
+
+        month = self._month_expression()
+        query = f"""
+        CREATE OR REPLACE VIEW {self.table.view_name} AS
+        SELECT {', '.join(f'"{column["Name"]}"' for column in columns)}
+        FROM {self.table.name}
+        WHERE {month} NOT IN (SELECT DISTINCT {month} FROM {self.table.rollup_table} WHERE {month} IS NOT NULL)
+        UNION ALL
+        SELECT {', '.join(rollup_columns)}
+        FROM {self.table.rollup_table}
+        """
+
+        run_athena_query_no_results(bucket=self.s3_bucket,
+                                    query=query,
+                                    database=self.database,
+                                    region=self.region)
+
+    # ---- partitions ----
+
+    def _source_prefix(self, month: str):
+        """Listing prefix that covers every source partition of a month (YYYY-MM)"""
+
+        columns = self.table.partition_columns
+        if columns[:2] == ['year', 'month']:
+            return f"{self.table.location}/year={month[:4]}/month={month[5:7]}/"
+        return f"{self.table.location}/{columns[0]}={month}"
+
+    def _parse_partition(self, key: str) -> Dict[str, str]:
+        """Partition values of an object key ('<location>/col=value/.../file')"""
+
+        relative = key[len(self.table.location) + 1:]
+        values = dict(
+            part.split('=', 1) for part in relative.split('/')[:-1] if '=' in part)
+        return {column: values.get(column) for column in self.table.partition_columns}
+
+    def _rollup_partition(self, month: str) -> Dict[str, str]:
+        """Rollup partition values for a month (YYYY-MM)"""
+
+        values = {}
+        for column in self.table.rollup_partition_columns:
+            if column == 'year':
+                values[column] = month[:4]
+            elif column == 'month':
+                values[column] = month[5:7]
+            else:
+                values[column] = month
+        return values
+
+    def list_source_objects(self, month: str):
+        """List the data objects of every source partition of a month"""
+
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+
+        objects = []
+        for page in paginator.paginate(Bucket=self.s3_bucket,
+                                       Prefix=self._source_prefix(month)):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith(('.csv', '.parquet')):
+                    objects.append(obj)
+        return objects
+
+    def _read_object(self, key: str):
+        """Read one source object, adding its partition values as columns"""
+
+        response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=key)
+        if key.endswith('.parquet'):
+            df = pq.read_table(BytesIO(response['Body'].read())).to_pandas()
+        else:
+            df = pd.read_csv(response['Body'], dtype=str)
+
+        for column, value in self._parse_partition(key).items():
+            df[column] = value
+        return self._to_rollup_table(df)
+
+    def _to_rollup_table(self, df: pd.DataFrame) -> pa.Table:
+        """Coerce a frame read from a source object to the rollup schema"""
+
+        for field in self.schema:
+            if field.name not in df.columns:
+                df[field.name] = None
+            df[field.name] = _coerce_column(df[field.name], field.type)
+
+        return pa.Table.from_pandas(df[self.schema.names],
+                                    schema=self.schema,
+                                    preserve_index=False)
+
+    def _read_previous_rollup(self, location: str, replaced: List[str]):
+        """Rows of the month's current rollup files whose source partition was not re-read
+
+        Args:
+            location (str): The rollup partition's current location (s3://...)
+            replaced (List[str]): Values of the last source partition column (ie. the days)
+                that are in the daily table again & replace the rollup's rows
+        """
+
+        prefix = location[len(f's3://{self.s3_bucket}/'):]
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        day_column = self.table.partition_columns[-1]
+
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('.parquet'):
+                    continue
+                response = self.s3_client.get_object(Bucket=self.s3_bucket,
+                                                     Key=obj['Key'])
+                parquet_file = pq.ParquetFile(BytesIO(response['Body'].read()))
+
+                for batch in parquet_file.iter_batches(
+                        batch_size=COMPACTION_ROW_GROUP_ROWS,
+                        columns=self.schema.names):
+                    table = pa.Table.from_batches([batch]).cast(self.schema)
+                    replaced_rows = pc.is_in(pc.cast(table[day_column], pa.string()),
+                                             value_set=pa.array(replaced, pa.string()))
+                    yield table.filter(pc.invert(pc.fill_null(replaced_rows, False)))
+
+    def read_month(self, objects: list) -> Iterable[pa.Table]:
+        """Read the source objects of a month, one table (with the rollup schema) per object
+
+        Objects are read in key (ie. partition) order, so row groups prune well on the
+        partition column, & at most COMPACTION_READ_WORKERS objects are held at once.
+        """
+
+        keys = sorted(obj['Key'] for obj in objects)
+
+        with ThreadPoolExecutor(max_workers=COMPACTION_READ_WORKERS) as executor:
+            for start in range(0, len(keys), COMPACTION_READ_WORKERS):
+                yield from executor.map(self._read_object,
+                                        keys[start:start + COMPACTION_READ_WORKERS])
+
+    def write_files(self, tables: Iterable[pa.Table], prefix: str):
+        """Write a stream of tables as Parquet files of about target_file_bytes each
+
+        Small tables (ie. one per daily object) are buffered up to COMPACTION_ROW_GROUP_ROWS
+        rows so each row group is full sized.
+
+        Returns:
+            (List[str], int): The keys written & the number of rows
+        """
+
+        keys = []
+        rows = 0
+        sink = writer = None
+        buffered = []
+
+        def flush():
+            nonlocal sink, writer
+            batch = pa.concat_tables(buffered).combine_chunks()
+            buffered.clear()
+
+            if writer is None:
+                keys.append(f'{prefix}part-{len(keys):05d}.parquet')
+                sink = S3MultipartWriter(
+                    s3_client=self.s3_client,
+                    bucket=self.s3_bucket,
+                    key=keys[-1],
+                    content_type='application/vnd.apache.parquet')
+                writer = pq.ParquetWriter(sink, self.schema, compression='snappy')
+
+            writer.write_table(batch, row_group_size=COMPACTION_ROW_GROUP_ROWS)
+
+            # Start a new file once this one reaches the target size
+            if sink.tell() >= self.target_file_bytes:
+                writer.close()
+                sink.close()
+                sink = writer = None
+
+        try:
+            for table in tables:
+                if table.num_rows == 0:
+                    continue
+                buffered.append(table)
+                rows += table.num_rows
+                if sum(t.num_rows for t in buffered) >= COMPACTION_ROW_GROUP_ROWS:
+                    flush()
+
+            if buffered:
+                flush()
+
+            if writer is not None:
+                writer.close()
+                sink.close()
+
+        except Exception:
+            if sink is not None:
+                sink.abort()
+            raise
+
+        return keys, rows
+
+    def rollup_partition_location(self, partition_values: List[str]):
+        """Current location of a rollup partition (None if it does not exist)"""
+
+        try:
+            response = self.glue_client.get_partition(
+                DatabaseName=self.database,
+                TableName=self.table.rollup_table,
+                PartitionValues=partition_values)
+            return response['Partition']['StorageDescriptor']['Location']
+        except self.glue_client.exceptions.EntityNotFoundException:
+            return None
+
+    def swap_partition(self, partition_values: List[str], location: str,
+                       previous_location: str = None):
+        """Point the rollup table's partition at `location` (creating it if needed)
+
+        Args:
+            partition_values (List[str]): Values of the rollup partition
+            location (str): The new location (s3://...)
+            previous_location (str): The partition's current location (None if it does not exist)
+        """
+
+        partition_input = {
+            'Values': partition_values,
+            'StorageDescriptor': {
+                'Columns': self._glue_columns(),
+                'Location': location,
+                **GLUE_STORAGE_FORMATS['parquet']
+            }
+        }
+
+        if previous_location is None:
+            self.glue_client.create_partition(
+                DatabaseName=self.database,
+                TableName=self.table.rollup_table,
+                PartitionInput=partition_input)
+        else:
+            self.glue_client.update_partition(
+                DatabaseName=self.database,
+                TableName=self.table.rollup_table,
+                PartitionValueList=partition_values,
+                PartitionInput=partition_input)
+
+    def retire_source_partitions(self, objects: list):
+        """Drop the daily table's Glue partitions of the compacted objects & delete them
+
+        Only the objects that were compacted are deleted - anything written to the month
+        since it was listed stays in the daily table until the next compaction.
+        """
+
+        partitions = sorted({
+            tuple(self._parse_partition(obj['Key']).values()) for obj in objects
+        })
+        for start in range(0, len(partitions), GLUE_BATCH_DELETE_PARTITIONS):
+            response = self.glue_client.batch_delete_partition(
+                DatabaseName=self.database,
+                TableName=self.table.name,
+                PartitionsToDelete=[{
+                    'Values': list(values)
+                } for values in partitions[start:start + GLUE_BATCH_DELETE_PARTITIONS]])
+            # Partitions that were never registered (ie. before MSCK REPAIR) are fine
+            errors = [
+                error for error in response.get('Errors', [])
+                if error['ErrorDetail']['ErrorCode'] != 'EntityNotFoundException'
+            ]
+            if errors:
+                logger.error(f'Error dropping {self.table.name} partitions: {errors}')
+                raise ValueError(f'Error dropping {self.table.name} partitions! {errors}')
+
+        keys = [obj['Key'] for obj in objects]
+        for start in range(0, len(keys), S3_DELETE_OBJECTS_KEYS):
+            response = self.s3_client.delete_objects(
+                Bucket=self.s3_bucket,
+                Delete={
+                    'Objects': [{
+                        'Key': key
+                    } for key in keys[start:start + S3_DELETE_OBJECTS_KEYS]],
+                    'Quiet': True
+                })
+            if response.get('Errors'):
+                logger.error(f'Error deleting {self.table.name} source objects: {response["Errors"]}')
+                raise ValueError(f'Error deleting {self.table.name} source objects! {response["Errors"]}')
+
+        logger.info(f'{self.table.name}: retired {len(partitions)} partitions ({len(keys)} objects)')
+        return len(partitions)
+
+    def compact_month(self, month: str):
+        """Roll a month (YYYY-MM) of source partitions up into one rollup partition
+
+        Source partitions of a month that was already compacted replace their rows in the
+        rollup; the rest of the rollup is carried over.
+
+        Returns:
+            (dict): Summary of the month's compaction
+        """
+
+        objects = self.list_source_objects(month)
+        if not objects:
+            logger.info(f'{self.table.name} {month}: no source objects')
+            return {'month': month, 'source_objects': 0, 'files': 0}
+
+        rollup_partition = self._rollup_partition(month)
+        partition_values = list(rollup_partition.values())
+        partition_path = '/'.join(f'{column}={value}'
+                                  for column, value in rollup_partition.items())
+        prefix = f'{COMPACTED_ROOT}/{self.table.rollup_table}/_runs/{self.run_id}/{partition_path}/'
+
+        previous_location = self.rollup_partition_location(partition_values)
+
+        tables = self.read_month(objects)
+        if previous_location:
+            replaced = sorted({
+                self._parse_partition(obj['Key'])[self.table.partition_columns[-1]]
+                for obj in objects
+            })
+            tables = chain(self._read_previous_rollup(previous_location, replaced), tables)
+
+        keys, rows = self.write_files(tables, prefix)
+
+        self.swap_partition(partition_values, f's3://{self.s3_bucket}/{prefix}',
+                            previous_location)
+
+        # Only ever delete previous compaction runs here (source data is retired below)
+        runs_root = f's3://{self.s3_bucket}/{COMPACTED_ROOT}/{self.table.rollup_table}/_runs/'
+        if previous_location and previous_location.startswith(runs_root):
+            delete_s3_data(bucket=self.s3_bucket,
+                           prefix=previous_location[len(f's3://{self.s3_bucket}/'):],
+                           s3_client=self.s3_client)
+
+        retired = self.retire_source_partitions(objects) if self.retire_source else 0
+
+        summary = {
+            'month': month,
+            'source_objects': len(objects),
+            'source_bytes': sum(obj['Size'] for obj in objects),
+            'rows': rows,
+            'files': len(keys),
+            'retired_partitions': retired
+        }
+        logger.info(f'{self.table.name} -> {self.table.rollup_table} {summary}')
+        return summary
+
+    def run(self, months: List[str]):
+        """Create the rollup table (if needed) & compact each month"""
+
+        logger.info('*' * 60)
+        logger.info(f'Compacting {self.table.name} into {self.table.rollup_table}: {months[0]} - {months[-1]}')
+        logger.info('*' * 60)
+
+        self.create_rollup_table()
+        self.create_view()
+        return [self.compact_month(month) for month in months]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Roll the daily partitions of the tables in config.yml up into monthly Parquet partitions
+"""
+
+import argparse
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytz
+from loguru import logger
+
+from compactor import TableCompactor, load_compaction_config
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compact small daily partition files into monthly Parquet rollups')
+
+    parser.add_argument(
+        '--config',
+        type=str,
+        required=False,
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'config.yml'),
+        help='Path to the compaction config (defaults to config.yml next to this script)')
+
+    parser.add_argument(
+        '--table',
+        type=str,
+        required=False,
+        default=None,
+        help='Only compact this table (name from the config).  Defaults to every table')
+
+    # Default to last month - the current month is still being appended to daily
+    last_month = (pd.Timestamp(datetime.now(pytz.utc).date()) -
+                  pd.DateOffset(months=1)).strftime('%Y-%m')
+
+    parser.add_argument('--start_month',
+                        type=str,
+                        required=False,
+                        default=last_month,
+                        help='First month to compact in YYYY-MM format (defaults to last month)')
+
+    parser.add_argument('--end_month',
+                        type=str,
+                        required=False,
+                        default=None,
+                        help='Last month to compact in YYYY-MM format (defaults to start_month)')
+
+    parser.add_argument(
+        '--retire_source',
+        action='store_true',
+        help='Drop the daily Glue partitions & delete the source objects of each month once its rollup partition is swapped in (by default they are kept - gap_detector still checks the daily tables)')
+
+    args = parser.parse_args()
+    logger.info(f'Args: {args}')
+
+    config = load_compaction_config(args.config)
+
+    tables = [
+        table for table in config.tables
+        if args.table is None or table.name == args.table
+    ]
+    if not tables:
+        raise ValueError(f'Table not found in config: {args.table}')
+
+    months = [
+        period.strftime('%Y-%m') for period in pd.period_range(
+            args.start_month, args.end_month or args.start_month, freq='M')
+    ]
+
+    # The current month is still being appended to - retiring it would hide the latest partition
+    current_month = datetime.now(pytz.utc).strftime('%Y-%m')
+    if months[-1] >= current_month:
+        raise ValueError(f'Can only compact months before {current_month}: {months[-1]}')
+
+    for table in tables:
+        TableCompactor(table,
+                       target_file_mb=config.target_file_mb,
+                       retire_source=args.retire_source).run(months)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+#!/bin/bash
+
+echo "-------- Running run.sh"
+echo "-------- Input parameters: $@"
+echo "-------- Parameter count $#"
+
+if [[ $# -eq 0 ]]; then
+    # Roll up last month for every table in config.yml
+    python3 src/compaction/main.py
+
+elif [[ $# -eq 2 ]]; then
+    start_month=$1
+    end_month=$2
+    echo "-------- Compacting all tables: $start_month to $end_month"
+    python3 src/compaction/main.py --start_month $start_month --end_month $end_month
+
+elif [[ $# -eq 3 ]]; then
+    table=$1
+    start_month=$2
+    end_month=$3
+    echo "-------- Compacting $table: $start_month to $end_month"
+    python3 src/compaction/main.py --table $table --start_month $start_month --end_month $end_month
+
+else
+    echo "Usage: run.sh [[table] start_month end_month]"
+    exit 1
+fi
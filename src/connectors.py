@@ -0,0 +1,580 @@
+"""
+Pooled HTTP clients for the vendor APIs (ShipBob, Shopify, Klaviyo).
+
+Each vendor gets one persistent requests.Session per set of credentials, so TLS
+connections are kept alive and reused across pages (and across threads when pages are
+fetched concurrently) instead of being re-established for every request.
+
+Snapshot endpoints (ie. ShipBob inventory, Shopify products) can be read through an
+on-disk ResponseCache by passing `cache_ttl` to ConnectorClient.get.  The cache is
+only active when CONNECTOR_CACHE_DIR or CONNECTOR_SNAPSHOT_RUN_ID is set; the backfill
+scripts set a run id so every job in one backfill reuses the same snapshot.  Without
+CONNECTOR_CACHE_DIR it is kept in $XDG_CACHE_HOME/prymal/connectors.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from loguru import logger
+
+# Connection pool sizing (should be >= the number of concurrent requests per vendor)
+POOL_CONNECTIONS = int(os.getenv('CONNECTOR_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.getenv('CONNECTOR_POOL_MAXSIZE', 16))
+
+# (connect, read) timeout in seconds applied to every request
+DEFAULT_TIMEOUT = (10, 120)
+
+# Base urls per vendor
+SHIPBOB_BASE_URL = 'https://api.shipbob.com'
+SHOPIFY_STORE_URL = os.getenv('SHOPIFY_STORE_URL',
+                              'prymal-coffee-creamer.myshopify.com')
+KLAVIYO_BASE_URL = 'https://a.klaviyo.com'
+KLAVIYO_REVISION = '2025-07-15'
+
+# Shopify REST leaky bucket (standard plan: 40 request bucket, leaks 2 requests/second)
+SHOPIFY_BUCKET_SIZE = 40
+SHOPIFY_LEAK_RATE = 2.0
+SHOPIFY_BUCKET_RESERVE = 4  # only back off once the bucket is within this many calls of full
+SHOPIFY_MAX_RETRIES = 5  # retries per request on 429
+
+# Klaviyo adaptive concurrency (limits are per endpoint, reported in RateLimit-* headers)
+KLAVIYO_MAX_CONCURRENCY = int(os.getenv('KLAVIYO_MAX_CONCURRENCY', 10))
+KLAVIYO_MAX_RETRIES = 8  # retries per request on 429
+
+# On-disk response cache for snapshot endpoints
+CACHE_DIR_ENV = 'CONNECTOR_CACHE_DIR'
+SNAPSHOT_RUN_ENV = 'CONNECTOR_SNAPSHOT_RUN_ID'
+# Per-user cache directory (not the working directory, which is usually the repo checkout)
+DEFAULT_CACHE_DIR = os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                 'prymal', 'connectors')
+SNAPSHOT_CACHE_TTL = int(os.getenv('CONNECTOR_CACHE_TTL', 10 * 60))  # seconds
+
+_clients: Dict[Tuple, 'ConnectorClient'] = {}
+_clients_lock = threading.Lock()
+
+# Optional transport adapter mounted on every client session (see replay.py)
+_transport_adapter = None
+
+
+class ShopifyRateLimiter:
+    """Leaky-bucket rate limiter driven by Shopify's REST rate limit headers
+
+    Tracks bucket usage from the 'X-Shopify-Shop-Api-Call-Limit' header (ie. '32/40')
+    and drains it locally at the leak rate between responses.  Requests go out
+    immediately while the bucket has headroom; the limiter only sleeps when the bucket
+    is within `reserve` calls of full, and honors 'Retry-After' on 429 responses.
+
+    Args:
+        bucket_size (int): Bucket size (updated from response headers)
+        leak_rate (float): Requests per second drained from the bucket
+        reserve (int): Number of free calls to keep in the bucket before backing off
+        max_retries (int): Number of times to retry a request that returns 429
+    """
+
+    def __init__(self,
+                 bucket_size: int = SHOPIFY_BUCKET_SIZE,
+                 leak_rate: float = SHOPIFY_LEAK_RATE,
+                 reserve: int = SHOPIFY_BUCKET_RESERVE,
+                 max_retries: int = SHOPIFY_MAX_RETRIES):
+        self.bucket_size = bucket_size
+        self.leak_rate = leak_rate
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.used = 0.0
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _current_usage(self):
+        """Estimated bucket usage right now (drained at the leak rate since last update)"""
+        elapsed = time.monotonic() - self.updated_at
+        return max(0.0, self.used - elapsed * self.leak_rate)
+
+    def acquire(self):
+        """Block until the bucket has room for one more call, then reserve it"""
+        with self._lock:
+            usage = self._current_usage()
+            limit = self.bucket_size - self.reserve
+            if usage + 1 > limit:
+                wait = (usage + 1 - limit) / self.leak_rate
+                logger.info(
+                    f'Shopify bucket at {usage:.0f}/{self.bucket_size}, waiting {wait:.2f}s'
+                )
+                time.sleep(wait)
+                usage = self._current_usage()
+            self.used = usage + 1
+            self.updated_at = time.monotonic()
+
+    def update(self, response: requests.Response):
+        """Sync bucket usage from a response's rate limit header"""
+        call_limit = response.headers.get('X-Shopify-Shop-Api-Call-Limit')
+        if not call_limit:
+            return
+        try:
+            used, size = (int(v) for v in call_limit.split('/'))
+        except ValueError:
+            return
+        with self._lock:
+            self.used = float(used)
+            self.bucket_size = size
+            self.updated_at = time.monotonic()
+
+    def request(self, send, url: str, **kwargs):
+        """Send a request through the limiter, retrying on 429 (Too Many Requests)
+
+        Args:
+            send (callable): Function that sends the request (ie. session.get)
+            url (str): Url to request
+            **kwargs: Passed through to `send`
+
+        Returns:
+            (requests.Response): The response
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            response = send(url, **kwargs)
+            self.update(response)
+
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+
+            wait = float(response.headers.get('Retry-After', 2**attempt))
+            logger.warning(f'Rate limited by Shopify, retrying in {wait}s')
+            with self._lock:
+                # Block other callers until Retry-After has elapsed, then resume
+                # with the bucket just under the back off threshold
+                time.sleep(wait)
+                self.used = float(self.bucket_size - self.reserve - 1)
+                self.updated_at = time.monotonic()
+
+
+class AdaptiveConcurrencyLimiter:
+    """Caps in-flight requests, adapting the cap to the vendor's rate limit headers
+
+    The cap grows by one after each response that still has rate limit headroom and is
+    halved on a 429 (additive increase, multiplicative decrease).  When a response
+    reports no remaining calls ('RateLimit-Remaining: 0'), or on a 429, all callers
+    pause until 'RateLimit-Reset' / 'Retry-After' has elapsed, then the request is
+    retried rather than given up on.
+
+    Args:
+        max_concurrency (int): Upper bound on in-flight requests
+        min_concurrency (int): Lower bound on in-flight requests
+        max_retries (int): Number of times to retry a request that returns 429
+    """
+
+    def __init__(self,
+                 max_concurrency: int = KLAVIYO_MAX_CONCURRENCY,
+                 min_concurrency: int = 1,
+                 max_retries: int = KLAVIYO_MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.limit = max(min_concurrency, max_concurrency // 2)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request slot is free and no back off is in progress"""
+        with self._cond:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self.in_flight >= self.limit:
+                    self._cond.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    def release(self, response: Optional[requests.Response]):
+        """Free a request slot and adapt the concurrency cap to the response"""
+        with self._cond:
+            self.in_flight -= 1
+            if response is not None:
+                self._adapt(response)
+            self._cond.notify_all()
+
+    def _adapt(self, response: requests.Response):
+        headers = response.headers
+
+        if response.status_code == 429:
+            wait = float(headers.get('Retry-After') or headers.get('RateLimit-Reset') or 1)
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+            logger.warning(
+                f'Rate limited, backing off {wait}s with concurrency {self.limit}')
+            return
+
+        remaining = headers.get('RateLimit-Remaining')
+        if remaining is None:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+            return
+
+        remaining = int(remaining)
+        if remaining <= 0:
+            wait = float(headers.get('RateLimit-Reset') or 1)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+        elif remaining <= self.limit:
+            self.limit = max(self.min_concurrency, self.limit - 1)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+
+    def request(self, send, url: str, **kwargs):
+        """Send a request under the concurrency cap, retrying on 429 (Too Many Requests)
+
+        Args:
+            send (callable): Function that sends the request (ie. session.get)
+            url (str): Url to request
+            **kwargs: Passed through to `send`
+
+        Returns:
+            (requests.Response): The response
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            response = None
+            try:
+                response = send(url, **kwargs)
+            finally:
+                self.release(response)
+
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of GET responses
+
+    Response bodies are stored once per content hash under `bodies/`, and each request
+    (vendor, credentials, url & params) maps to an entry under `entries/` pointing at
+    its body along with the response headers, ETag / Last-Modified and store time.
+
+    An entry is served without a request while it is younger than the caller's TTL, or
+    when it was stored under the current snapshot run id (CONNECTOR_SNAPSHOT_RUN_ID),
+    regardless of age.  Stale entries with an ETag or Last-Modified are revalidated
+    with a conditional request, and a 304 refreshes the entry instead of re-downloading.
+
+    Args:
+        cache_dir (str): Directory the cache is kept in
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, 'entries')
+        self.bodies_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.bodies_dir, exist_ok=True)
+
+    @staticmethod
+    def request_key(client: 'ConnectorClient', url: str,
+                    params: Optional[dict] = None):
+        """Cache key for a request (credentials are hashed in so accounts never share entries)"""
+        identity = json.dumps([
+            client.vendor,
+            repr(client.session.auth),
+            client.session.headers.get('Authorization'),
+            url,
+            sorted((str(k), str(v)) for k, v in (params or {}).items())
+        ])
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _load_entry(self, key: str):
+        path = os.path.join(self.entries_dir, f'{key}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if not os.path.exists(os.path.join(self.bodies_dir, entry['body_hash'])):
+            return None
+        return entry
+
+    def _save_entry(self, key: str, entry: dict):
+        self._write(os.path.join(self.entries_dir, f'{key}.json'),
+                    json.dumps(entry).encode('utf-8'))
+
+    def _store(self, key: str, response: requests.Response, run_id: Optional[str]):
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        body_path = os.path.join(self.bodies_dir, body_hash)
+        if not os.path.exists(body_path):
+            self._write(body_path, response.content)
+
+        self._save_entry(
+            key, {
+                'url': response.url,
+                'status_code': response.status_code,
+                'headers': dict(response.headers),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'body_hash': body_hash,
+                'stored_at': time.time(),
+                'run_id': run_id
+            })
+
+    def _to_response(self, entry: dict):
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.url = entry['url']
+        response.headers.update(entry['headers'])
+        # Body is stored decoded, so the original encoding headers no longer apply
+        response.headers.pop('Content-Encoding', None)
+        response.headers.pop('Content-Length', None)
+        response.encoding = 'utf-8'
+        response.reason = 'OK'
+        with open(os.path.join(self.bodies_dir, entry['body_hash']), 'rb') as f:
+            response._content = f.read()
+        return response
+
+    def get(self, client: 'ConnectorClient', url: str, ttl: float, **kwargs):
+        """Serve a GET from the cache, revalidating or fetching it when needed
+
+        Args:
+            client (ConnectorClient): Client used for requests that miss the cache
+            url (str): Absolute url
+            ttl (float): Maximum age in seconds of an entry served without revalidation
+            **kwargs: Passed through to the request (params, headers, timeout, ...)
+
+        Returns:
+            (requests.Response): Cached or fresh response
+        """
+        key = self.request_key(client, url, kwargs.get('params'))
+        entry = self._load_entry(key)
+        run_id = os.getenv(SNAPSHOT_RUN_ENV)
+
+        if entry:
+            if run_id and entry.get('run_id') == run_id:
+                logger.info(f'Cache hit (snapshot run {run_id}): {url}')
+                return self._to_response(entry)
+            if time.time() - entry['stored_at'] < ttl:
+                logger.info(f'Cache hit: {url}')
+                return self._to_response(entry)
+
+            conditional = {}
+            if entry.get('etag'):
+                conditional['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                conditional['If-Modified-Since'] = entry['last_modified']
+
+            if conditional:
+                headers = {**(kwargs.pop('headers', None) or {}), **conditional}
+                response = client.send_get(url, headers=headers, **kwargs)
+                if response.status_code == 304:
+                    logger.info(f'Cache revalidated (304): {url}')
+                    entry['stored_at'] = time.time()
+                    entry['run_id'] = run_id
+                    self._save_entry(key, entry)
+                    return self._to_response(entry)
+                if response.status_code == 200:
+                    self._store(key, response, run_id)
+                return response
+
+        response = client.send_get(url, **kwargs)
+        if response.status_code == 200:
+            self._store(key, response, run_id)
+        return response
+
+
+_response_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(cache_dir: str = None):
+    """Return the on-disk response cache kept in `cache_dir` (else $CONNECTOR_CACHE_DIR),
+    or None when caching is not enabled"""
+    cache_dir = cache_dir or os.getenv(CACHE_DIR_ENV)
+    if not cache_dir and not os.getenv(SNAPSHOT_RUN_ENV):
+        return None
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    with _clients_lock:
+        if cache_dir not in _response_caches:
+            _response_caches[cache_dir] = ResponseCache(cache_dir)
+        return _response_caches[cache_dir]
+
+
+@contextlib.contextmanager
+def snapshot_scope(run_id: Optional[str] = None):
+    """Reuse cached snapshot responses for everything run inside this block
+
+    Equivalent to exporting CONNECTOR_SNAPSHOT_RUN_ID for the duration of the block
+    (the backfill scripts export it for the whole run instead).
+
+    Args:
+        run_id (str): Snapshot run id (defaults to a new id based on the current time)
+    """
+    previous = os.getenv(SNAPSHOT_RUN_ENV)
+    os.environ[SNAPSHOT_RUN_ENV] = run_id or f'run-{int(time.time())}'
+    try:
+        yield os.environ[SNAPSHOT_RUN_ENV]
+    finally:
+        if previous is None:
+            os.environ.pop(SNAPSHOT_RUN_ENV, None)
+        else:
+            os.environ[SNAPSHOT_RUN_ENV] = previous
+
+
+class ConnectorClient:
+    """Persistent, pooled HTTP session for a single vendor API
+
+    Args:
+        vendor (str): Vendor name (used for logging)
+        base_url (str): Base url that relative paths are joined to
+        headers (dict): Default headers sent with every request (ie. auth)
+        auth (tuple): Optional (user, password) for HTTP basic auth
+        pool_maxsize (int): Maximum number of pooled connections per host
+        rate_limiter: Optional limiter every GET is sent through (ShopifyRateLimiter,
+            AdaptiveConcurrencyLimiter)
+    """
+
+    def __init__(self,
+                 vendor: str,
+                 base_url: str,
+                 headers: Optional[dict] = None,
+                 auth: Optional[Tuple[str, str]] = None,
+                 pool_maxsize: int = POOL_MAXSIZE,
+                 rate_limiter=None):
+        self.vendor = vendor
+        self.base_url = base_url.rstrip('/')
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        if headers:
+            self.session.headers.update(headers)
+        if auth:
+            self.session.auth = auth
+
+        # Retry connection errors & transient gateway errors (not 429s - callers handle rate limits)
+        retries = Retry(total=3,
+                        connect=3,
+                        read=0,
+                        backoff_factor=0.5,
+                        status_forcelist=[502, 503, 504],
+                        allowed_methods=['GET'],
+                        raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                              pool_maxsize=pool_maxsize,
+                              max_retries=retries)
+        self.session.mount('https://', _transport_adapter or adapter)
+        self.session.mount('http://', _transport_adapter or adapter)
+
+    def url(self, path: str):
+        """Return an absolute url for a path (absolute urls are returned unchanged)"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return self.base_url + path
+
+    def get(self, path: str, cache_ttl: Optional[float] = None, **kwargs):
+        """Send a GET request on the pooled session (through the rate limiter, if any)
+
+        Args:
+            path (str): Path relative to the base url, or an absolute url
+            cache_ttl (float): If set, serve the request through the on-disk response
+                cache (when enabled) with this TTL in seconds
+            **kwargs: Passed through to requests
+        """
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        cache = get_response_cache() if cache_ttl is not None else None
+        if cache:
+            return cache.get(self, self.url(path), cache_ttl, **kwargs)
+        return self.send_get(self.url(path), **kwargs)
+
+    def send_get(self, url: str, **kwargs):
+        """Send a GET request for an absolute url, bypassing the response cache"""
+        if self.rate_limiter:
+            return self.rate_limiter.request(self.session.get, url, **kwargs)
+        return self.session.get(url, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        """Send a POST request on the pooled session"""
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        return self.session.post(self.url(path), **kwargs)
+
+
+def _get_or_create_client(key: Tuple, **client_kwargs):
+    """Return the cached client for a key, creating it on first use"""
+    with _clients_lock:
+        if key not in _clients:
+            logger.info(f'Creating pooled {key[0]} client')
+            _clients[key] = ConnectorClient(**client_kwargs)
+        return _clients[key]
+
+
+def set_transport_adapter(adapter):
+    """Send every vendor request through a custom requests adapter (None restores the default)
+
+    Used by replay.py to record live responses or replay them from fixtures.  Cached
+    clients are dropped so every client created afterwards mounts the adapter.
+    """
+    global _transport_adapter
+    with _clients_lock:
+        _transport_adapter = adapter
+        _clients.clear()
+
+
+def get_shipbob_client(api_secret: str):
+    """Return the pooled ShipBob client for an api secret (PAT token)"""
+    return _get_or_create_client(
+        ('shipbob', api_secret),
+        vendor='shipbob',
+        base_url=SHIPBOB_BASE_URL,
+        headers={'Authorization': f'Bearer {api_secret}'})
+
+
+def get_shopify_client(api_key: str,
+                       api_pw: str,
+                       store_url: Optional[str] = None):
+    """Return the pooled Shopify client for a set of private app credentials
+
+    Credentials are sent as HTTP basic auth on the session, so pagination links
+    returned by Shopify can be requested as-is.  Requests share one
+    ShopifyRateLimiter per store (the REST bucket is per store & app).
+    """
+    store_url = store_url or SHOPIFY_STORE_URL
+    return _get_or_create_client(('shopify', api_key, api_pw, store_url),
+                                 vendor='shopify',
+                                 base_url=f'https://{store_url}',
+                                 auth=(api_key, api_pw),
+                                 rate_limiter=ShopifyRateLimiter())
+
+
+def get_klaviyo_client(request_headers: Optional[dict] = None):
+    """Return the pooled Klaviyo client
+
+    Requests share one AdaptiveConcurrencyLimiter per API key, so concurrent callers
+    back off together when Klaviyo's rate limit headers report no headroom.
+
+    Args:
+        request_headers (dict): Klaviyo request headers (Authorization, revision, etc.).
+            Defaults to headers built from the KLAYVIO_API_KEY environment variable.
+    """
+    if request_headers is None:
+        request_headers = {
+            'Content-Type': 'application/json',
+            'accept': 'application/vnd.api+json',
+            'Authorization':
+            f"Klaviyo-API-Key {os.getenv('KLAYVIO_API_KEY')}",
+            'revision': KLAVIYO_REVISION
+        }
+    return _get_or_create_client(
+        ('klaviyo', tuple(sorted(request_headers.items()))),
+        vendor='klaviyo',
+        base_url=KLAVIYO_BASE_URL,
+        headers=request_headers,
+        rate_limiter=AdaptiveConcurrencyLimiter())
@@ -7,13 +7,17 @@ import os
 import numpy as np
 
 sys.path.append('src/')  # updating path back to root for importing modules
-from utils import run_athena_query  
+from utils import gather, submit_athena_query
+from athena_cache import default_cache_dir
 
 # AWS Athena configuration
 REGION = 'us-east-1'  # e.g., 'us-east-1'
 S3_BUCKET = os.getenv('S3_BUCKET_NAME')
 GLUE_DATABASE = os.getenv('GLUE_DATABASE_NAME')
 
+# Page loads re-run the same queries - serve them from the local result cache
+ATHENA_CACHE_DIR = os.getenv('ATHENA_CACHE_DIR') or default_cache_dir()
+
 # Initialize the Dash app
 app = dash.Dash(__name__)
 app.title = "Prymal Inventory Dashboard"
@@ -34,8 +38,6 @@ def load_data():
     FROM shipbob_inventory_run_rate
     WHERE partition_date = (SELECT MAX(partition_date) FROM shipbob_inventory_run_rate)
     """
-    inventory_run_rate_df = run_athena_query(query=inventory_query, database=GLUE_DATABASE, region=REGION,
-                                             s3_bucket=S3_BUCKET)
 
     # Fetch order details data for the past 90 days
     order_details_query = """
@@ -51,13 +53,20 @@ def load_data():
     inventory_id
     ORDER BY DATE(created_date) ASC
     """
-    order_details_df = run_athena_query(query=order_details_query, database=GLUE_DATABASE, region=REGION,
-                                        s3_bucket=S3_BUCKET)
 
-    # Convert dates to datetime and data types
-    order_details_df['created_date'] = pd.to_datetime(order_details_df['created_date'])
-    order_details_df['inventory_qty'] = pd.to_numeric(order_details_df['inventory_qty'])
-    order_details_df['inventory_id'] = pd.to_numeric(order_details_df['inventory_id'])
+    # Fetch inventory details data for the past 90 days
+    inventory_details_query = """
+    SELECT id AS inventory_id, partition_date, total_fulfillable_quantity
+    FROM shipbob_inventory_details
+    WHERE partition_date >= date_add('day', -90, current_date)
+    """
+
+    # Run the three queries concurrently (load time ~ the slowest query, not the sum)
+    inventory_run_rate_df, order_details_df, inventory_details_df = gather(*[
+        submit_athena_query(query=query, database=GLUE_DATABASE, region=REGION, s3_bucket=S3_BUCKET,
+                            cache_dir=ATHENA_CACHE_DIR)
+        for query in (inventory_query, order_details_query, inventory_details_query)
+    ])
 
     # Calculate quantities sold in the last 30, 60, and 90 days
     today = pd.Timestamp.today().normalize()
@@ -79,7 +88,6 @@ def load_data():
     sales_last_90_days.rename(columns={'inventory_qty': 'actual_qty_sold_last_90_days'}, inplace=True)
 
     # Merge sales data into inventory_run_rate_df
-    inventory_run_rate_df['inventory_id'] = pd.to_numeric(inventory_run_rate_df['inventory_id'])
     inventory_run_rate_df = inventory_run_rate_df.merge(sales_last_30_days, on='inventory_id', how='left')
     inventory_run_rate_df = inventory_run_rate_df.merge(sales_last_60_days, on='inventory_id', how='left')
     inventory_run_rate_df = inventory_run_rate_df.merge(sales_last_90_days, on='inventory_id', how='left')
@@ -102,20 +110,6 @@ def load_data():
                                'actual_qty_sold_last_90_days'
                            ]].astype(int)
 
-    # Fetch inventory details data for the past 90 days
-    inventory_details_query = """
-    SELECT id AS inventory_id, partition_date, total_fulfillable_quantity
-    FROM shipbob_inventory_details
-    WHERE partition_date >= date_add('day', -90, current_date)
-    """
-    inventory_details_df = run_athena_query(query=inventory_details_query, database=GLUE_DATABASE, region=REGION,
-                                            s3_bucket=S3_BUCKET)
-
-    # Convert dates to datetime and data types
-    inventory_details_df['partition_date'] = pd.to_datetime(inventory_details_df['partition_date'])
-    inventory_details_df['total_fulfillable_quantity'] = pd.to_numeric(inventory_details_df['total_fulfillable_quantity'])
-    inventory_details_df['inventory_id'] = pd.to_numeric(inventory_details_df['inventory_id'])
-
     # Merge inventory_details_df with inventory_run_rate_df to get 'name' for each inventory_id
     inventory_details_df = pd.merge(
         inventory_details_df,
@@ -132,23 +126,11 @@ def load_data():
         how='left'
     )
 
-    # Convert data types in merged_df
-    merged_df['created_date'] = pd.to_datetime(merged_df['created_date'])
-    merged_df['inventory_qty'] = pd.to_numeric(merged_df['inventory_qty'])
-    merged_df['run_rate'] = pd.to_numeric(merged_df['run_rate'])
-    merged_df['estimated_stockout_date'] = pd.to_datetime(merged_df['estimated_stockout_date'])
-    merged_df['restock_point'] = pd.to_numeric(merged_df['restock_point'])
-
-    # Convert 'est_stock_days_on_hand' to numeric and update the DataFrame
-    inventory_run_rate_df['est_stock_days_on_hand'] = pd.to_numeric(
-        inventory_run_rate_df['est_stock_days_on_hand'], errors='coerce'
-    )
-
     # Drop rows where 'est_stock_days_on_hand' is NaN
     inventory_run_rate_df = inventory_run_rate_df.dropna(subset=['est_stock_days_on_hand'])
 
     # Convert to integers and round
-    inventory_run_rate_df['est_stock_days_on_hand'] = inventory_run_rate_df['est_stock_days_on_hand'].astype(float).round().astype(int)
+    inventory_run_rate_df['est_stock_days_on_hand'] = inventory_run_rate_df['est_stock_days_on_hand'].round().astype(int)
 
     # Now, compute min and max using the updated DataFrame
     est_stock_days_on_hand_min = inventory_run_rate_df['est_stock_days_on_hand'].min()
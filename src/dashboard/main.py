@@ -7,7 +7,8 @@ import numpy as np
 from loguru import logger
 
 sys.path.append('src/')  # If you need to import from your src/ folder
-from utils import run_athena_query
+from utils import gather, submit_athena_query
+from athena_cache import default_cache_dir
 
 # Import your two tab/page modules
 from product_cards import get_product_cards_tab, register_product_cards_callbacks
@@ -18,6 +19,9 @@ REGION = 'us-east-1'  # e.g., 'us-east-1'
 S3_BUCKET = os.getenv('S3_BUCKET_NAME')
 GLUE_DATABASE = os.getenv('GLUE_DATABASE_NAME')
 
+# Page loads re-run the same queries - serve them from the local result cache
+ATHENA_CACHE_DIR = os.getenv('ATHENA_CACHE_DIR') or default_cache_dir()
+
 # Initialize the Dash app
 app = dash.Dash(__name__)
 app.title = "Prymal Inventory Dashboard"
@@ -37,6 +41,9 @@ def load_data():
     """
     Load all data from Athena (or other sources),
     then return it. This is the same logic from your original dashboard.py.
+
+    The three queries are submitted together & run concurrently, so loading takes about
+    as long as the slowest of them.
     """
 
     # 1) Fetch all inventory data for the latest partition_date
@@ -45,10 +52,6 @@ def load_data():
     FROM shipbob_inventory_run_rate
     WHERE partition_date = (SELECT MAX(partition_date) FROM shipbob_inventory_run_rate)
     """
-    inventory_run_rate_df = run_athena_query(query=inventory_query,
-                                             database=GLUE_DATABASE,
-                                             region=REGION,
-                                             s3_bucket=S3_BUCKET)
 
     # 2) Fetch order details data for the past 90 days
     order_details_query = """
@@ -64,20 +67,25 @@ def load_data():
              inventory_id
     ORDER BY DATE(created_date) ASC
     """
-    order_details_df = run_athena_query(query=order_details_query,
-                                        database=GLUE_DATABASE,
-                                        region=REGION,
-                                        s3_bucket=S3_BUCKET)
-
-    # Convert data types
-    order_details_df['created_date'] = pd.to_datetime(
-        order_details_df['created_date'])
-    order_details_df['inventory_qty'] = pd.to_numeric(
-        order_details_df['inventory_qty'])
-    order_details_df['inventory_id'] = pd.to_numeric(
-        order_details_df['inventory_id'])
-
-    # 3) Calculate quantities sold (30, 60, 90 days)
+
+    # 3) Fetch inventory details data (past 90 days)
+    inventory_details_query = """
+    SELECT id AS inventory_id, partition_date, total_fulfillable_quantity
+    FROM shipbob_inventory_details
+    WHERE partition_date >= date_add('day', -90, current_date)
+    """
+
+    inventory_run_rate_df, order_details_df, inventory_details_df = gather(*[
+        submit_athena_query(query=query,
+                            database=GLUE_DATABASE,
+                            region=REGION,
+                            s3_bucket=S3_BUCKET,
+                            cache_dir=ATHENA_CACHE_DIR)
+        for query in (inventory_query, order_details_query,
+                      inventory_details_query)
+    ])
+
+    # 4) Calculate quantities sold (30, 60, 90 days)
     today = pd.Timestamp.today().normalize()
     date_30_days_ago = today - pd.Timedelta(days=30)
     date_60_days_ago = today - pd.Timedelta(days=60)
@@ -96,8 +104,6 @@ def load_data():
                         .rename(columns={'inventory_qty': 'actual_qty_sold_last_90_days'})
 
     # Merge these into inventory_run_rate_df
-    inventory_run_rate_df['inventory_id'] = pd.to_numeric(
-        inventory_run_rate_df['inventory_id'])
     inventory_run_rate_df = inventory_run_rate_df.merge(sales_last_30_days,
                                                         on='inventory_id',
                                                         how='left')
@@ -115,23 +121,6 @@ def load_data():
         'actual_qty_sold_last_90_days'
     ]].fillna(0).astype(int)
 
-    # 4) Fetch inventory details data (past 90 days)
-    inventory_details_query = """
-    SELECT id AS inventory_id, partition_date, total_fulfillable_quantity
-    FROM shipbob_inventory_details
-    WHERE partition_date >= date_add('day', -90, current_date)
-    """
-    inventory_details_df = run_athena_query(query=inventory_details_query,
-                                            database=GLUE_DATABASE,
-                                            region=REGION,
-                                            s3_bucket=S3_BUCKET)
-    inventory_details_df['partition_date'] = pd.to_datetime(
-        inventory_details_df['partition_date'])
-    inventory_details_df['total_fulfillable_quantity'] = pd.to_numeric(
-        inventory_details_df['total_fulfillable_quantity'])
-    inventory_details_df['inventory_id'] = pd.to_numeric(
-        inventory_details_df['inventory_id'])
-
     # Merge inventory_details_df with inventory_run_rate_df to get 'name'
     inventory_details_df = pd.merge(
         inventory_details_df,
@@ -147,20 +136,12 @@ def load_data():
                          ]],
                          on='inventory_id',
                          how='left')
-    merged_df['created_date'] = pd.to_datetime(merged_df['created_date'])
-    merged_df['inventory_qty'] = pd.to_numeric(merged_df['inventory_qty'])
-    merged_df['run_rate'] = pd.to_numeric(merged_df['run_rate'])
-    merged_df['estimated_stockout_date'] = pd.to_datetime(
-        merged_df['estimated_stockout_date'])
-    merged_df['restock_point'] = pd.to_numeric(merged_df['restock_point'])
-
-    # Convert est_stock_days_on_hand to numeric, drop NaNs
-    inventory_run_rate_df['est_stock_days_on_hand'] = pd.to_numeric(
-        inventory_run_rate_df['est_stock_days_on_hand'], errors='coerce')
+
+    # Drop products w/o est_stock_days_on_hand & round it to whole days
     inventory_run_rate_df = inventory_run_rate_df.dropna(
         subset=['est_stock_days_on_hand'])
     inventory_run_rate_df['est_stock_days_on_hand'] = \
-        inventory_run_rate_df['est_stock_days_on_hand'].astype(float).round().astype(int)
+        inventory_run_rate_df['est_stock_days_on_hand'].round().astype(int)
 
     # Calculate slider min and max
     est_stock_days_on_hand_min = inventory_run_rate_df[
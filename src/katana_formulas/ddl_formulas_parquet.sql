@@ -0,0 +1,22 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS katana_formulas_parquet (
+    product_variant_code DOUBLE,
+    product_variant_name STRING,
+    product_supplier_item_code STRING,
+    product_internal_barcode STRING,
+    product_registered_barcode STRING,
+    ingredient_variant_code_sku_required STRING,
+    ingredient_variant_name STRING,
+    ingredient_supplier_item_code STRING,
+    ingredient_internal_barcode STRING,
+    ingredient_registered_barcode STRING,
+    notes STRING,
+    quantity_required DOUBLE,
+    unit_of_measure STRING,
+    current_stock_price DOUBLE
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/katana/formulas/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
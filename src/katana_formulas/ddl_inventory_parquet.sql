@@ -0,0 +1,21 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS katana_inventory_parquet (
+    name STRING,
+    variant_code_sku STRING,
+    category STRING,
+    default_supplier STRING,
+    units_of_measure STRING,
+    average_cost DOUBLE,
+    value_in_stock DOUBLE,
+    in_stock DOUBLE,
+    expected DOUBLE,
+    committed DOUBLE,
+    safety_stock DOUBLE,
+    calculated_stock DOUBLE,
+    location STRING
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/katana/inventory/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
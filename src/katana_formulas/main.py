@@ -10,6 +10,10 @@ sys.path.append('src/')  # updating path back to root for importing modules
 from utils import *
 from models import *
 
+# Parquet files are written with the csv table's column types
+FORMULAS_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl_formulas.sql'))
+INVENTORY_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl_inventory.sql'))
+
 def main():
     
     logger.info('Running main()')
@@ -39,6 +43,13 @@ def main():
     )
 
     # Parse input args
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     args = parser.parse_args()
     logger.info(f'Args: {args}')
 
@@ -88,6 +99,7 @@ def main():
 
             raise ValueError(f'Invalid data!')
 
+    writes = []
     if len(valid_data) > 0:
 
         logger.info(valid_data)
@@ -97,10 +109,7 @@ def main():
         # ------------------- WRITE TO S3 - katana_formulas -------------------
 
         # Instantiate s3 client
-        s3_client = boto3.client('s3',
-                                 region_name=region,
-                                 aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                 aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+        s3_client = get_aws_client('s3', region)
         
         # define path to write to
         today = pd.to_datetime(
@@ -110,10 +119,13 @@ def main():
 
         try:
             # Write to s3
-            write_df_to_s3(bucket=s3_bucket,
-                           key=s3_prefix,
-                           df=pd.DataFrame(valid_data),
-                           s3_client=s3_client)
+            writes.append(write_df_to_s3(bucket=s3_bucket,
+                                         key=s3_prefix,
+                                         df=pd.DataFrame(valid_data),
+                                         s3_client=s3_client,
+                                         output_format=args.output_format,
+                                         model=KatanaRecipeIngredient,
+                                         schema=FORMULAS_SCHEMA))
 
         except Exception as e:
             logger.error(f'Error writing to s3: {str(e)}')
@@ -124,17 +136,11 @@ def main():
     # -----------------
     # Run Athena query to update partitions - katana_formulas
     # -----------------
-    logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-    # Define SQL query
-    sql_query = """MSCK REPAIR TABLE katana_formulas"""
-
-    logger.info(f'SQL query: {sql_query}')
-
-    run_athena_query_no_results(query=sql_query,
-                                bucket=s3_bucket,
-                                database=glue_database,
-                                region=region)
+    repair_table_if_changed(table_name=table_name_for_format('katana_formulas', args.output_format),
+                            writes=writes,
+                            bucket=s3_bucket,
+                            database=glue_database,
+                            region=region)
 
 
     # ------------------- FORMAT CSV - katana_inventory -------------------
@@ -177,6 +183,7 @@ def main():
 
             raise ValueError(f'Invalid data!')
 
+    writes = []
     if len(valid_data) > 0:
 
         logger.info(valid_data)
@@ -186,10 +193,7 @@ def main():
         # ------------------- WRITE TO S3 - katana_formulas -------------------
 
         # Instantiate s3 client
-        s3_client = boto3.client('s3',
-                                 region_name=region,
-                                 aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                 aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+        s3_client = get_aws_client('s3', region)
 
         # define path to write to
         today = pd.to_datetime(
@@ -199,10 +203,13 @@ def main():
 
         try:
             # Write to s3
-            write_df_to_s3(bucket=s3_bucket,
-                           key=s3_prefix,
-                           df=pd.DataFrame(valid_data),
-                           s3_client=s3_client)
+            writes.append(write_df_to_s3(bucket=s3_bucket,
+                                         key=s3_prefix,
+                                         df=pd.DataFrame(valid_data),
+                                         s3_client=s3_client,
+                                         output_format=args.output_format,
+                                         model=KatanaInventory,
+                                         schema=INVENTORY_SCHEMA))
 
         except Exception as e:
             logger.error(f'Error writing to s3: {str(e)}')
@@ -213,17 +220,11 @@ def main():
     # -----------------
     # Run Athena query to update partitions - katana_inventory
     # -----------------
-    logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-    # Define SQL query
-    sql_query = """MSCK REPAIR TABLE katana_inventory"""
-
-    logger.info(f'SQL query: {sql_query}')
-
-    run_athena_query_no_results(query=sql_query,
-                                bucket=s3_bucket,
-                                database=glue_database,
-                                region=region)
+    repair_table_if_changed(table_name=table_name_for_format('katana_inventory', args.output_format),
+                            writes=writes,
+                            bucket=s3_bucket,
+                            database=glue_database,
+                            region=region)
 
 
 if __name__ == "__main__":
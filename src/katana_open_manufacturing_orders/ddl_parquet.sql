@@ -0,0 +1,25 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS katana_open_manufacturing_orders_parquet (
+    mo STRING,
+    created_date DATE,
+    done_date DATE,
+    production_status STRING,
+    product_variant_code_sku DOUBLE,
+    product_variant STRING,
+    planned_quantity_of_product DOUBLE,
+    actual_quantity_of_product DOUBLE,
+    unit_of_measure STRING,
+    ingredient_variant_code_sku STRING,
+    ingredient_variant STRING,
+    ingredient_notes STRING,
+    planned_quantity_of_ingredient DOUBLE,
+    actual_quantity_of_ingredient DOUBLE,
+    ingredient_unit_of_measure STRING,
+    ingredient_cost DOUBLE,
+    ingredient_status STRING
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/katana/open_manufacturing_orders/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
@@ -0,0 +1,17 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS katana_raw_material_status_parquet (
+    name STRING,
+    units_of_measure STRING,
+    in_stock DOUBLE,
+    in_stock_as_of DATE,
+    planned_qty DOUBLE,
+    planned_qty_as_of DATE,
+    inventory_remaining DOUBLE,
+    in_stock_percentage DOUBLE,
+    needs_replenished BOOLEAN
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/katana/raw_material_status/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
@@ -3,13 +3,13 @@ import json
 import pandas as pd
 import time
 import os
-import boto3
-from utils import list_all_campaigns
 
-# import from src/utils (not src/klayvio/utils)
+# import from src/utils (not src/klayvio/utils, which shadows it on sys.path)
 import sys
-sys.path.append('src/')
+sys.path.insert(0, 'src/')
 from utils import write_list_of_dicts_to_s3
+from aws_clients import get_aws_client
+from klayvio.utils import TemplateStore, list_all_campaigns, hydrate_campaigns
 
 
 headers = {
@@ -22,12 +22,22 @@ headers = {
 # List all campaigns
 all_campaigns = list_all_campaigns(request_headers=headers)
 
+# Instantiate s3 client
+s3_client = get_aws_client('s3')
+
+# Html templates are stored once per content hash; message rows only hold the hash
+template_store = TemplateStore(bucket=os.getenv('S3_BUCKET_NAME'),
+                               s3_client=s3_client,
+                               index_path=os.getenv('KLAVIYO_TEMPLATE_INDEX',
+                                                    f"s3://{os.getenv('S3_BUCKET_NAME')}/state/klayvio/template_index.json"))
+
+# Hydrate campaigns with sent messages, templates & estimated recipients
+all_campaigns, all_messages = hydrate_campaigns(all_campaigns, request_headers=headers, template_store=template_store)
+
 # Configure s3 path
 today = pd.to_datetime('today').strftime('%Y-%m-%d')
 s3_path = f"klayvio/campaigns/load_dt={today}/campaigns_{today}.json"
-
-# Instantiate s3 client
-s3_client = boto3.client('s3', region_name='us-east-1', aws_access_key_id=os.getenv('AWS_ACCESS_KEY'), aws_secret_access_key=os.getenv('AWS_ACCESS_SECRET'))
+messages_s3_path = f"klayvio/campaign_messages/load_dt={today}/campaign_messages_{today}.json"
 
 # Write to s3
 write_list_of_dicts_to_s3(bucket=os.getenv('S3_BUCKET_NAME'), 
@@ -35,3 +45,10 @@ write_list_of_dicts_to_s3(bucket=os.getenv('S3_BUCKET_NAME'),
           list_of_dicts=all_campaigns, 
           s3_client=s3_client)
 
+write_list_of_dicts_to_s3(bucket=os.getenv('S3_BUCKET_NAME'), 
+          key=messages_s3_path, 
+          list_of_dicts=all_messages, 
+          s3_client=s3_client)
+
+# Save the template hash index only once the message rows referencing it are written
+template_store.save()
@@ -1,5 +1,15 @@
 import requests
 import json 
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# import from src/connectors (pooled vendor sessions) & src/state_store
+import sys
+sys.path.append('src/')
+from connectors import KLAVIYO_MAX_CONCURRENCY, get_klaviyo_client
+from state_store import load_json_state, save_json_state
 
 def _flatten_campaigns(campaigns: list):
     """Return a flattened list of dicts for each campaign in a list of campaign objects, one record per campaign"""
@@ -19,10 +29,11 @@ def _flatten_campaigns(campaigns: list):
                 "created_at": campaign.get('attributes',{}).get("created_at"),
                 "scheduled_at": campaign.get('attributes',{}).get("scheduled_at"),
                 "send_time": campaign.get('attributes',{}).get("send_time"),
-                "updated_at": campaign.get('attributes',{}).get("updated_at")
+                "updated_at": campaign.get('attributes',{}).get("updated_at"),
+                "message_ids": [m.get('id') for m in campaign.get('relationships',{}).get('campaign-messages',{}).get('data',[])]
             })
     
-        return campaigns_flattened
+    return campaigns_flattened
 
 def list_all_campaigns(request_headers: dict):
     """List all campaigns in Klayvio"""
@@ -31,19 +42,22 @@ def list_all_campaigns(request_headers: dict):
     
     url = "https://a.klaviyo.com/api/campaigns?filter=and(equals(messages.channel,'email'))"
 
-    r = requests.get(url, headers=request_headers)
+    r = get_klaviyo_client(request_headers).get(url)
+    r.raise_for_status()
     r_json = json.loads(r.text)
 
-    all_data = _flatten_campaigns(r_json.get('data',{}))
+    all_data = _flatten_campaigns(r_json.get('data',[]))
     
     while r_json.get('links',{}).get('next',None):
         print(r_json.get('links',{}).get('self',{}))
 
-        r = requests.get(r_json.get('links',{}).get('next',None), headers=request_headers)
+        r = get_klaviyo_client(request_headers).get(r_json.get('links',{}).get('next',None))
+        r.raise_for_status()
         r_json = json.loads(r.text)
-        all_data.extend(_flatten_campaigns(r_json.get('data',{})))
+        all_data.extend(_flatten_campaigns(r_json.get('data',[])))
         print(f'{len(all_data)} records retrieved')    
-        return all_data
+
+    return all_data
 
 
 def _flatten_message(message: dict):
@@ -54,6 +68,7 @@ def _flatten_message(message: dict):
   for sent in message.get('attributes',{}).get("send_times"):
       sent_message = {   
           "message_id": message.get("id"),
+          "template_id": message.get('relationships',{}).get('template',{}).get('data',{}).get('id'),
           "channel": message.get('attributes',{}).get('definition',{}).get("channel"),
           "label": message.get('attributes',{}).get('definition',{}).get("label"),
           "subject": message.get('attributes',{}).get('definition',{}).get('content',{}).get("subject"),
@@ -80,9 +95,9 @@ def _get_message_html_template(campaign_message_id: str, request_headers: dict):
     
     url = f'https://a.klaviyo.com/api/campaign-messages/{campaign_message_id}/template'
     
-    r = requests.get(url, headers=request_headers)
+    r = get_klaviyo_client(request_headers).get(url)
+    r.raise_for_status()
     r_json = json.loads(r.text)
-    print(r_json)
     return r_json.get('data',{}).get('attributes',{}).get('html') if r_json['data'] else None
 
 def _get_message_details(campaign_message_id: str, request_headers: dict):
@@ -91,20 +106,19 @@ def _get_message_details(campaign_message_id: str, request_headers: dict):
     print(f'Fetching messages for campaign-message {campaign_message_id}')
     url = f'https://a.klaviyo.com/api/campaign-messages/{campaign_message_id}'
     
-    r = requests.get(url, headers=request_headers)
+    r = get_klaviyo_client(request_headers).get(url)
+    r.raise_for_status()
     r_json = json.loads(r.text)
     
     all_data = _flatten_message(r_json['data'])
     while r_json.get('links',{}).get('next',None):
       print(r_json.get('links',{}).get('self',{}))
     
-      r = requests.get(r_json.get('links',{}).get('next',None), headers=request_headers)
-      if r.status_code != 200:
-          print(f'waiting.. response: {r.status_code}')
-          time.sleep(5)
-          break
+      # 429s are retried by the client's rate limiter, so pages are never dropped
+      r = get_klaviyo_client(request_headers).get(r_json.get('links',{}).get('next',None))
+      r.raise_for_status()
       r_json = json.loads(r.text)
-      all_data.append(_flatten_message(r_json['data']))
+      all_data.extend(_flatten_message(r_json['data']))
       print(len(all_data))
     
     return all_data
@@ -117,9 +131,158 @@ def _get_campaign_est_recipients(campaign_id, request_headers):
     print(f'Fetching messages for campaign-message {campaign_id}')
     url = f'https://a.klaviyo.com/api/campaign-recipient-estimations/{campaign_id}'
     
-    r = requests.get(url, headers=request_headers)
+    r = get_klaviyo_client(request_headers).get(url)
+    r.raise_for_status()
     r_json = json.loads(r.text)
     
     return r_json.get('data',{}).get('attributes',{}).get('estimated_recipient_count',0)
-    
+
+
+class TemplateStore:
+    """Content-addressed storage of message html templates in S3
+
+    Each distinct template html is uploaded once to '{prefix}/{sha256}.html'.  A hash
+    index (template_id / message_id -> hash, plus every uploaded hash) is kept as a
+    JSON state file, so templates already stored are neither downloaded nor uploaded
+    again on later runs.
+
+    Args:
+        bucket (str): S3 bucket templates are stored in
+        s3_client (boto3.client): S3 client
+        index_path (str): Local path or 's3://bucket/key' of the hash index
+        prefix (str): S3 prefix templates are stored under
+    """
+
+    def __init__(self, bucket: str, s3_client, index_path: str, prefix: str = 'klayvio/templates'):
+        self.bucket = bucket
+        self.s3_client = s3_client
+        self.index_path = index_path
+        self.prefix = prefix
+        self.index = load_json_state(index_path, default={'hashes': [], 'templates': {}, 'messages': {}})
+        self.hashes = set(self.index['hashes'])
+        self.uploaded = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def key(self, template_hash: str):
+        """S3 key of a stored template"""
+        return f'{self.prefix}/{template_hash}.html'
+
+    def lookup(self, message_id: str, template_id: str = None):
+        """Return the hash of a message's template if it is already stored, else None"""
+        with self._lock:
+            template_hash = self.index['messages'].get(message_id) or self.index['templates'].get(template_id)
+            if template_hash in self.hashes:
+                self.index['messages'][message_id] = template_hash
+                self.reused += 1
+                return template_hash
+        return None
+
+    def put(self, html: str, message_id: str, template_id: str = None):
+        """Store a template (uploading it only if its content is new) and return its hash"""
+        body = html.encode('utf-8')
+        template_hash = hashlib.sha256(body).hexdigest()
+
+        with self._lock:
+            is_new = template_hash not in self.hashes
+            self.hashes.add(template_hash)
+
+        if is_new:
+            self.s3_client.put_object(Bucket=self.bucket,
+                                      Key=self.key(template_hash),
+                                      Body=body,
+                                      ContentType='text/html')
+
+        with self._lock:
+            self.uploaded += int(is_new)
+            self.reused += int(not is_new)
+            self.index['messages'][message_id] = template_hash
+            if template_id:
+                self.index['templates'][template_id] = template_hash
+        return template_hash
+
+    def save(self):
+        """Persist the hash index"""
+        self.index['hashes'] = sorted(self.hashes)
+        save_json_state(self.index_path, self.index)
+        print(f'Templates: {self.uploaded} uploaded, {self.reused} reused ({len(self.hashes)} stored)')
+
+
+def _hydrate_message(message_id: str, request_headers: dict, template_store: TemplateStore = None):
+    """Return (sent message records, html template or template hash) for a campaign message
+
+    With a template_store the template is only downloaded when its hash is not already
+    in the store's index, and the template hash is returned instead of the html.
+    """
+
+    messages = _get_message_details(message_id, request_headers)
+
+    if template_store is None:
+        return messages, _get_message_html_template(message_id, request_headers)
+
+    template_id = messages[0]['template_id'] if messages else None
+    template_hash = template_store.lookup(message_id, template_id)
+    if template_hash is None:
+        html = _get_message_html_template(message_id, request_headers)
+        template_hash = template_store.put(html, message_id, template_id) if html else None
+
+    return messages, template_hash
+
+
+def hydrate_campaigns(campaigns: list, request_headers: dict, max_workers: int = KLAVIYO_MAX_CONCURRENCY,
+                      template_store: TemplateStore = None):
+    """Fetch message details, html templates & estimated recipients for a list of campaigns
+
+    Every call (one recipient estimate per campaign, plus message details & template per
+    campaign message) is fanned out over a thread pool.  The Klaviyo client's
+    AdaptiveConcurrencyLimiter caps how many are in flight based on Klaviyo's rate limit
+    headers and retries rate limited calls, so no campaign is skipped.
+
+    Args:
+        campaigns (list): Flattened campaigns (see list_all_campaigns)
+        request_headers (dict): Klaviyo request headers
+        max_workers (int): Maximum number of worker threads
+        template_store (TemplateStore): If given, templates are stored once by content
+            hash and message records hold template_hash instead of html_template
+
+    Returns:
+        (list, list): campaigns (with estimated_recipient_count added) and sent message
+            records (one per sent message, with campaign_id and html_template / template_hash)
+    """
+
+    print(f'Hydrating {len(campaigns)} campaigns with up to {max_workers} workers')
+
+    template_field = 'html_template' if template_store is None else 'template_hash'
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        recipient_futures = {
+            campaign['campaign_id']: executor.submit(_get_campaign_est_recipients, campaign['campaign_id'], request_headers)
+            for campaign in campaigns
+        }
+        message_futures = {
+            message_id: executor.submit(_hydrate_message, message_id, request_headers, template_store)
+            for campaign in campaigns for message_id in campaign.get('message_ids', [])
+        }
+
+        hydrated_campaigns = []
+        all_messages = []
+        for campaign in campaigns:
+            hydrated_campaigns.append({
+                **campaign,
+                'estimated_recipient_count': recipient_futures[campaign['campaign_id']].result()
+            })
+
+            for message_id in campaign.get('message_ids', []):
+                messages, template = message_futures[message_id].result()
+                for message in messages:
+                    all_messages.append({
+                        'campaign_id': campaign['campaign_id'],
+                        **message,
+                        template_field: template
+                    })
+
+    print(f'Hydrated {len(hydrated_campaigns)} campaigns ({len(all_messages)} sent messages)')
+
+    return hydrated_campaigns, all_messages
+
     
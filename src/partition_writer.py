@@ -0,0 +1,171 @@
+"""
+Validate & write many partitions of one table concurrently.
+
+Jobs that cover a date range (ie. shipbob_order_details, shopify_order_details) produce
+one frame per partition.  PartitionWriter validates each frame against the table's
+Pydantic model on the calling thread, then hands the upload to a thread pool, so a
+backfill takes about as long as its slowest upload rather than the sum of all of them.
+
+The frames waiting on / being uploaded are bounded by `max_inflight_bytes`: submit()
+blocks until enough earlier uploads have finished, so a long backfill never holds every
+partition in memory at once.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Type
+
+import pandas as pd
+import pyarrow as pa
+from loguru import logger
+from pydantic import BaseModel
+
+from utils import (DEFAULT_OUTPUT_FORMAT, S3WriteResult, validate_dataframe,
+                   write_df_to_s3)
+
+PARTITION_WRITE_MAX_WORKERS = int(os.getenv('PARTITION_WRITE_MAX_WORKERS', 8))
+PARTITION_WRITE_MAX_INFLIGHT_BYTES = int(
+    os.getenv('PARTITION_WRITE_MAX_INFLIGHT_BYTES', 512 * 1024 * 1024))
+
+
+class PartitionWriter:
+    """Validates partitions of a table & uploads them to s3 on a thread pool
+
+    Args:
+        s3_bucket (str): S3 bucket of the table
+        s3_client (boto3.client): S3 client (shared by the upload threads)
+        model (Type[BaseModel]): Pydantic model every record is validated against
+        s3_key (Callable[[str], str]): Returns the object key for a partition value
+        output_format (str): 'csv' or 'parquet'
+        schema (pa.Schema): Parquet schema (see utils.ddl_arrow_schema)
+        max_workers (int): Number of concurrent uploads
+        max_inflight_bytes (int): Upper bound on the size of the validated frames
+            waiting on / being uploaded
+    """
+
+    def __init__(self,
+                 s3_bucket: str,
+                 s3_client,
+                 model: Type[BaseModel],
+                 s3_key: Callable[[str], str],
+                 output_format: str = DEFAULT_OUTPUT_FORMAT,
+                 schema: pa.Schema = None,
+                 max_workers: int = PARTITION_WRITE_MAX_WORKERS,
+                 max_inflight_bytes: int = PARTITION_WRITE_MAX_INFLIGHT_BYTES):
+        self.s3_bucket = s3_bucket
+        self.s3_client = s3_client
+        self.model = model
+        self.s3_key = s3_key
+        self.output_format = output_format
+        self.schema = schema
+        self.max_inflight_bytes = max_inflight_bytes
+
+        self.written: Dict[str, S3WriteResult] = {}  # partition -> write result
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = {}
+        self._inflight_bytes = 0
+        self._inflight = threading.Condition()
+
+    def submit(self, partition: str, df: pd.DataFrame):
+        """Validate the records of one partition & schedule their upload
+
+        Raises:
+            ValueError: If any record fails validation
+        """
+
+        # Validate data w/ Pydantic
+        valid_data, invalid_data = validate_dataframe(df, self.model)
+
+        logger.info(f'{self.model.__name__} {partition} - total records in df: {len(df)}')
+        logger.info(f'{self.model.__name__} {partition} - total records in valid_data: {len(valid_data)}')
+        logger.info(f'{self.model.__name__} {partition} - total records in invalid_data: {len(invalid_data)}')
+
+        if len(invalid_data) > 0:
+            for invalid in invalid_data:
+                logger.error(f'Invalid data: {invalid}')
+
+            raise ValueError(f'Invalid data!')
+
+        if len(valid_data) == 0:
+            return
+
+        valid_df = pd.DataFrame(valid_data)
+        size = int(valid_df.memory_usage(deep=True).sum())
+
+        # Wait for room (a frame larger than the limit still goes once nothing else is in flight)
+        with self._inflight:
+            self._inflight.wait_for(
+                lambda: self._inflight_bytes == 0 or self._inflight_bytes +
+                size <= self.max_inflight_bytes)
+            self._inflight_bytes += size
+
+        future = self._executor.submit(self._upload, partition, valid_df, size)
+        self._futures[future] = partition
+
+    def submit_groups(self, df: pd.DataFrame, by):
+        """Split a frame into partitions in a single pass & submit each of them
+
+        Args:
+            df (pd.DataFrame): Records of any number of partitions
+            by: Column name or Series (aligned with df) holding each record's partition
+        """
+
+        for partition, partition_df in df.groupby(by, sort=True):
+            self.submit(str(partition), partition_df)
+
+    def _upload(self, partition: str, df: pd.DataFrame, size: int):
+        try:
+            return write_df_to_s3(bucket=self.s3_bucket,
+                                  key=self.s3_key(partition),
+                                  df=df,
+                                  s3_client=self.s3_client,
+                                  output_format=self.output_format,
+                                  model=self.model,
+                                  schema=self.schema)
+        finally:
+            with self._inflight:
+                self._inflight_bytes -= size
+                self._inflight.notify_all()
+
+    def close(self):
+        """Wait for every upload to finish
+
+        Returns:
+            (Dict[str, S3WriteResult]): Partition -> write result
+
+        Raises:
+            ValueError: If any upload failed
+        """
+
+        self._executor.shutdown(wait=True)
+
+        errors = []
+        for future, partition in self._futures.items():
+            try:
+                self.written[partition] = future.result()
+            except Exception as e:
+                logger.error(f'Error writing {partition} to s3: {str(e)}')
+                errors.append(partition)
+        self._futures = {}
+
+        if errors:
+            raise ValueError(f'Error writing data! Failed partitions: {errors}')
+
+        changed = sum(result.changed for result in self.written.values())
+        logger.info(
+            f'Wrote {changed} {self.model.__name__} partitions ({len(self.written) - changed} unchanged)'
+        )
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Let running uploads finish but don't start the queued ones
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            return False
+        self.close()
+        return False
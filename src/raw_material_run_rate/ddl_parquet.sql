@@ -0,0 +1,16 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS katana_raw_material_run_rate_parquet (
+    katana_ingredient_sku STRING,
+    katana_ingredient_name STRING,
+    katana_unit_of_measure STRING,
+    daily_run_rate DOUBLE,
+    inventory_on_hand DOUBLE,
+    inventory_as_of DATE,
+    days_on_hand DOUBLE,
+    reorder_point DOUBLE
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/katana/raw_material_run_rate/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
@@ -0,0 +1,264 @@
+"""
+Record/replay of vendor API traffic for offline profiling of the connectors.
+
+record_fixtures() mounts a RecordingAdapter on every connector session (see
+connectors.set_transport_adapter), so running any connector function against the live
+APIs captures each response (status, headers incl. 'Next-Page' / 'Total-Pages' /
+Link, body and latency) into a gzipped JSONL fixture archive.  Credentials are
+scrubbed from urls, headers and bodies, and customer PII fields are redacted from
+json bodies before anything is written.
+
+replay_fixtures() mounts a ReplayAdapter that serves those responses back by method
+& url, sleeping for the recorded latency (scaled by `latency_scale`), so the same
+connector functions run unchanged with no network access:
+
+    with record_fixtures('fixtures/shipbob_inventory.jsonl.gz', secrets=[api_secret]):
+        get_shipbob_inventory(api_secret)
+
+    with replay_fixtures('fixtures/shipbob_inventory.jsonl.gz', latency_scale=0.5):
+        get_shipbob_inventory('replay')
+"""
+
+import base64
+import contextlib
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from loguru import logger
+
+from connectors import POOL_CONNECTIONS, POOL_MAXSIZE, set_transport_adapter
+
+REDACTED = 'REDACTED'
+
+# Query params whose values are always scrubbed from recorded urls
+SECRET_PARAMS = {
+    'api_key', 'apikey', 'key', 'token', 'access_token', 'password', 'secret',
+    'signature', 'x-amz-signature', 'x-amz-credential', 'x-amz-security-token'
+}
+
+# Response headers that are not recorded
+DROPPED_HEADERS = {'set-cookie', 'authorization', 'www-authenticate'}
+
+# Body is stored decoded, so these no longer describe it on replay
+TRANSPORT_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# Json body fields holding customer PII, redacted in recorded bodies
+DEFAULT_SCRUB_FIELDS = {
+    'email', 'phone', 'phone_number', 'first_name', 'last_name', 'address1',
+    'address2', 'zip', 'latitude', 'longitude'
+}
+
+_USERINFO_RE = re.compile(r'(https?://)[^/@\s]+@')
+
+
+def normalize_url(url: str):
+    """Url with credentials & secret params scrubbed and query params sorted (replay match key)"""
+
+    url = _USERINFO_RE.sub(r'\1', url)
+    parts = urlsplit(url)
+    params = sorted((k, REDACTED if k.lower() in SECRET_PARAMS else v)
+                    for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path,
+                       urlencode(params), ''))
+
+
+def _scrub_json(value, scrub_fields: set):
+    """Recursively redact PII fields in a parsed json body"""
+
+    if isinstance(value, dict):
+        return {
+            k: (REDACTED if k in scrub_fields and v is not None else
+                _scrub_json(v, scrub_fields))
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub_json(v, scrub_fields) for v in value]
+    return value
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTP adapter that sends requests as usual and records every response
+
+    Args:
+        secrets (Iterable[str]): Credential values replaced with REDACTED wherever
+            they appear in recorded urls, headers or bodies
+        scrub_fields (set): Json body fields redacted in recorded bodies
+    """
+
+    def __init__(self,
+                 secrets: Iterable[str] = (),
+                 scrub_fields: set = DEFAULT_SCRUB_FIELDS,
+                 **kwargs):
+        kwargs.setdefault('pool_connections', POOL_CONNECTIONS)
+        kwargs.setdefault('pool_maxsize', POOL_MAXSIZE)
+        super().__init__(**kwargs)
+        self.secrets = [s for s in secrets if s]
+        self.scrub_fields = scrub_fields
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _scrub_text(self, text: str):
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return _USERINFO_RE.sub(r'\1', text)
+
+    def _scrub_body(self, content: bytes):
+        """Return the body as (text, encoding) with secrets & PII removed"""
+        try:
+            text = content.decode('utf-8')
+        except UnicodeDecodeError:
+            return base64.b64encode(content).decode('ascii'), 'base64'
+
+        try:
+            text = json.dumps(_scrub_json(json.loads(text), self.scrub_fields))
+        except ValueError:
+            pass  # not json, only credentials are scrubbed
+        return self._scrub_text(text), 'utf-8'
+
+    def send(self, request, **kwargs):
+        started_at = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content  # read the body so latency covers the transfer
+        elapsed = time.perf_counter() - started_at
+
+        body, body_encoding = self._scrub_body(content)
+        record = {
+            'method': request.method,
+            'url': normalize_url(self._scrub_text(request.url)),
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': {
+                k: self._scrub_text(v)
+                for k, v in response.headers.items()
+                if k.lower() not in DROPPED_HEADERS
+            },
+            'body': body,
+            'body_encoding': body_encoding,
+            'elapsed': round(elapsed, 6)
+        }
+        with self._lock:
+            self.records.append(record)
+        return response
+
+    def save(self, path: str):
+        """Write the recorded responses to a gzipped JSONL fixture archive"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for record in self.records:
+                f.write(json.dumps(record) + '\n')
+        logger.info(f'Recorded {len(self.records)} responses to {path}')
+
+
+def load_fixtures(path: str):
+    """Load the recorded responses from a fixture archive"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayAdapter(BaseAdapter):
+    """HTTP adapter that serves recorded responses instead of going to the network
+
+    Responses are matched on method & normalized url.  Requests repeated more often
+    than they were recorded cycle through the recorded responses again, so a
+    fixture can be replayed any number of times.
+
+    Args:
+        records (list): Recorded responses (see load_fixtures)
+        latency_scale (float): Multiplier on the recorded latency (0 = no delay)
+    """
+
+    def __init__(self, records: list, latency_scale: float = 1.0):
+        super().__init__()
+        self.latency_scale = latency_scale
+        self.requests_served = 0
+        self._responses = defaultdict(list)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+        for record in records:
+            self._responses[(record['method'], record['url'])].append(record)
+
+    def send(self, request, **kwargs):
+        key = (request.method, normalize_url(request.url))
+        with self._lock:
+            recorded = self._responses.get(key)
+            if not recorded:
+                raise ValueError(
+                    f'No recorded response for {request.method} {key[1]}')
+            record = recorded[self._positions[key] % len(recorded)]
+            self._positions[key] += 1
+            self.requests_served += 1
+
+        if self.latency_scale:
+            time.sleep(record['elapsed'] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = record['status_code']
+        response.reason = record['reason']
+        response.headers = CaseInsensitiveDict({
+            k: v
+            for k, v in record['headers'].items()
+            if k.lower() not in TRANSPORT_HEADERS
+        })
+        if record['body_encoding'] == 'base64':
+            response._content = base64.b64decode(record['body'])
+        else:
+            response._content = record['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.timedelta(seconds=record['elapsed'])
+        return response
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def record_fixtures(path: str,
+                    secrets: Iterable[str] = (),
+                    scrub_fields: Optional[set] = None):
+    """Record every connector response made inside the block to a fixture archive
+
+    Args:
+        path (str): Fixture archive path (ie. 'fixtures/shipbob_inventory.jsonl.gz')
+        secrets (Iterable[str]): Credential values to scrub from the recording
+        scrub_fields (set): Json fields to redact (defaults to DEFAULT_SCRUB_FIELDS)
+    """
+    adapter = RecordingAdapter(
+        secrets,
+        DEFAULT_SCRUB_FIELDS if scrub_fields is None else scrub_fields)
+    set_transport_adapter(adapter)
+    try:
+        yield adapter
+    finally:
+        set_transport_adapter(None)
+    adapter.save(path)
+
+
+@contextlib.contextmanager
+def replay_fixtures(path: str, latency_scale: float = 1.0):
+    """Serve every connector request made inside the block from a fixture archive
+
+    Args:
+        path (str): Fixture archive path
+        latency_scale (float): Multiplier on the recorded latency (0 = no delay)
+    """
+    adapter = ReplayAdapter(load_fixtures(path), latency_scale)
+    set_transport_adapter(adapter)
+    try:
+        yield adapter
+    finally:
+        set_transport_adapter(None)
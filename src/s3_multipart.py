@@ -0,0 +1,163 @@
+"""
+Streaming uploads to S3 through a bounded in-memory buffer.
+
+S3MultipartWriter is a write-only file object: bytes written to it are held in a buffer
+of at most ~`part_size` and pushed to S3 as multipart upload parts whenever the buffer
+fills, so the memory used by an upload stays constant regardless of the object size.
+Objects smaller than one part are written with a single put_object instead.
+
+Use it as a context manager - the upload is completed when the block exits normally
+and aborted (no partial object is left behind) when it raises.
+"""
+
+import os
+
+from loguru import logger
+
+# S3 requires every part except the last to be at least 5 MiB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_PART_SIZE = max(int(os.getenv('S3_PART_SIZE', 8 * 1024 * 1024)),
+                   S3_MIN_PART_SIZE)
+
+
+class S3MultipartWriter:
+    """Write-only file object that streams its contents to s3://bucket/key"""
+
+    def __init__(self,
+                 s3_client,
+                 bucket: str,
+                 key: str,
+                 content_type: str,
+                 part_size: int = S3_PART_SIZE,
+                 metadata: dict = None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = part_size
+        self.metadata = metadata or {}  # S3 user metadata stored on the object
+
+        self.closed = False
+        self.response = None  # put_object / complete_multipart_upload response
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._parts = []
+
+    # ---- file object interface (enough for pandas / pyarrow writers) ----
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readable(self):
+        return False
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError(f'Write to closed upload s3://{self.bucket}/{self.key}')
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self._buffer += data
+        self._position += len(data)
+
+        if len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+        return len(data)
+
+    # ---- upload lifecycle ----
+
+    def _upload_part(self):
+        """Push the buffered bytes to S3 as the next multipart part"""
+
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                Metadata=self.metadata)
+            self._upload_id = response['UploadId']
+            logger.info(
+                f'Started multipart upload to s3://{self.bucket}/{self.key}')
+
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(Bucket=self.bucket,
+                                              Key=self.key,
+                                              UploadId=self._upload_id,
+                                              PartNumber=part_number,
+                                              Body=bytes(self._buffer))
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        logger.info(
+            f'Uploaded part {part_number} ({len(self._buffer)} bytes) of s3://{self.bucket}/{self.key}'
+        )
+
+        self._buffer = bytearray()
+
+    def close(self):
+        """Upload whatever is buffered & complete the object
+
+        Returns:
+            (dict): The put_object / complete_multipart_upload response
+        """
+
+        if self.closed:
+            return self.response
+        self.closed = True
+
+        # Everything fit in one part - a plain put_object is cheaper
+        if self._upload_id is None:
+            self.response = self.s3_client.put_object(
+                Body=bytes(self._buffer),
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                Metadata=self.metadata)
+            self._buffer = bytearray()
+            return self.response
+
+        if self._buffer:
+            self._upload_part()
+
+        self.response = self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={'Parts': self._parts})
+        logger.info(
+            f'Completed multipart upload of s3://{self.bucket}/{self.key} ({len(self._parts)} parts, {self._position} bytes)'
+        )
+        return self.response
+
+    def abort(self):
+        """Discard the upload (any parts already sent to S3 are deleted)"""
+
+        self.closed = True
+        self._buffer = bytearray()
+
+        if self._upload_id is not None:
+            logger.warning(
+                f'Aborting multipart upload of s3://{self.bucket}/{self.key}')
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket,
+                                                  Key=self.key,
+                                                  UploadId=self._upload_id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
@@ -0,0 +1,22 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS shipbob_inventory_details_parquet (
+    id INT,
+    name STRING,
+    is_digital BOOLEAN,
+    is_case_pick BOOLEAN,
+    is_lot BOOLEAN,
+    total_fulfillable_quantity INT,
+    total_onhand_quantity INT,
+    total_committed_quantity INT,
+    total_sellable_quantity INT,
+    total_awaiting_quantity INT,
+    total_exception_quantity INT,
+    total_internal_transfer_quantity INT,
+    total_backordered_quantity INT,
+    is_active BOOLEAN
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/shipbob/inventory_details/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
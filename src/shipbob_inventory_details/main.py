@@ -9,6 +9,9 @@ sys.path.append('src/')  # updating path back to root for importing modules
 from utils import *
 from models import *
 
+# Parquet files are written with the csv table's column types
+TABLE_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl.sql'))
+
 
 def main():
     logger.info('Running main()')
@@ -53,6 +56,13 @@ def main():
         required=False,
         default=None,
         help='Partition date for output in YYYY-MM-DD format (defaults to today EDT)')
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     args = parser.parse_args()
 
     # ------ GET INVENTORY ------
@@ -68,10 +78,7 @@ def main():
     else:
 
         # Instantiate s3 client
-        s3_client = boto3.client('s3',
-                                 region_name=region,
-                                 aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                 aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+        s3_client = get_aws_client('s3', region)
 
         # Validate data w/ Pydantic
         valid_data, invalid_data = validate_dataframe(inventory_df,
@@ -87,6 +94,7 @@ def main():
 
                 raise ValueError(f'Invalid data!')
 
+        writes = []
         if len(valid_data) > 0:
 
             logger.info(valid_data)
@@ -101,10 +109,13 @@ def main():
 
             try:
                 # Write to s3
-                write_df_to_s3(bucket=s3_bucket,
-                               key=s3_prefix,
-                               df=pd.DataFrame(valid_data),
-                               s3_client=s3_client)
+                writes.append(write_df_to_s3(bucket=s3_bucket,
+                                             key=s3_prefix,
+                                             df=pd.DataFrame(valid_data),
+                                             s3_client=s3_client,
+                                             output_format=args.output_format,
+                                             model=ShipbobInventory,
+                                             schema=TABLE_SCHEMA))
 
             except Exception as e:
                 logger.error(f'Error writing to s3: {str(e)}')
@@ -115,17 +126,11 @@ def main():
         # -----------------
         # Run Athena query to update partitions
         # -----------------
-        logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-        # Define SQL query
-        sql_query = """MSCK REPAIR TABLE shipbob_inventory_details"""
-
-        logger.info(f'SQL query: {sql_query}')
-
-        run_athena_query_no_results(query=sql_query,
-                                    bucket=s3_bucket,
-                                    database=glue_database,
-                                    region=region)
+        repair_table_if_changed(table_name=table_name_for_format('shipbob_inventory_details', args.output_format),
+                                writes=writes,
+                                bucket=s3_bucket,
+                                database=glue_database,
+                                region=region)
 
 
 if __name__ == "__main__":
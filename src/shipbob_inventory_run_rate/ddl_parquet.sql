@@ -0,0 +1,15 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS shipbob_inventory_run_rate_parquet (
+    inventory_id INT,
+    run_rate DOUBLE,
+    name STRING,
+    total_fulfillable_quantity INT,
+    est_stock_days_on_hand DOUBLE,
+    estimated_stockout_date DATE,
+    restock_point INT
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/shipbob/inventory_run_rate/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
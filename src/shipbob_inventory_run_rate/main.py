@@ -10,6 +10,9 @@ sys.path.append('src/')  # updating path back to root for importing modules
 from utils import *
 from models import *
 
+# Parquet files are written with the csv table's column types
+TABLE_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl.sql'))
+
 
 def main():
     logger.info('Running main()')
@@ -43,6 +46,13 @@ def main():
     )
 
     # Parse input args
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     args = parser.parse_args()
     logger.info(f'Args: {args}')
 
@@ -349,6 +359,7 @@ def main():
 
                 raise ValueError('Invalid data!')
 
+        writes = []
         if len(valid_data) > 0:
 
             logger.info(f'Attempting to write valid data to s3..')
@@ -361,17 +372,16 @@ def main():
             try:
 
                 # Instantiate s3 client
-                s3_client = boto3.client(
-                    's3',
-                    region_name=region,
-                    aws_access_key_id=AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+                s3_client = get_aws_client('s3', region)
 
                 # Write to s3
-                write_df_to_s3(bucket=s3_bucket,
-                               key=s3_prefix,
-                               df=pd.DataFrame(valid_data),
-                               s3_client=s3_client)
+                writes.append(write_df_to_s3(bucket=s3_bucket,
+                                             key=s3_prefix,
+                                             df=pd.DataFrame(valid_data),
+                                             s3_client=s3_client,
+                                             output_format=args.output_format,
+                                             model=DailyRunRate,
+                                             schema=TABLE_SCHEMA))
 
             except Exception as e:
                 logger.error(f'Error writing to s3: {str(e)}')
@@ -383,17 +393,11 @@ def main():
         # -----------------
         # Run Athena query to update partitions
         # -----------------
-        logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-        # Define SQL query
-        sql_query = """MSCK REPAIR TABLE shipbob_inventory_run_rate"""
-
-        logger.info(f'SQL query: {sql_query}')
-
-        run_athena_query_no_results(query=sql_query,
-                                    bucket=s3_bucket,
-                                    database=glue_database,
-                                    region=region)
+        repair_table_if_changed(table_name=table_name_for_format('shipbob_inventory_run_rate', args.output_format),
+                                writes=writes,
+                                bucket=s3_bucket,
+                                database=glue_database,
+                                region=region)
 
         # Increment start date
         start_date = pd.to_datetime(start_date) + timedelta(days=1)
@@ -9,6 +9,111 @@ sys.path.append('src/')  # updating path back to root for importing modules
 
 from utils import *
 from models import *
+from state_store import load_json_state, save_json_state
+from partition_writer import PartitionWriter
+
+# Re-read orders updated shortly before the watermark on the next incremental run
+WATERMARK_OVERLAP = timedelta(minutes=15)
+
+# Parquet files are written with the csv table's column types
+TABLE_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl.sql'))
+
+
+def order_details_key(order_date: str):
+    """S3 key of the order details csv for an order_date partition"""
+    return f"shipbob/order_details/order_date={order_date}/shipbob_order_details_{order_date.replace('-','_')}.csv"
+
+
+def order_details_writer(s3_bucket: str, s3_client,
+                         output_format: str = DEFAULT_OUTPUT_FORMAT):
+    """PartitionWriter that validates order details & writes them to their order_date partition"""
+    return PartitionWriter(s3_bucket=s3_bucket,
+                           s3_client=s3_client,
+                           model=ShipbobOrderDetails,
+                           s3_key=order_details_key,
+                           output_format=output_format,
+                           schema=TABLE_SCHEMA)
+
+
+def run_incremental(shipbob_api_secret: str, watermark_path: str,
+                    default_watermark: str, s3_bucket: str, s3_client,
+                    output_format: str = DEFAULT_OUTPUT_FORMAT):
+    """Fetch orders changed since the last run & merge them into their order_date partitions
+
+    Args:
+        shipbob_api_secret (str): ShipBob API secret
+        watermark_path (str): Local path or s3://bucket/key of the watermark state
+        default_watermark (str): Watermark to use when no state exists yet
+        s3_bucket (str): S3 bucket of the order details table
+        s3_client (boto3.client): S3 client
+        output_format (str): File format the partitions are rewritten in
+
+    Returns:
+        (List[S3WriteResult]): Result of each partition write
+    """
+
+    state = load_json_state(watermark_path, default={})
+    watermark = state.get('watermark', default_watermark)
+    run_started_at = datetime.now(pytz.utc).replace(microsecond=0)
+
+    logger.info(f'Incremental run - orders updated since {watermark}')
+
+    changed_df = get_shipbob_orders_updated_since(
+        api_secret=shipbob_api_secret,
+        updated_since=watermark,
+        updated_until=run_started_at.isoformat())
+
+    logger.info(
+        f"Changed order count: {changed_df['shipbob_order_id'].nunique()}")
+
+    writes = []
+
+    if len(changed_df) > 0:
+
+        changed_df['order_date'] = pd.to_datetime(
+            changed_df['purchase_date']).dt.strftime('%Y-%m-%d')
+
+        with order_details_writer(s3_bucket, s3_client,
+                                  output_format) as writer:
+
+            for order_date, changed_day_df in changed_df.groupby('order_date'):
+                changed_day_df = changed_day_df.drop(columns=['order_date'])
+
+                # Replace the changed orders' rows in the existing partition (if any)
+                existing_df = read_df_from_s3(bucket=s3_bucket,
+                                              key=order_details_key(order_date),
+                                              s3_client=s3_client,
+                                              output_format=output_format)
+
+                if existing_df is not None:
+                    changed_ids = set(
+                        changed_day_df['shipbob_order_id'].astype(str))
+                    existing_df = existing_df.loc[~existing_df[
+                        'shipbob_order_id'].astype(str).isin(changed_ids)]
+                    merged_df = pd.concat([existing_df, changed_day_df],
+                                          ignore_index=True)
+                else:
+                    merged_df = changed_day_df
+
+                logger.info(
+                    f'Merging {changed_day_df["shipbob_order_id"].nunique()} changed orders into order_date={order_date} ({len(merged_df)} records)'
+                )
+
+                writer.submit(order_date, merged_df)
+
+        writes = list(writer.written.values())
+
+    # Only advance the watermark once every affected partition is written
+    save_json_state(
+        watermark_path, {
+            'watermark':
+            (run_started_at - WATERMARK_OVERLAP).isoformat(),
+            'last_run_at': run_started_at.isoformat(),
+            'changed_orders': int(changed_df['shipbob_order_id'].nunique()),
+            'partitions_written': sum(write.changed for write in writes)
+        })
+
+    return writes
 
 
 def main():
@@ -38,6 +143,31 @@ def main():
         help=
         'End date to use to extract records.  Records will be extracted from the shipbob_order_details table                                 from 00:00:00 (UTC) on the start_date through 23:59:59 (UTC) on the end_date'
     )
+    parser.add_argument(
+        '--mode',
+        type=str,
+        required=False,
+        default='window',
+        choices=['window', 'incremental'],
+        help=
+        'window: re-pull all orders purchased in the date range & rewrite their partitions.  incremental: pull only orders updated since the stored watermark & merge them into the affected partitions'
+    )
+
+    parser.add_argument(
+        '--watermark_path',
+        type=str,
+        required=False,
+        default=None,
+        help=
+        'Local path or s3://bucket/key of the incremental watermark (defaults to s3://$S3_BUCKET_NAME/state/shipbob/order_details_watermark.json).  When no watermark exists yet, --start_date is used'
+    )
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     # Parse input args
     args = parser.parse_args()
     logger.info(f'Args: {args}')
@@ -83,6 +213,33 @@ def main():
         raise ValueError("AWS_ACCESS_SECRET environment variable is not set")
 
 
+    # ------ INCREMENTAL MODE ------
+
+    if args.mode == 'incremental':
+
+        # Instantiate s3 client
+        s3_client = get_aws_client('s3', region)
+
+        watermark_path = args.watermark_path or f's3://{s3_bucket}/state/shipbob/order_details_watermark.json'
+
+        writes = run_incremental(
+            shipbob_api_secret=shipbob_api_secret,
+            watermark_path=watermark_path,
+            default_watermark=pd.to_datetime(start_date).strftime(
+                '%Y-%m-%dT00:00:00+00:00'),
+            s3_bucket=s3_bucket,
+            s3_client=s3_client,
+            output_format=args.output_format)
+
+        if writes:
+            repair_table_if_changed(table_name=table_name_for_format('shipbob_order_details', args.output_format),
+                                    writes=writes,
+                                    bucket=s3_bucket,
+                                    database=glue_database,
+                                    region=region)
+
+        return
+
     # ------ GET ORDERS ------
 
     # List all orders in shipbob for a date range
@@ -104,69 +261,21 @@ def main():
             ['purchase_date'].count())
 
         # Instantiate s3 client
-        s3_client = boto3.client('s3',
-                                 region_name=region,
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
-
-        while pd.to_datetime(start_date) <= pd.to_datetime(end_date):
-            logger.info(f'start_date {start_date} - end_date {end_date}')
+        s3_client = get_aws_client('s3', region)
 
-            # Subset shipbob_orders_df to the current start_date (to avoid overlap)
-            df = shipbob_orders_df[pd.to_datetime(
-                shipbob_orders_df['purchase_date']).dt.strftime(
-                    '%Y-%m-%d') == pd.to_datetime(start_date).strftime(
-                        '%Y-%m-%d')]
+        # Split into order_date partitions in one pass & write them concurrently
+        order_date = pd.to_datetime(
+            shipbob_orders_df['purchase_date']).dt.strftime('%Y-%m-%d')
 
-            logger.info(f'Number of records for {start_date}: {len(df)}')
+        # Only the partitions in the job's date range are rewritten
+        in_range = order_date.between(
+            pd.to_datetime(start_date).strftime('%Y-%m-%d'),
+            pd.to_datetime(end_date).strftime('%Y-%m-%d'))
 
-
-           
-            # Validate data w/ Pydantic
-            valid_data, invalid_data = validate_dataframe(
-                df, ShipbobOrderDetails)
-
-            logger.info(f'Total records in df: {len(df)}')
-            logger.info(f'Total records in valid_data: {len(valid_data)}')
-            logger.info(f'Total records in invalid_data: {len(invalid_data)}')
-
-            if len(invalid_data) > 0:
-                for invalid in invalid_data:
-                    logger.error(f'Invalid data: {invalid}')
-
-                    raise ValueError(f'Invalid data!')
-
-            if len(valid_data) > 0:
-
-                # define path to write to
-                s3_prefix = f"shipbob/order_details/order_date={start_date}/shipbob_order_details_{start_date.replace('-','_')}.csv"
-
-                logger.info(f"Total nutella records: {df.loc[df['inventory_id']==14423625,'inventory_qty'].sum()}")
-
-                try:
-                    # Write to s3
-                    write_df_to_s3(bucket=s3_bucket,
-                                   key=s3_prefix,
-                                   df=pd.DataFrame(valid_data),
-                                   s3_client=s3_client)
-
-                    
-                    # with open('test.json', 'w', encoding='utf-8') as json_file:
-                    #     json.dump(valid_data, json_file, indent=2, ensure_ascii=False)
-                        
-                    #     write_list_of_dicts_to_s3(bucket=s3_bucket,
-                    #    key=s3_prefix,
-                    #    list_of_dicts=valid_data,
-                    #    s3_client=s3_client)
-
-                except Exception as e:
-                    logger.error(f'Error writing to s3: {str(e)}')
-                    raise ValueError(f'Error writing data! {str(e)}')
-
-            # Increment start_date by 1 day
-            start_date = pd.to_datetime(
-                pd.to_datetime(start_date) +
-                pd.DateOffset(days=1)).strftime('%Y-%m-%d')
+        with order_details_writer(s3_bucket, s3_client,
+                                  args.output_format) as writer:
+            writer.submit_groups(shipbob_orders_df.loc[in_range],
+                                 order_date.loc[in_range])
 
         logger.info(
             f'Finished extracting data for date range: {start_date} - {end_date}'
@@ -175,17 +284,11 @@ def main():
         # -----------------
         # Run Athena query to update partitions
         # -----------------
-        logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-        # Define SQL query
-        sql_query = """MSCK REPAIR TABLE shipbob_order_details"""
-
-        logger.info(f'SQL query: {sql_query}')
-
-        run_athena_query_no_results(query=sql_query,
-                                    bucket=s3_bucket,
-                                    database=glue_database,
-                                    region=region)
+        repair_table_if_changed(table_name=table_name_for_format('shipbob_order_details', args.output_format),
+                                writes=list(writer.written.values()),
+                                bucket=s3_bucket,
+                                database=glue_database,
+                                region=region)
 
 
 if __name__ == "__main__":
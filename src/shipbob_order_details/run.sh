@@ -23,6 +23,11 @@ if [[ $# -eq 0 ]]; then
     # Run daily job (yesterday's data)
     python3 src/shipbob_order_details/main.py
 
+elif [[ $# -eq 1 && "$1" == "incremental" ]]; then
+    # Only pull orders updated since the last incremental run (watermark stored in S3)
+    echo "-------- Running incremental sync"
+    python3 src/shipbob_order_details/main.py --mode incremental
+
 elif [[ $# -eq 2 ]]; then
     start_date=$1
     end_date=$2
@@ -30,6 +35,6 @@ elif [[ $# -eq 2 ]]; then
     python3 src/shipbob_order_details/main.py --start_date $start_date --end_date $end_date
 
 else
-    echo "Usage: run.sh [start_date end_date]"
+    echo "Usage: run.sh [start_date end_date | incremental]"
     exit 1
 fi
@@ -0,0 +1,15 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS shopify_active_variant_sku_details_parquet (
+    product_id STRING,
+    product_title STRING,
+    variant_id STRING,
+    variant_title STRING,
+    variant_sku STRING,
+    inventory_quantity FLOAT,
+    published_at DATE
+)
+PARTITIONED BY (
+    partition_date DATE
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/shopify/active_variant_sku_details/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
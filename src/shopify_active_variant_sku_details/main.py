@@ -10,6 +10,9 @@ sys.path.append('src/')  # updating path back to root for importing modules
 from utils import *
 from models import *
 
+# Parquet files are written with the csv table's column types
+TABLE_SCHEMA = ddl_arrow_schema(os.path.join(os.path.dirname(__file__), 'ddl.sql'))
+
 def main():
     
     logger.info('Running main()')
@@ -22,6 +25,19 @@ def main():
         required=False,
         default=None,
         help='Partition date for output in YYYY-MM-DD format (defaults to today EDT)')
+    parser.add_argument(
+        '--catalog_cache',
+        type=str,
+        required=False,
+        default=os.getenv('SHOPIFY_CATALOG_CACHE'),
+        help='Local path or s3://bucket/key of the product catalog cache (defaults to s3://$S3_BUCKET_NAME/state/shopify/product_catalog.json).  Use "none" for a full catalog pull without a cache')
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     args = parser.parse_args()
     
     # ------------------- CONFIGURE ENV VARIABLES -------------------
@@ -36,9 +52,16 @@ def main():
     shopify_api_pw = os.getenv('SHOPIFY_API_PW')
     shopify_store_url = os.getenv('SHOPIFY_STORE_URL')
     
+    # Product catalog cache (only products changed since the last run are fetched)
+    catalog_cache = args.catalog_cache or f's3://{s3_bucket}/state/shopify/product_catalog.json'
+    if catalog_cache.lower() == 'none':
+        catalog_cache = None
+    logger.info(f'Product catalog cache: {catalog_cache}')
+
     # ------------------- LIST ACTIVE SKUS -------------------
     
-    active_variant_sku_dict = list_active_shopify_variant_skus(shopify_api_key, shopify_api_pw,shopify_store_url)
+    active_variant_sku_dict = list_active_shopify_variant_skus(shopify_api_key, shopify_api_pw,shopify_store_url,
+                                                               catalog_cache_path=catalog_cache)
 
     # Convert to pd dataframe
     active_variant_sku_df = pd.DataFrame(active_variant_sku_dict)
@@ -67,6 +90,7 @@ def main():
 
             raise ValueError(f'Invalid data!')
 
+    writes = []
     if len(valid_data) > 0:
 
         logger.info(valid_data)
@@ -76,10 +100,7 @@ def main():
         # ------------------- WRITE TO S3 -------------------
 
         # Instantiate s3 client
-        s3_client = boto3.client('s3',
-                                 region_name=region,
-                                 aws_access_key_id=AWS_ACCESS_KEY_ID,
-                                 aws_secret_access_key=AWS_SECRET_ACCESS_KEY)
+        s3_client = get_aws_client('s3', region)
         
         # define path to write to
         today = args.partition_date if args.partition_date else pd.to_datetime(
@@ -90,10 +111,13 @@ def main():
 
         try:
             # Write to s3
-            write_df_to_s3(bucket=s3_bucket,
-                           key=s3_prefix,
-                           df=pd.DataFrame(valid_data),
-                           s3_client=s3_client)
+            writes.append(write_df_to_s3(bucket=s3_bucket,
+                                         key=s3_prefix,
+                                         df=pd.DataFrame(valid_data),
+                                         s3_client=s3_client,
+                                         output_format=args.output_format,
+                                         model=ShopifyProductVariantDetails,
+                                         schema=TABLE_SCHEMA))
 
         except Exception as e:
             logger.error(f'Error writing to s3: {str(e)}')
@@ -104,17 +128,11 @@ def main():
     # -----------------
     # Run Athena query to update partitions
     # -----------------
-    logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-    # Define SQL query
-    sql_query = """MSCK REPAIR TABLE shopify_active_variant_sku_details"""
-
-    logger.info(f'SQL query: {sql_query}')
-
-    run_athena_query_no_results(query=sql_query,
-                                bucket=s3_bucket,
-                                database=glue_database,
-                                region=region)
+    repair_table_if_changed(table_name=table_name_for_format('shopify_active_variant_sku_details', args.output_format),
+                            writes=writes,
+                            bucket=s3_bucket,
+                            database=glue_database,
+                            region=region)
 
 
 if __name__ == "__main__":
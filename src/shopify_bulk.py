@@ -0,0 +1,389 @@
+"""
+Shopify bulk operation (GraphQL) extraction for historical order backfills.
+
+Instead of paging the REST /orders endpoint 250 orders at a time for every day in a
+range, a single bulk operation is submitted for the whole range.  Shopify writes the
+results to a JSONL file (one line per order and one line per line item, linked by
+`__parentId`), which is streamed and parsed straight into the same orders and line
+items frames returned by utils.get_shopify_orders_by_date.  Shopify writes each
+order's line items right after the order, so an order is turned into its records as
+soon as the next order starts - only the order being read is held as raw json.
+
+LocalBulkOperationClient is a file-backed stand-in for the bulk endpoint, so the
+parsing and job code can be exercised offline against a saved JSONL file.
+"""
+
+import json
+import re
+import time
+from typing import Iterator, Optional
+
+import pandas as pd
+import requests
+from loguru import logger
+
+from connectors import DEFAULT_TIMEOUT, get_shopify_client
+
+# Bulk operations need a newer Admin API version than the REST jobs use
+SHOPIFY_GRAPHQL_API_VERSION = '2024-10'
+BULK_POLL_INTERVAL = 5  # seconds between status checks
+BULK_TIMEOUT = 60 * 60  # seconds to wait for a bulk operation to finish
+
+ORDER_COLUMNS = [
+    'order_id', 'email', 'created_at', 'order_date', 'subtotal_price',
+    'total_line_items_price', 'total_tax', 'total_discounts',
+    'total_shipping_fee', 'total_price', 'shipping_address', 'shipping_city',
+    'shipping_province', 'shipping_country'
+]
+
+LINE_ITEM_COLUMNS = [
+    'order_id', 'email', 'created_at', 'order_date', 'price', 'quantity', 'sku',
+    'title', 'variant_title', 'line_item_name'
+]
+
+ORDERS_BULK_QUERY = '''
+{
+  orders(query: "created_at:>='%(created_at_min)s' AND created_at:<='%(created_at_max)s'") {
+    edges {
+      node {
+        id
+        name
+        email
+        createdAt
+        subtotalPriceSet { shopMoney { amount } }
+        totalTaxSet { shopMoney { amount } }
+        totalDiscountsSet { shopMoney { amount } }
+        totalShippingPriceSet { shopMoney { amount } }
+        totalPriceSet { shopMoney { amount } }
+        shippingAddress { address1 city province country }
+        lineItems {
+          edges {
+            node {
+              id
+              sku
+              title
+              variantTitle
+              name
+              quantity
+              originalUnitPriceSet { shopMoney { amount } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+'''
+
+RUN_BULK_MUTATION = '''
+mutation bulkOperationRunQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+'''
+
+CURRENT_BULK_OPERATION_QUERY = '''
+{
+  currentBulkOperation { id status errorCode objectCount url }
+}
+'''
+
+SHOP_TIMEZONE_QUERY = '''
+{
+  shop { ianaTimezone }
+}
+'''
+
+
+class ShopifyBulkOperationClient:
+    """Submits, polls and downloads Shopify bulk operations over the GraphQL Admin API
+
+    Args:
+        shopify_api_key (str): Shopify API key
+        shopify_api_pw (str): Shopify API password
+        shopify_store_url (str): Shopify store url (defaults to connectors.SHOPIFY_STORE_URL)
+        api_version (str): GraphQL Admin API version
+    """
+
+    def __init__(self,
+                 shopify_api_key: str,
+                 shopify_api_pw: str,
+                 shopify_store_url: Optional[str] = None,
+                 api_version: str = SHOPIFY_GRAPHQL_API_VERSION):
+        self.client = get_shopify_client(shopify_api_key, shopify_api_pw,
+                                         shopify_store_url)
+        self.endpoint = f'/admin/api/{api_version}/graphql.json'
+
+    def graphql(self, query: str, variables: Optional[dict] = None):
+        """Run a GraphQL query and return its `data`, raising on GraphQL errors"""
+        response = self.client.post(self.endpoint,
+                                    json={
+                                        'query': query,
+                                        'variables': variables or {}
+                                    })
+        response.raise_for_status()
+        body = response.json()
+        if body.get('errors'):
+            raise ValueError(f"Shopify GraphQL error: {body['errors']}")
+        return body['data']
+
+    def shop_timezone(self):
+        """Return the store's IANA timezone (REST timestamps are in shop local time)"""
+        return self.graphql(SHOP_TIMEZONE_QUERY)['shop']['ianaTimezone']
+
+    def submit(self, query: str):
+        """Submit a bulk query and return the bulk operation id"""
+        data = self.graphql(RUN_BULK_MUTATION, {'query': query})
+        result = data['bulkOperationRunQuery']
+        if result['userErrors']:
+            raise ValueError(
+                f"Error submitting bulk operation: {result['userErrors']}")
+        logger.info(f"Submitted bulk operation {result['bulkOperation']['id']}")
+        return result['bulkOperation']['id']
+
+    def poll(self,
+             operation_id: str,
+             poll_interval: float = BULK_POLL_INTERVAL,
+             timeout: float = BULK_TIMEOUT):
+        """Wait for a bulk operation to finish and return its final status dict"""
+        deadline = time.monotonic() + timeout
+        while True:
+            operation = self.graphql(
+                CURRENT_BULK_OPERATION_QUERY)['currentBulkOperation']
+
+            if operation['id'] != operation_id:
+                raise ValueError(
+                    f"Bulk operation {operation_id} is no longer the current operation")
+
+            logger.info(
+                f"Bulk operation status: {operation['status']} ({operation['objectCount']} objects)"
+            )
+
+            if operation['status'] == 'COMPLETED':
+                return operation
+            if operation['status'] in ('FAILED', 'CANCELED', 'EXPIRED'):
+                raise ValueError(
+                    f"Bulk operation {operation['status']}: {operation['errorCode']}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f'Bulk operation did not finish within {timeout}s')
+
+            time.sleep(poll_interval)
+
+    def iter_lines(self, url: str) -> Iterator[str]:
+        """Stream the lines of a bulk operation result file"""
+        if not url:  # no objects matched the query
+            return
+
+        # Result url is a pre-signed storage url, so it's requested without store credentials
+        with requests.get(url, stream=True, timeout=DEFAULT_TIMEOUT) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield line
+
+
+class LocalBulkOperationClient:
+    """File-backed stand-in for ShopifyBulkOperationClient
+
+    Every submitted query "completes" immediately with the given JSONL file as its
+    result, so bulk extraction can be run offline against a saved result file.
+
+    Args:
+        jsonl_path (str): Path to a bulk operation result file
+        timezone (str): Shop IANA timezone to report
+    """
+
+    def __init__(self, jsonl_path: str, timezone: str = 'America/New_York'):
+        self.jsonl_path = jsonl_path
+        self.timezone = timezone
+        self.queries = []
+
+    def shop_timezone(self):
+        return self.timezone
+
+    def submit(self, query: str):
+        self.queries.append(query)
+        return f'gid://shopify/BulkOperation/{len(self.queries)}'
+
+    def poll(self, operation_id: str, **kwargs):
+        return {
+            'id': operation_id,
+            'status': 'COMPLETED',
+            'errorCode': None,
+            'objectCount': None,
+            'url': self.jsonl_path
+        }
+
+    def iter_lines(self, url: str) -> Iterator[str]:
+        with open(url, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def _money(node: Optional[dict], field: str):
+    """Extract the shop money amount from a *Set field"""
+    return (((node or {}).get(field) or {}).get('shopMoney') or {}).get('amount')
+
+
+def _order_number(name: Optional[str]):
+    """Order number from the order name (ie. '#1234' -> 1234), matching REST order_number"""
+    match = re.search(r'(\d+)\D*$', name or '')
+    return int(match.group(1)) if match else None
+
+
+def _order_record(node: dict, shop_timezone: str) -> dict:
+    """Order record for a bulk order line (total_line_items_price is summed separately)"""
+
+    created_at = pd.Timestamp(node['createdAt']).tz_convert(shop_timezone)
+    shipping_info = node.get('shippingAddress') or {}
+
+    return {
+        'order_id': _order_number(node.get('name')),
+        'email': node.get('email'),
+        'created_at': created_at.isoformat(),
+        'order_date': created_at.strftime('%Y-%m-%d'),
+        'subtotal_price': _money(node, 'subtotalPriceSet'),
+        'total_line_items_price': None,
+        'total_tax': _money(node, 'totalTaxSet'),
+        'total_discounts': _money(node, 'totalDiscountsSet'),
+        'total_shipping_fee': _money(node, 'totalShippingPriceSet'),
+        'total_price': _money(node, 'totalPriceSet'),
+        'shipping_address': shipping_info.get('address1'),
+        'shipping_city': shipping_info.get('city'),
+        'shipping_province': shipping_info.get('province'),
+        'shipping_country': shipping_info.get('country')
+    }
+
+
+def _flush_order(order: dict, line_items: list, all_orders: list, all_line_items: list):
+    """Append an order & its line item records once all of its line items were read"""
+
+    total_line_items_price = 0.0
+
+    for line_item in line_items:
+        price = _money(line_item, 'originalUnitPriceSet')
+        quantity = line_item.get('quantity')
+        total_line_items_price += float(price or 0) * (quantity or 0)
+
+        all_line_items.append({
+            'order_id': order['order_id'],
+            'email': order['email'],
+            'created_at': order['created_at'],
+            'order_date': order['order_date'],
+            'price': price,
+            'quantity': quantity,
+            'sku': line_item.get('sku'),
+            'title': line_item.get('title'),
+            'variant_title': line_item.get('variantTitle'),
+            'line_item_name': line_item.get('name')
+        })
+
+    order['total_line_items_price'] = f'{total_line_items_price:.2f}'
+    all_orders.append(order)
+
+
+def parse_bulk_orders(lines, shop_timezone: str):
+    """Parse bulk operation JSONL lines into orders & line items dataframes
+
+    Lines are consumed one at a time: each order is flushed to its records when the
+    next order (or the end of the file) is reached, relying on Shopify writing an
+    order's line items after the order & before the next one.
+
+    Args:
+        lines (Iterable[str]): JSONL lines of a bulk orders result file
+        shop_timezone (str): Shop IANA timezone (created_at is converted to shop local
+            time so order_date matches the REST extraction)
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): orders_df, line_items_df (same columns as
+            utils.get_shopify_orders_by_date)
+
+    Raises:
+        ValueError: If a line item doesn't follow its order
+    """
+
+    all_orders = []
+    all_line_items = []
+
+    order_gid = None  # order being read & its line items so far
+    order = None
+    line_items = []
+
+    for line in lines:
+        node = json.loads(line)
+
+        if '__parentId' in node:
+            if node['__parentId'] != order_gid:
+                raise ValueError(
+                    f"Line item {node.get('id')} of order {node['__parentId']} doesn't follow its order in the bulk result"
+                )
+            line_items.append(node)
+            continue
+
+        if order is not None:
+            _flush_order(order, line_items, all_orders, all_line_items)
+
+        order_gid = node['id']
+        order = _order_record(node, shop_timezone)
+        line_items = []
+
+    if order is not None:
+        _flush_order(order, line_items, all_orders, all_line_items)
+
+    orders_df = pd.DataFrame(all_orders, columns=ORDER_COLUMNS)
+    line_items_df = pd.DataFrame(all_line_items, columns=LINE_ITEM_COLUMNS)
+
+    return orders_df, line_items_df
+
+
+def get_shopify_orders_bulk(shopify_api_key: str,
+                            shopify_api_pw: str,
+                            start_date: str,
+                            end_date: str,
+                            bulk_client=None):
+    """
+    Fetch all Shopify orders and line items for [start_date, end_date] with a single
+    bulk operation, returning (orders_df, line_items_df).
+
+    Args:
+        shopify_api_key (str): Shopify API key
+        shopify_api_pw (str): Shopify API password
+        start_date (str): First order date ('YYYY-MM-DD', UTC)
+        end_date (str): Last order date ('YYYY-MM-DD', UTC, inclusive)
+        bulk_client: Bulk operation client (defaults to ShopifyBulkOperationClient;
+            pass a LocalBulkOperationClient to read a saved result file)
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame): orders_df, line_items_df
+    """
+
+    if bulk_client is None:
+        bulk_client = ShopifyBulkOperationClient(shopify_api_key, shopify_api_pw)
+
+    created_at_min = pd.to_datetime(start_date).strftime('%Y-%m-%dT00:00:00Z')
+    created_at_max = pd.to_datetime(end_date).strftime('%Y-%m-%dT23:59:59Z')
+
+    logger.info(
+        f'Running Shopify bulk order export from {created_at_min} to {created_at_max}'
+    )
+
+    query = ORDERS_BULK_QUERY % {
+        'created_at_min': created_at_min,
+        'created_at_max': created_at_max
+    }
+
+    operation_id = bulk_client.submit(query)
+    operation = bulk_client.poll(operation_id)
+
+    orders_df, line_items_df = parse_bulk_orders(
+        bulk_client.iter_lines(operation['url']), bulk_client.shop_timezone())
+
+    logger.info(f"Total orders retrieved: {len(orders_df)}")
+    logger.info(f"Total line items retrieved: {len(line_items_df)}")
+
+    return orders_df, line_items_df
@@ -0,0 +1,20 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS shopify_line_items_parquet (
+    order_id BIGINT,
+    email STRING,
+    created_at TIMESTAMP,
+    order_date TIMESTAMP,
+    price DOUBLE,
+    quantity BIGINT,
+    sku STRING,
+    title STRING,
+    variant_title STRING,
+    line_item_name STRING
+)
+PARTITIONED BY (
+    year STRING,
+    month STRING,
+    day STRING
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/shopify/line_items/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
@@ -0,0 +1,24 @@
+CREATE EXTERNAL TABLE IF NOT EXISTS shopify_orders_parquet (
+    order_id BIGINT,
+    email STRING,
+    created_at TIMESTAMP,
+    shipping_address STRING,
+    shipping_city STRING,
+    shipping_province STRING,
+    shipping_country STRING,
+    subtotal_price DOUBLE,
+    total_line_items_price DOUBLE,
+    total_tax DOUBLE,
+    total_discounts DOUBLE,
+    total_shipping_fee DOUBLE,
+    total_price DOUBLE,
+    order_date TIMESTAMP
+)
+PARTITIONED BY (
+    year STRING,
+    month STRING,
+    day STRING
+)
+STORED AS PARQUET
+LOCATION 's3://S3_BUCKET_NAME/parquet/shopify/orders/'
+TBLPROPERTIES ('parquet.compression'='SNAPPY');
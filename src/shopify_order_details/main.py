@@ -11,6 +11,20 @@ sys.path.append('src/')  # updating path back to root for importing modules
 
 from utils import *
 from models import *
+from shopify_bulk import get_shopify_orders_bulk
+from partition_writer import PartitionWriter
+
+
+def shopify_orders_key(order_date: str):
+    """S3 key of the shopify orders file for a day (YYYY-MM-DD)"""
+    year, month, day = order_date.split('-')
+    return f"shopify/orders/year={year}/month={month}/day={day}/shopify_orders_{order_date.replace('-','_')}.csv"
+
+
+def shopify_line_items_key(order_date: str):
+    """S3 key of the shopify line items file for a day (YYYY-MM-DD)"""
+    year, month, day = order_date.split('-')
+    return f"shopify/line_items/year={year}/month={month}/day={day}/shopify_line_items_{order_date.replace('-','_')}.csv"
 
 
 def main():
@@ -40,7 +54,23 @@ def main():
         help=
         'End date to use to extract records.  Records will be extracted from the shopify /orders API                                 from 00:00:00 (UTC) on the start_date through 23:59:59 (UTC) on the end_date'
     )
+    parser.add_argument(
+        '--extraction_mode',
+        type=str,
+        required=False,
+        default='rest',
+        choices=['rest', 'bulk'],
+        help=
+        'rest: page the /orders API once per day.  bulk: submit a single Shopify bulk operation for the whole date range and stream the results (use for large backfills)'
+    )
     # Parse input args
+    parser.add_argument(
+        '--output_format',
+        type=str,
+        required=False,
+        default=DEFAULT_OUTPUT_FORMAT,
+        choices=list(OUTPUT_FORMATS),
+        help='File format written to s3 (defaults to $S3_OUTPUT_FORMAT, else csv).  csv is written to the table in ddl.sql, parquet to its <table>_parquet twin in ddl_parquet.sql')
     args = parser.parse_args()
     logger.info(f'Args: {args}')
 
@@ -93,175 +123,95 @@ def main():
         raise ValueError("SHOPIFY_API_PASSWORD environment variable is not set")
 
 
-    # Iterate through all dates in the date range
-    while pd.to_datetime(start_date) <= pd.to_datetime(end_date):
-    
-        # ------ GET Shopify Data
-    
-        # List all orders in shipbob for a date range
-        shopify_orders_df, shopify_line_item_df = get_shopify_orders_by_date(shopify_api_key=SHOPIFY_API_KEY, shopify_api_pw=SHOPIFY_API_PW,start_date=start_date, end_date=start_date)
-        
-        if len(shopify_orders_df) == 0:
-            logger.info(f'0 Records returned from Shopify API')
-    
-        else:
-
-            logger.info(
-                f"Total order count (shopify_orders_df): {shopify_orders_df['order_id'].nunique()}")
-
-            logger.info(
-                f"Total order count (shopify_line_item_df): {shopify_line_item_df['order_id'].nunique()}")
-
-    
-            #  --------- SHOPIFY ORDERS -----------
-
-            
-            logger.info(f'Processing shopify_orders date: {start_date}')
-
-            # rename dataframe for validation 
-            df = shopify_orders_df.copy()
-    
-            # Validate data w/ Pydantic
-            valid_data, invalid_data = validate_dataframe(
-                df, ShopifyOrder)
-
-            logger.info(f'Total records in df: {len(df)}')
-            logger.info(f'Total Distinct Order ID: {len(df["order_id"].unique())}')
-            logger.info(f'Total records in valid_data: {len(valid_data)}')
-            logger.info(f'Total records in invalid_data: {len(invalid_data)}')
-
-            if len(invalid_data) > 0:
-                for invalid in invalid_data:
-                    logger.error(f'Invalid data: {invalid}')
-
-                    raise ValueError(f'Invalid data!')
-
-            if len(valid_data) > 0:
+    # instantiate s3 client
+    s3_client = get_aws_client('s3', REGION)
 
-                # define path to write to
-                year = pd.to_datetime(start_date).strftime('%Y')
-                month = pd.to_datetime(start_date).strftime('%m')
-                day = pd.to_datetime(start_date).strftime('%d')
+    # Each day is validated as it is submitted & uploaded on a thread pool
+    orders_writer = PartitionWriter(s3_bucket=s3_bucket,
+                                    s3_client=s3_client,
+                                    model=ShopifyOrder,
+                                    s3_key=shopify_orders_key,
+                                    output_format=args.output_format)
+    line_items_writer = PartitionWriter(s3_bucket=s3_bucket,
+                                        s3_client=s3_client,
+                                        model=ShopifyLineItem,
+                                        s3_key=shopify_line_items_key,
+                                        output_format=args.output_format)
 
-                s3_prefix = f"shopify/orders/year={year}/month={month}/day={day}/shopify_orders_{start_date.replace('-','_')}.csv"
+    with orders_writer, line_items_writer:
 
-                try:
+        if args.extraction_mode == 'bulk':
 
-                    # instantiate s3 client
-                    s3_client = boto3.client(
-                        's3',
-                        aws_access_key_id=AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                        region_name=REGION)
-                    
-                    # Write to s3
-                    write_df_to_s3(bucket=s3_bucket,
-                                   key=s3_prefix,
-                                   df=pd.DataFrame(valid_data),
-                                   s3_client=s3_client)
+            # Single bulk operation for the whole date range
+            bulk_orders_df, bulk_line_item_df = get_shopify_orders_bulk(
+                shopify_api_key=SHOPIFY_API_KEY,
+                shopify_api_pw=SHOPIFY_API_PW,
+                start_date=start_date,
+                end_date=end_date)
 
+            logger.info(
+                f"Total order count (shopify_orders_df): {bulk_orders_df['order_id'].nunique()}")
+
+            # Split into days in one pass - UTC date of each record (matches the
+            # created_at window of a daily REST pull)
+            orders_writer.submit_groups(
+                bulk_orders_df,
+                pd.to_datetime(bulk_orders_df['created_at'],
+                               utc=True).dt.strftime('%Y-%m-%d'))
+            line_items_writer.submit_groups(
+                bulk_line_item_df,
+                pd.to_datetime(bulk_line_item_df['created_at'],
+                               utc=True).dt.strftime('%Y-%m-%d'))
 
+        else:
 
-                except Exception as e:
-                    logger.error(f'Error writing to s3: {str(e)}')
-                    raise ValueError(f'Error writing data! {str(e)}')
-
-
-
-            #  --------- SHOPIFY LINE ITEMS -----------
-
-
-            logger.info(f'Processing shopify_line_items date: {start_date}')
-
-            # subset dataframe
-            df = shopify_line_item_df.copy()
-            # df = shopify_line_item_df.loc[shopify_line_item_df['order_date'] == start_date].copy()
-
-            
-            df.to_csv('line_item_df.csv', index=False)
-
-            # Validate data w/ Pydantic
-            valid_data, invalid_data = validate_dataframe(
-                df, ShopifyLineItem)
-
-            logger.info(f'Total records in df: {len(df)}')
-            logger.info(f'Total records in valid_data: {len(valid_data)}')
-            logger.info(f'Total records in invalid_data: {len(invalid_data)}')
-
-            if len(invalid_data) > 0:
-                for invalid in invalid_data:
-                    logger.error(f'Invalid data: {invalid}')
-
-                    raise ValueError(f'Invalid data!')
-
-            if len(valid_data) > 0:
-
-                logger.info(pd.DataFrame(valid_data).head())
-
-                # define path to write to
-                year = pd.to_datetime(start_date).strftime('%Y')
-                month = pd.to_datetime(start_date).strftime('%m')
-                day = pd.to_datetime(start_date).strftime('%d')
-                
-                s3_prefix = f"shopify/line_items/year={year}/month={month}/day={day}/shopify_line_items_{start_date.replace('-','_')}.csv"
-
-                try:
-                    # Write to s3
-                    write_df_to_s3(bucket=s3_bucket,
-                                   key=s3_prefix,
-                                   df=pd.DataFrame(valid_data),
-                                   s3_client=s3_client)
-
+            # Iterate through all dates in the date range
+            while pd.to_datetime(start_date) <= pd.to_datetime(end_date):
 
+                # List all orders in shopify for the date
+                shopify_orders_df, shopify_line_item_df = get_shopify_orders_by_date(shopify_api_key=SHOPIFY_API_KEY, shopify_api_pw=SHOPIFY_API_PW,start_date=start_date, end_date=start_date)
 
-                except Exception as e:
-                    logger.error(f'Error writing to s3: {str(e)}')
-                    raise ValueError(f'Error writing data! {str(e)}')
+                if len(shopify_orders_df) == 0:
+                    logger.info(f'0 Records returned from Shopify API')
 
-            
+                else:
 
+                    logger.info(
+                        f"Total order count (shopify_orders_df): {shopify_orders_df['order_id'].nunique()}")
 
+                    logger.info(
+                        f"Total order count (shopify_line_item_df): {shopify_line_item_df['order_id'].nunique()}")
 
+                    orders_writer.submit(start_date, shopify_orders_df)
+                    line_items_writer.submit(start_date, shopify_line_item_df)
 
-        # ---------- INCREMENT DATE ------------
+                # ---------- INCREMENT DATE ------------
 
-        # Increment start_date by 1 day
-        start_date = pd.to_datetime(
-            pd.to_datetime(start_date) +
-            pd.DateOffset(days=1)).strftime('%Y-%m-%d')
+                # Increment start_date by 1 day
+                start_date = pd.to_datetime(
+                    pd.to_datetime(start_date) +
+                    pd.DateOffset(days=1)).strftime('%Y-%m-%d')
 
 
     # -----------------
     # Run Athena query to update partitions
     # -----------------
-    
-    #  --------- ORDERS -----------
-    
-    logger.info('Running MKSCK REPAIR TABLE to update partitions')
 
-    # Define SQL query
-    sql_query = """MSCK REPAIR TABLE shopify_orders"""
+    #  --------- ORDERS -----------
 
-    logger.info(f'SQL query: {sql_query}')
+    repair_table_if_changed(table_name=table_name_for_format('shopify_orders', args.output_format),
+                            writes=list(orders_writer.written.values()),
+                            bucket=s3_bucket,
+                            database=glue_database,
+                            region=REGION)
 
-    run_athena_query_no_results(query=sql_query,
-                                bucket=s3_bucket,
-                                database=glue_database,
-                                region=REGION)
     #  --------- LINE ITEMS -----------
 
-    logger.info('Running MKSCK REPAIR TABLE to update partitions')
-
-    # Define SQL query
-    sql_query = """MSCK REPAIR TABLE shopify_line_items"""
-
-    logger.info(f'SQL query: {sql_query}')
-
-    run_athena_query_no_results(query=sql_query,
-                                bucket=s3_bucket,
-                                database=glue_database,
-                                region=REGION)
-
+    repair_table_if_changed(table_name=table_name_for_format('shopify_line_items', args.output_format),
+                            writes=list(line_items_writer.written.values()),
+                            bucket=s3_bucket,
+                            database=glue_database,
+                            region=REGION)
         
 if __name__ == "__main__":
 
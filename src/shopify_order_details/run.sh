@@ -21,13 +21,15 @@ if [[ $# -eq 0 ]]; then
     # Run daily job (yesterday's data)
     python3 src/shopify_order_details/main.py
 
-elif [[ $# -eq 2 ]]; then
+elif [[ $# -eq 2 || $# -eq 3 ]]; then
     start_date=$1
     end_date=$2
-    echo "-------- Running manual backfill: $start_date to $end_date"
-    python3 src/shopify_order_details/main.py --start_date $start_date --end_date $end_date
+    # Optional 3rd arg: extraction mode (rest | bulk) - use bulk for long date ranges
+    extraction_mode=${3:-rest}
+    echo "-------- Running manual backfill: $start_date to $end_date (extraction_mode=$extraction_mode)"
+    python3 src/shopify_order_details/main.py --start_date $start_date --end_date $end_date --extraction_mode $extraction_mode
 
 else
-    echo "Usage: run.sh [start_date end_date]"
+    echo "Usage: run.sh [start_date end_date [rest|bulk]]"
     exit 1
 fi
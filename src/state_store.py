@@ -0,0 +1,83 @@
+"""
+Small JSON state files (caches, watermarks) kept either on local disk or in S3.
+
+Paths starting with 's3://' are read from / written to S3, anything else is treated
+as a local file path.  Jobs run on ephemeral runners, so state that has to survive
+between runs should live in S3.
+"""
+
+import json
+import os
+from typing import Any
+
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from aws_clients import get_aws_client
+
+
+def _split_s3_path(path: str):
+    """Split 's3://bucket/key' into (bucket, key)"""
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def _s3_client():
+    return get_aws_client('s3')
+
+
+def load_json_state(path: str, default: Any = None):
+    """Load a JSON state file, returning `default` if it does not exist yet
+
+    Args:
+        path (str): Local file path or 's3://bucket/key'
+        default: Value returned when there is no state at the path
+
+    Returns:
+        The parsed JSON state (or `default`)
+    """
+
+    if path.startswith('s3://'):
+        bucket, key = _split_s3_path(path)
+        try:
+            response = _s3_client().get_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                logger.info(f'No state found at {path}')
+                return default
+            raise
+        return json.loads(response['Body'].read())
+
+    if not os.path.exists(path):
+        logger.info(f'No state found at {path}')
+        return default
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json_state(path: str, state: Any):
+    """Write a JSON state file (local writes are atomic via a temp file + rename)
+
+    Args:
+        path (str): Local file path or 's3://bucket/key'
+        state: JSON serializable state
+    """
+
+    body = json.dumps(state)
+
+    if path.startswith('s3://'):
+        bucket, key = _split_s3_path(path)
+        _s3_client().put_object(Bucket=bucket,
+                                Key=key,
+                                Body=body,
+                                ContentType='application/json')
+    else:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+    logger.info(f'Saved state to {path} ({len(body)} bytes)')
@@ -0,0 +1,117 @@
+"""
+Shared pytest setup: the jobs import their helpers from src/ (`sys.path.append('src/')`),
+and utils reads the AWS credentials at import time, so both are set up before any test
+module imports them.  No test talks to AWS or the vendor APIs - they use stand-in clients.
+"""
+
+import hashlib
+import os
+import sys
+from io import BytesIO
+
+from botocore.exceptions import ClientError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+os.environ.setdefault('AWS_ACCESS_KEY', 'test')
+os.environ.setdefault('AWS_ACCESS_SECRET', 'test')
+
+
+def client_error(code: str, operation: str = 'Operation'):
+    """botocore ClientError with the given error code"""
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+class EntityNotFoundException(Exception):
+    pass
+
+
+class FakeS3:
+    """S3 stand-in holding {key: body} (bytes or str) in one bucket"""
+
+    def __init__(self):
+        self.objects = {}
+        self.listings = 0
+
+    def put(self, key, body):
+        self.objects[key] = body
+
+    def get_paginator(self, operation):
+        assert operation == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        self.listings += 1
+        yield {
+            'Contents': [{
+                'Key': key,
+                'Size': len(body),
+                'ETag': hashlib.md5(body if isinstance(body, bytes) else body.encode('utf-8')).hexdigest()
+            } for key, body in sorted(self.objects.items()) if key.startswith(Prefix)]
+        }
+
+    def get_object(self, Bucket, Key):
+        return {'Body': BytesIO(self.objects[Key])}
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        self.objects[Key] = Body
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.objects.pop(obj['Key'], None)
+        return {}
+
+
+class FakeGlue:
+    """Glue stand-in: {name: Table} & each table's {partition values: location}"""
+
+    class exceptions:
+        EntityNotFoundException = EntityNotFoundException
+
+    def __init__(self):
+        self.tables = {}
+        self.partitions = {}
+
+    def add_table(self, name, columns=(), partition_keys=(), location=None):
+        self.tables[name] = {
+            'Name': name,
+            'TableType': 'EXTERNAL_TABLE',
+            'PartitionKeys': [{'Name': n, 'Type': t} for n, t in partition_keys],
+            'StorageDescriptor': {
+                'Columns': [{'Name': n, 'Type': t} for n, t in columns],
+                'Location': location
+            }
+        }
+        self.partitions[name] = {}
+
+    def get_table(self, DatabaseName, Name):
+        if Name not in self.tables:
+            raise EntityNotFoundException(Name)
+        return {'Table': self.tables[Name]}
+
+    def get_paginator(self, operation):
+        raise AssertionError(f'Glue {operation} should not be paged')
+
+    def get_partition(self, DatabaseName, TableName, PartitionValues):
+        if tuple(PartitionValues) not in self.partitions[TableName]:
+            raise EntityNotFoundException(PartitionValues)
+        return {'Partition': {'StorageDescriptor': {
+            'Location': self.partitions[TableName][tuple(PartitionValues)]}}}
+
+    def create_partition(self, DatabaseName, TableName, PartitionInput):
+        self.partitions[TableName][tuple(PartitionInput['Values'])] = \
+            PartitionInput['StorageDescriptor']['Location']
+
+    def update_partition(self, DatabaseName, TableName, PartitionValueList, PartitionInput):
+        self.partitions[TableName][tuple(PartitionValueList)] = \
+            PartitionInput['StorageDescriptor']['Location']
+
+    def batch_delete_partition(self, DatabaseName, TableName, PartitionsToDelete):
+        errors = []
+        for partition in PartitionsToDelete:
+            values = tuple(partition['Values'])
+            if self.partitions[TableName].pop(values, None) is None:
+                errors.append({'PartitionValues': list(values),
+                               'ErrorDetail': {'ErrorCode': 'EntityNotFoundException'}})
+        return {'Errors': errors}
@@ -0,0 +1,101 @@
+import pandas as pd
+import pytest
+
+import athena_cache
+from athena_cache import ATHENA_CACHE_TTL, QueryResultCache
+from conftest import FakeGlue, FakeS3
+
+QUERY = """
+SELECT inventory_id, SUM(inventory_qty) AS qty_sold
+FROM shipbob_order_details
+GROUP BY inventory_id
+"""
+
+
+def partition_key(order_date):
+    return f'shipbob/order_details/order_date={order_date}/data.csv'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = FakeS3()
+    glue = FakeGlue()
+    glue.add_table('shipbob_order_details',
+                   partition_keys=[('order_date', 'date')],
+                   location='s3://bucket/shipbob/order_details')
+    monkeypatch.setattr(athena_cache, 'get_aws_client',
+                        lambda service, region='us-east-1': s3 if service == 's3' else glue)
+    for order_date in ('2024-01-01', '2024-01-02', '2024-01-03'):
+        s3.put(partition_key(order_date), f'orders of {order_date}')
+    return s3
+
+
+@pytest.fixture
+def cache(tmp_path, s3):
+    return QueryResultCache(str(tmp_path))
+
+
+def store(cache, df=None):
+    lookup = cache.lookup(QUERY, 'prymal')
+    assert lookup.df is None
+    cache.store(lookup, QUERY, 'prymal',
+                df if df is not None else pd.DataFrame({'inventory_id': [1], 'qty_sold': [2]}))
+
+
+def test_default_ttl_is_finite():
+    assert ATHENA_CACHE_TTL is not None and ATHENA_CACHE_TTL > 0
+
+
+def test_hit_while_tables_unchanged(cache):
+    df = pd.DataFrame({'inventory_id': pd.array([1, None], dtype='Int64'),
+                       'qty_sold': [2.0, 3.0]})
+    store(cache, df)
+
+    lookup = cache.lookup(QUERY, 'prymal')
+    pd.testing.assert_frame_equal(lookup.df, df)
+
+
+def test_rewriting_an_older_partition_invalidates(cache, s3):
+    store(cache)
+
+    # A backfill / incremental merge rewrites a partition that isn't the latest one
+    s3.put(partition_key('2024-01-01'), 'orders of 2024-01-01, merged')
+
+    lookup = cache.lookup(QUERY, 'prymal')
+    assert lookup.df is None
+    assert lookup.invalidated
+
+
+def test_new_partition_invalidates(cache, s3):
+    store(cache)
+
+    s3.put(partition_key('2024-01-04'), 'orders of 2024-01-04')
+
+    assert cache.lookup(QUERY, 'prymal').invalidated
+
+
+def test_one_listing_per_table(cache, s3):
+    store(cache)
+    s3.listings = 0
+
+    cache.lookup(QUERY, 'prymal')
+    assert s3.listings == 1
+
+
+def test_expired_entries_are_not_served(tmp_path, s3):
+    cache = QueryResultCache(str(tmp_path), ttl=60)
+    store(cache)
+    entry = cache._load_entry(cache.query_key(QUERY, 'prymal'))
+    entry['stored_at'] -= 61
+    cache._save_entry(cache.query_key(QUERY, 'prymal'), entry)
+
+    lookup = cache.lookup(QUERY, 'prymal')
+    assert lookup.df is None
+    assert lookup.invalidated
+
+
+def test_get_query_cache_uses_the_given_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('ATHENA_CACHE_DIR', raising=False)
+
+    assert athena_cache.get_query_cache() is None
+    assert athena_cache.get_query_cache(cache_dir=str(tmp_path)).cache_dir == str(tmp_path)
@@ -0,0 +1,138 @@
+import io
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from athena_queries import _read_results_csv, decode_column, decode_results
+from models import RawMaterialRunRate
+from utils import validate_dataframe
+
+COLUMN_INFO = [
+    {'Name': 'id', 'Type': 'bigint'},
+    {'Name': 'qty', 'Type': 'integer'},
+    {'Name': 'active', 'Type': 'boolean'},
+    {'Name': 'updated_at', 'Type': 'timestamp'},
+    {'Name': 'order_date', 'Type': 'date'},
+    {'Name': 'name', 'Type': 'varchar'},
+]
+
+# Athena's results csv: every value quoted, NULL an empty unquoted field
+RESULTS_CSV = '''"id","qty","active","updated_at","order_date","name"
+"9007199254740993","1","true","2024-01-02 03:04:05.123","2024-01-02","a"
+"2",,"false","2024-01-03 00:00:00.000","2024-01-03",""
+"3","5",,,,
+'''
+
+
+def read_results(chunksize=None):
+    results = _read_results_csv(io.StringIO(RESULTS_CSV),
+                                column_info=COLUMN_INFO,
+                                chunksize=chunksize)
+    if chunksize is None:
+        return decode_results(results, COLUMN_INFO)
+    return [decode_results(chunk, COLUMN_INFO) for chunk in results]
+
+
+def test_null_ints_stay_nullable_integers():
+    df = read_results()
+
+    assert str(df['qty'].dtype) == 'Int64'
+    assert df['qty'].isna().tolist() == [False, True, False]
+    assert df['qty'].iloc[2] == 5
+    # bigints don't lose precision through float64
+    assert df['id'].iloc[0] == 9007199254740993
+
+
+def test_ints_from_strings():
+    values = pd.Series(['1', np.nan, '9007199254740993'], dtype=object)
+    decoded = decode_column(values, 'bigint')
+
+    assert str(decoded.dtype) == 'Int64'
+    assert decoded.isna().tolist() == [False, True, False]
+    assert decoded.iloc[2] == 9007199254740993
+
+
+def test_booleans():
+    df = read_results()
+
+    assert str(df['active'].dtype) == 'boolean'
+    assert df['active'].iloc[0] == True
+    assert df['active'].iloc[1] == False
+    assert pd.isna(df['active'].iloc[2])
+
+
+def test_space_separated_timestamps():
+    df = read_results()
+
+    assert pd.api.types.is_datetime64_any_dtype(df['updated_at'])
+    assert df['updated_at'].iloc[0] == pd.Timestamp('2024-01-02 03:04:05.123')
+    assert pd.isna(df['updated_at'].iloc[2])
+    assert df['order_date'].iloc[1] == pd.Timestamp('2024-01-03')
+
+
+def test_sentinel_dates_become_nat():
+    values = pd.Series(['0001-01-01', '2024-01-02', '9999-12-31', np.nan], name='done_date')
+
+    decoded = decode_column(values, 'date')
+
+    assert pd.api.types.is_datetime64_any_dtype(decoded)
+    assert decoded.iloc[1] == pd.Timestamp('2024-01-02')
+    assert decoded.isna().tolist() == [True, False, True, True]
+
+
+def test_chunks_share_dtypes():
+    # The first chunk has no NULL qty / active, the others do
+    chunks = read_results(chunksize=1)
+
+    assert len(chunks) == 3
+    for column in ('id', 'qty', 'active'):
+        assert len({str(chunk[column].dtype) for chunk in chunks}) == 1, column
+
+
+# Columns (& Athena types) of raw_material_run_rate/query.sql
+RUN_RATE_COLUMN_INFO = [
+    {'Name': 'katana_ingredient_sku', 'Type': 'varchar'},
+    {'Name': 'katana_ingredient_name', 'Type': 'varchar'},
+    {'Name': 'katana_unit_of_measure', 'Type': 'varchar'},
+    {'Name': 'daily_run_rate', 'Type': 'double'},
+    {'Name': 'inventory_on_hand', 'Type': 'double'},
+    {'Name': 'inventory_as_of', 'Type': 'date'},
+    {'Name': 'days_on_hand', 'Type': 'double'},
+    {'Name': 'reorder_point', 'Type': 'double'},
+]
+
+RUN_RATE_CSV = '''"katana_ingredient_sku","katana_ingredient_name","katana_unit_of_measure","daily_run_rate","inventory_on_hand","inventory_as_of","days_on_hand","reorder_point"
+"10042","Cocoa","lb","2.5","100.0","2024-01-02","40.0","75.0"
+"10043","Sugar","lb","1.0","0.0","2024-01-02","0.0",
+'''
+
+
+def test_decoded_results_validate_against_a_model():
+    df = decode_results(
+        _read_results_csv(io.StringIO(RUN_RATE_CSV), column_info=RUN_RATE_COLUMN_INFO),
+        RUN_RATE_COLUMN_INFO)
+
+    valid_data, invalid_data = validate_dataframe(df, RawMaterialRunRate)
+
+    assert invalid_data == []
+    # The numeric-looking sku stays the string the varchar column holds
+    assert valid_data[0]['katana_ingredient_sku'] == '10042'
+    assert valid_data[0]['inventory_as_of'] == pd.Timestamp('2024-01-02').date()
+    assert np.isnan(valid_data[1]['reorder_point'])
+
+
+def test_nullable_columns_validate_as_none():
+    df = read_results()[['id', 'qty', 'active']]
+
+    class Row(BaseModel):
+        id: int
+        qty: Optional[int] = None
+        active: Optional[bool] = None
+
+    valid_data, invalid_data = validate_dataframe(df, Row)
+
+    assert invalid_data == []
+    assert valid_data[1] == {'id': 2, 'qty': None, 'active': False}
+    assert valid_data[2] == {'id': 3, 'qty': 5, 'active': None}
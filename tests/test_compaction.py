@@ -0,0 +1,167 @@
+import inspect
+import os
+import sys
+from io import BytesIO
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'compaction'))
+
+import compactor
+from compactor import TableCompactionConfig, TableCompactor
+from conftest import FakeGlue, FakeS3
+
+
+# sku is a STRING of digits - the rollup must keep it as the daily table declares it
+DDL = """
+CREATE EXTERNAL TABLE IF NOT EXISTS shipbob_order_details (
+  order_id BIGINT,
+  sku STRING,
+  qty INT
+)
+PARTITIONED BY (order_date DATE)
+ROW FORMAT DELIMITED
+FIELDS TERMINATED BY ','
+LOCATION 's3://S3_BUCKET_NAME/shipbob/order_details/'
+"""
+
+
+def source_key(order_date):
+    return f'shipbob/order_details/order_date={order_date}/shipbob_order_details_{order_date}.csv'
+
+
+@pytest.fixture
+def clients(monkeypatch, tmp_path):
+    s3, glue, queries = FakeS3(), FakeGlue(), []
+    glue.add_table('shipbob_order_details',
+                   columns=[('order_id', 'bigint'), ('sku', 'string'), ('qty', 'int')],
+                   partition_keys=[('order_date', 'date')])
+    glue.add_table('shipbob_order_details_monthly')
+    ddl = tmp_path / 'ddl.sql'
+    ddl.write_text(DDL)
+    monkeypatch.setenv('S3_BUCKET_NAME', 'bucket')
+    monkeypatch.setenv('GLUE_DATABASE_NAME', 'prymal')
+    monkeypatch.setattr(compactor, 'get_aws_client',
+                        lambda service, region='us-east-1': s3 if service == 's3' else glue)
+    monkeypatch.setattr(compactor, 'run_athena_query_no_results',
+                        lambda bucket, query, database, region: queries.append(query))
+
+    def delete_s3_data(bucket, prefix, s3_client):
+        for key in [key for key in s3.objects if key.startswith(prefix)]:
+            del s3.objects[key]
+    monkeypatch.setattr(compactor, 'delete_s3_data', delete_s3_data)
+
+    def put_day(order_date, rows):
+        s3.objects[source_key(order_date)] = ('order_id,sku,qty\n' + ''.join(
+            f'{order_id},{sku},{qty}\n' for order_id, sku, qty in rows)).encode('utf-8')
+        glue.partitions['shipbob_order_details'][(order_date,)] = None
+
+    return SimpleNamespace(s3=s3, glue=glue, queries=queries, put_day=put_day, ddl=str(ddl))
+
+
+def make_compactor(clients, run_id, **kwargs):
+    table = TableCompactionConfig(name='shipbob_order_details',
+                                  location='shipbob/order_details',
+                                  partition_columns=['order_date'],
+                                  ddl=clients.ddl,
+                                  rollup_table='shipbob_order_details_monthly',
+                                  rollup_partition_columns=['order_month'])
+    return TableCompactor(table, run_id=run_id, **kwargs)
+
+
+def rollup_rows(clients):
+    location = clients.glue.partitions['shipbob_order_details_monthly'][('2024-01',)]
+    prefix = location[len('s3://bucket/'):]
+    tables = [pq.read_table(BytesIO(body)) for key, body in sorted(clients.s3.objects.items())
+              if key.startswith(prefix)]
+    return [(str(row['order_date']), row['order_id'], row['qty'])
+            for table in tables for row in table.to_pylist()]
+
+
+def test_compaction_retires_the_month_and_keeps_other_months(clients):
+    clients.put_day('2024-01-02', [(3, 'B', 1)])
+    clients.put_day('2024-01-01', [(1, 'A', 2), (2, 'A', '')])
+    clients.put_day('2024-02-01', [(4, 'C', 1)])
+
+    summary = make_compactor(clients, 'run1', retire_source=True).compact_month('2024-01')
+
+    assert summary['rows'] == 3
+    assert summary['retired_partitions'] == 2
+    # Partition order, nulls kept
+    assert rollup_rows(clients) == [('2024-01-01', 1, 2), ('2024-01-01', 2, None),
+                                    ('2024-01-02', 3, 1)]
+    assert set(clients.glue.partitions['shipbob_order_details']) == {('2024-02-01',)}
+    assert [key for key in clients.s3.objects if key.startswith('shipbob/')] == [
+        source_key('2024-02-01')]
+
+
+def test_rollup_has_the_ddl_types(clients):
+    clients.put_day('2024-01-01', [(1, '00123', 2)])
+
+    table_compactor = make_compactor(clients, 'run1')
+    table_compactor.compact_month('2024-01')
+
+    location = clients.glue.partitions['shipbob_order_details_monthly'][('2024-01',)]
+    body = next(body for key, body in clients.s3.objects.items()
+                if key.startswith(location[len('s3://bucket/'):]))
+    table = pq.read_table(BytesIO(body))
+    assert table.schema == pa.schema([('order_id', pa.int64()), ('sku', pa.string()),
+                                      ('qty', pa.int32()), ('order_date', pa.date32())])
+    assert table.column('sku').to_pylist() == ['00123']
+
+
+def test_daily_partitions_are_kept_by_default(clients):
+    clients.put_day('2024-01-01', [(1, 'A', 2)])
+
+    make_compactor(clients, 'run1').compact_month('2024-01')
+
+    assert set(clients.glue.partitions['shipbob_order_details']) == {('2024-01-01',)}
+    assert source_key('2024-01-01') in clients.s3.objects
+
+
+def test_rewritten_day_replaces_its_rows_in_the_rollup(clients):
+    clients.put_day('2024-01-01', [(1, 'A', 2)])
+    clients.put_day('2024-01-02', [(2, 'B', 1)])
+    make_compactor(clients, 'run1', retire_source=True).compact_month('2024-01')
+
+    # A daily job re-runs a day of the compacted month
+    clients.put_day('2024-01-02', [(2, 'B', 5), (3, 'B', 1)])
+    summary = make_compactor(clients, 'run2', retire_source=True).compact_month('2024-01')
+
+    assert summary['rows'] == 3
+    assert rollup_rows(clients) == [('2024-01-01', 1, 2), ('2024-01-02', 2, 5),
+                                    ('2024-01-02', 3, 1)]
+    # The previous run is gone, so is the re-run day
+    assert not [key for key in clients.s3.objects if '/_runs/run1/' in key]
+    assert clients.glue.partitions['shipbob_order_details'] == {}
+
+
+def test_month_is_read_one_object_at_a_time(clients, monkeypatch):
+    monkeypatch.setattr(compactor, 'COMPACTION_ROW_GROUP_ROWS', 2)
+    for day in range(1, 6):
+        clients.put_day(f'2024-01-{day:02d}', [(day, 'A', 1)])
+    table_compactor = make_compactor(clients, 'run1')
+
+    tables = table_compactor.read_month(table_compactor.list_source_objects('2024-01'))
+    assert inspect.isgenerator(tables)
+
+    keys, rows = table_compactor.write_files(tables, 'compacted/test/')
+    metadata = pq.ParquetFile(BytesIO(clients.s3.objects[keys[0]])).metadata
+    assert rows == 5
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [2, 2, 1]
+
+
+def test_view_casts_the_rollup_to_the_daily_columns(clients):
+    table_compactor = make_compactor(clients, 'run1')
+    table_compactor.create_view()
+
+    query = clients.queries[-1]
+    assert 'CREATE OR REPLACE VIEW shipbob_order_details_all AS' in query
+    assert 'SELECT "order_id", "sku", "qty", "order_date"\n        FROM shipbob_order_details\n' in query
+    assert ("substr(CAST(\"order_date\" AS varchar), 1, 7) NOT IN (SELECT DISTINCT "
+            "substr(CAST(\"order_date\" AS varchar), 1, 7) FROM shipbob_order_details_monthly") in query
+    assert ('CAST("sku" AS varchar) AS "sku", CAST("qty" AS integer) AS "qty", '
+            'CAST("order_date" AS date) AS "order_date"') in query
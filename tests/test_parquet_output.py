@@ -0,0 +1,117 @@
+import datetime
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from models import DailyRunRate, ShopifyProductVariantDetails
+from utils import (_write_parquet_chunks, ddl_arrow_schema, ddl_column_types,
+                   s3_key_for_format, table_name_for_format)
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# (csv DDL, Parquet DDL) of every job writing both formats
+DDL_PAIRS = [
+    ('katana_formulas/ddl_formulas.sql', 'katana_formulas/ddl_formulas_parquet.sql'),
+    ('katana_formulas/ddl_inventory.sql', 'katana_formulas/ddl_inventory_parquet.sql'),
+    ('katana_open_manufacturing_orders/ddl.sql', 'katana_open_manufacturing_orders/ddl_parquet.sql'),
+    ('katana_raw_material_status/ddl.sql', 'katana_raw_material_status/ddl_parquet.sql'),
+    ('raw_material_run_rate/ddl.sql', 'raw_material_run_rate/ddl_parquet.sql'),
+    ('shipbob_inventory_details/ddl.sql', 'shipbob_inventory_details/ddl_parquet.sql'),
+    ('shipbob_inventory_run_rate/ddl.sql', 'shipbob_inventory_run_rate/ddl_parquet.sql'),
+    ('shipbob_order_details/ddl.sql', 'shipbob_order_details/ddl_parquet.sql'),
+    ('shopify_active_variant_sku_details/ddl.sql', 'shopify_active_variant_sku_details/ddl_parquet.sql'),
+]
+
+
+def read(path):
+    with open(os.path.join(SRC, path), encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('csv_ddl, parquet_ddl', DDL_PAIRS)
+def test_parquet_ddl_matches_csv_ddl(csv_ddl, parquet_ddl):
+    assert ddl_column_types(read(parquet_ddl)) == ddl_column_types(read(csv_ddl))
+
+
+@pytest.mark.parametrize('csv_ddl, parquet_ddl', DDL_PAIRS)
+def test_parquet_table_has_its_own_name_and_location(csv_ddl, parquet_ddl):
+    csv_sql, parquet_sql = read(csv_ddl), read(parquet_ddl)
+
+    assert '_parquet (' in parquet_sql
+    assert "LOCATION 's3://S3_BUCKET_NAME/parquet/" in parquet_sql
+    assert "LOCATION 's3://S3_BUCKET_NAME/parquet/" not in csv_sql
+
+
+def test_ddl_column_types_skips_comments_and_partitions():
+    ddl = '''CREATE EXTERNAL TABLE t (
+    -- id int,
+    a int COMMENT 'the a',
+    b decimal(10,2),
+    c string
+)
+PARTITIONED BY (partition_date date)'''
+
+    assert ddl_column_types(ddl) == {'a': 'int', 'b': 'decimal', 'c': 'string'}
+
+
+def test_parquet_keys_live_under_their_own_prefix():
+    key = 'shipbob/inventory_run_rate/partition_date=2024-01-01/run_rate.csv'
+
+    assert s3_key_for_format(key, 'csv') == key
+    assert s3_key_for_format(key, 'parquet') == \
+        'parquet/shipbob/inventory_run_rate/partition_date=2024-01-01/run_rate.parquet'
+    assert s3_key_for_format(s3_key_for_format(key, 'parquet'), 'csv') == key
+
+    assert table_name_for_format('shipbob_inventory_run_rate', 'csv') == 'shipbob_inventory_run_rate'
+    assert table_name_for_format('shipbob_inventory_run_rate', 'parquet') == \
+        'shipbob_inventory_run_rate_parquet'
+
+
+def write_parquet(df, model, schema):
+    sink = io.BytesIO()
+    _write_parquet_chunks(df, sink, model, schema)
+    sink.seek(0)
+    return pq.read_table(sink)
+
+
+def test_parquet_files_use_the_csv_ddl_types():
+    schema = ddl_arrow_schema(os.path.join(SRC, 'shipbob_inventory_run_rate/ddl.sql'))
+    df = pd.DataFrame([{
+        'inventory_id': 1,
+        'run_rate': 1.5,
+        'name': 'Creamer',
+        'total_fulfillable_quantity': 10,
+        'est_stock_days_on_hand': 6.7,
+        'estimated_stockout_date': datetime.datetime(2024, 1, 8, 13, 30),
+        'restock_point': 115
+    }])
+
+    table = write_parquet(df, DailyRunRate, schema)
+
+    assert table.schema.field('inventory_id').type == pa.int32()
+    assert table.schema.field('estimated_stockout_date').type == pa.date32()
+    assert table.column('estimated_stockout_date').to_pylist() == [datetime.date(2024, 1, 8)]
+
+
+def test_ids_are_written_as_the_declared_strings():
+    schema = ddl_arrow_schema(os.path.join(SRC, 'shopify_active_variant_sku_details/ddl.sql'))
+    df = pd.DataFrame([{
+        'product_id': 123,
+        'product_title': 'Creamer',
+        'variant_id': 456,
+        'variant_title': 'Vanilla',
+        'variant_sku': 'CREAMER-VAN',
+        'inventory_quantity': 3.0,
+        'published_at': pd.Timestamp('2024-01-01T23:00:00-05:00')
+    }])
+
+    table = write_parquet(df, ShopifyProductVariantDetails, schema)
+
+    assert table.column('product_id').to_pylist() == ['123']
+    assert table.schema.field('inventory_quantity').type == pa.float32()
+    # Calendar date in the value's own offset
+    assert table.column('published_at').to_pylist() == [datetime.date(2024, 1, 1)]
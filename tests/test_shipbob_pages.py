@@ -0,0 +1,139 @@
+import pytest
+
+import utils
+from utils import (SHIPBOB_MAX_RETRIES, _get_shipbob_orders, _get_shipbob_page,
+                   _shipbob_orders_df)
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeClient:
+    """ShipBob client stand-in returning the given responses in order"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, cache_ttl=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(utils.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_retries_after_the_retry_after_header(sleeps):
+    client = FakeClient([
+        FakeResponse(429, {'Retry-After': '3'}),
+        FakeResponse(429),
+        FakeResponse(200, body=[]),
+    ])
+
+    response = _get_shipbob_page('https://api.shipbob.com/1.0/order', client)
+
+    assert response.status_code == 200
+    assert client.calls == 3
+    # Retry-After when given, else exponential backoff
+    assert sleeps == [3.0, 2.0]
+
+
+def test_gives_up_with_a_rate_limit_error(sleeps):
+    client = FakeClient([FakeResponse(429)] * (SHIPBOB_MAX_RETRIES + 1))
+
+    with pytest.raises(ValueError, match='Rate limited by ShipBob'):
+        _get_shipbob_page('https://api.shipbob.com/1.0/order', client)
+
+    assert client.calls == SHIPBOB_MAX_RETRIES + 1
+    assert len(sleeps) == SHIPBOB_MAX_RETRIES
+
+
+def order(order_id, items=1):
+    return {
+        'created_date': '2024-01-02T03:04:05+00:00',
+        'purchase_date': '2024-01-02T03:04:05+00:00',
+        'id': order_id,
+        'order_number': f'#{order_id}',
+        'status': 'Fulfilled',
+        'type': 'DTC',
+        'shipping_method': 'Ground',
+        'channel': {'id': 1, 'name': 'Shopify'},
+        'recipient': {
+            'name': 'Customer',
+            'email': 'customer@example.com',
+            'address': {'city': 'Denver', 'state': 'CO', 'country': 'US'}
+        },
+        'shipments': [{
+            'products': [{
+                'id': 10,
+                'sku': 'SKU-1',
+                'name': 'Creamer',
+                'inventory_items': [{'id': 100 + i, 'quantity': 1, 'name': 'Creamer'}
+                                    for i in range(items)]
+            }]
+        }]
+    }
+
+
+def test_orders_on_two_pages_are_kept_once():
+    # Order 2 shifted onto page 2 while the pages were being fetched
+    pages = [[order(1), order(2, items=2)], [order(2, items=2), order(3)]]
+
+    df = _shipbob_orders_df(pages)
+
+    assert sorted(df['shipbob_order_id'].unique()) == [1, 2, 3]
+    assert len(df) == 4
+
+
+@pytest.mark.parametrize('error_page', [{'message': 'Unauthorized'}, 'Bad Gateway', [None]])
+def test_error_page_stops_the_pages(error_page):
+    pages = [[order(1)], error_page, [order(2)]]
+
+    df = _shipbob_orders_df(pages)
+
+    assert list(df['shipbob_order_id'].unique()) == [1]
+
+
+def page_response(orders, total_count=3):
+    return FakeResponse(200, {
+        'Total-Pages': '2',
+        'Total-Count': str(total_count),
+        'Next-Page': '/1.0/order?Page=2'
+    }, orders)
+
+
+def test_order_lost_between_concurrent_pages_is_refetched_sequentially():
+    client = FakeClient([
+        # Order 2 shifted onto page 2 (& order 3 off it) between the requests
+        page_response([order(1), order(2)]),
+        page_response([order(2)]),
+        # Sequential re-fetch
+        page_response([order(1), order(2)]),
+        page_response([order(3)]),
+    ])
+
+    df = _get_shipbob_orders('/1.0/order', client, max_workers=4)
+
+    assert sorted(df['shipbob_order_id'].unique()) == [1, 2, 3]
+    assert client.calls == 4
+
+
+def test_matching_count_is_fetched_once():
+    client = FakeClient([page_response([order(1), order(2)]), page_response([order(3)])])
+
+    df = _get_shipbob_orders('/1.0/order', client, max_workers=4)
+
+    assert sorted(df['shipbob_order_id'].unique()) == [1, 2, 3]
+    assert client.calls == 2
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from shopify_bulk import LocalBulkOperationClient, get_shopify_orders_bulk, parse_bulk_orders
+from utils import _parse_shopify_orders
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'shopify_bulk_orders.jsonl')
+
+# The first fixture order as the REST /orders endpoint returns it (shop local time)
+REST_ORDER = {
+    'order_number': 1001,
+    'email': 'a@example.com',
+    'created_at': '2024-01-01T22:30:00-05:00',
+    'subtotal_price': '30.00',
+    'total_line_items_price': '30.00',
+    'total_tax': '2.10',
+    'total_discounts': '0.00',
+    'total_shipping_price_set': {'shop_money': {'amount': '5.00'}},
+    'total_price': '37.10',
+    'shipping_address': {'address1': '1 Main St', 'city': 'Denver',
+                         'province': 'Colorado', 'country': 'United States'},
+    'line_items': [
+        {'price': '12.50', 'quantity': 2, 'sku': 'CREAMER-VAN', 'title': 'Creamer',
+         'variant_title': 'Vanilla', 'name': 'Creamer - Vanilla'},
+        {'price': '5.00', 'quantity': 1, 'sku': 'SCOOP', 'title': 'Scoop',
+         'variant_title': None, 'name': 'Scoop'},
+    ]
+}
+
+
+@pytest.fixture
+def bulk_orders():
+    bulk_client = LocalBulkOperationClient(FIXTURE, timezone='America/New_York')
+    orders_df, line_items_df = get_shopify_orders_bulk(None, None, '2024-01-01', '2024-01-02',
+                                                       bulk_client=bulk_client)
+    return bulk_client, orders_df, line_items_df
+
+
+def rest_orders(orders):
+    all_orders, all_line_items = [], []
+    _parse_shopify_orders(orders, all_orders, all_line_items)
+    return all_orders, all_line_items
+
+
+def test_columns_match_the_rest_path(bulk_orders):
+    _, orders_df, line_items_df = bulk_orders
+    all_orders, all_line_items = rest_orders([REST_ORDER])
+
+    assert list(orders_df.columns) == list(all_orders[0])
+    assert list(line_items_df.columns) == list(all_line_items[0])
+
+
+def test_records_match_the_rest_path(bulk_orders):
+    _, orders_df, line_items_df = bulk_orders
+    all_orders, all_line_items = rest_orders([REST_ORDER])
+
+    assert orders_df.iloc[0].to_dict() == all_orders[0]
+    assert line_items_df.iloc[:2].to_dict('records') == all_line_items
+
+
+def test_order_date_is_in_shop_timezone(bulk_orders):
+    _, orders_df, line_items_df = bulk_orders
+
+    # 03:30 UTC on the 2nd is the evening of the 1st in New York
+    assert orders_df['order_date'].tolist() == ['2024-01-01', '2024-01-02']
+    assert orders_df['created_at'].iloc[0] == '2024-01-01T22:30:00-05:00'
+    assert line_items_df['order_date'].tolist() == ['2024-01-01', '2024-01-01', '2024-01-02']
+
+
+def test_total_line_items_price(bulk_orders):
+    _, orders_df, _ = bulk_orders
+
+    assert orders_df['total_line_items_price'].tolist() == ['30.00', '12.50']
+
+
+def test_query_covers_the_date_range(bulk_orders):
+    bulk_client, _, _ = bulk_orders
+
+    assert "created_at:>='2024-01-01T00:00:00Z'" in bulk_client.queries[0]
+    assert "created_at:<='2024-01-02T23:59:59Z'" in bulk_client.queries[0]
+
+
+def test_line_item_out_of_order_raises():
+    with open(FIXTURE, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    # Move order 1001's last line item after order 1002
+    lines = lines[:2] + lines[3:] + lines[2:3]
+
+    with pytest.raises(ValueError, match="doesn't follow its order"):
+        parse_bulk_orders(lines, 'America/New_York')
+
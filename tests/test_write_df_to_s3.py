@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from conftest import client_error
+from partition_writer import PartitionWriter
+from pydantic import BaseModel
+from utils import write_df_to_s3
+
+
+class Record(BaseModel):
+    id: int
+    name: str
+
+
+class FailingS3:
+    """S3 stand-in whose uploads fail"""
+
+    def head_object(self, Bucket, Key):
+        raise client_error('404', 'HeadObject')
+
+    def put_object(self, **kwargs):
+        raise client_error('AccessDenied', 'PutObject')
+
+
+def test_failed_upload_raises():
+    df = pd.DataFrame([{'id': 1, 'name': 'a'}])
+    with pytest.raises(ValueError, match='Error writing df to S3'):
+        write_df_to_s3('bucket', 'table/partition_date=2024-01-01/data.csv', df,
+                       FailingS3(), output_format='csv')
+
+
+def test_partition_writer_raises_on_failed_upload():
+    writer = PartitionWriter(s3_bucket='bucket',
+                             s3_client=FailingS3(),
+                             model=Record,
+                             s3_key=lambda partition: f'table/partition_date={partition}/data.csv',
+                             output_format='csv')
+    writer.submit('2024-01-01', pd.DataFrame([{'id': 1, 'name': 'a'}]))
+
+    with pytest.raises(ValueError, match='Failed partitions'):
+        writer.close()
+    assert writer.written == {}